@@ -0,0 +1,234 @@
+"""
+Admission control in front of Ollama.
+
+At most `max_concurrency` generations run at once; further work waits in a bounded priority
+queue (interactive ahead of bulk, bulk ahead of background jobs). Work that would overflow the
+queue is rejected right away with 429, and work that waits longer than `max_wait` is rejected
+with 503. Both carry a Retry-After estimate derived from the observed service rate.
+
+The priority of the current request is carried in a context variable, so endpoints set it
+once and every generation made on behalf of that request inherits it. So is the client's
+deadline: work that cannot be started before it passes is rejected with 504 instead of queued.
+
+The limits are for the whole server: with API_WORKERS worker processes each admits its share,
+rounded up.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import math
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from fastapi import HTTPException
+
+from config import (
+    ADMISSION_MAX_CONCURRENCY,
+    ADMISSION_MAX_QUEUE,
+    ADMISSION_BULK_QUEUE_SHARE,
+    ADMISSION_MAX_WAIT,
+    API_WORKERS,
+)
+from metrics import STAGE_DURATION
+from request_lifecycle import DeadlineExceeded, remaining
+
+logger = logging.getLogger(__name__)
+
+# Lower value is served first
+PRIORITIES: Dict[str, int] = {"interactive": 0, "bulk": 1, "background": 2}
+
+current_priority: ContextVar[str] = ContextVar("current_priority", default="interactive")
+
+
+def worker_share(limit: int, workers: int = API_WORKERS) -> int:
+    """One worker process's share of a server-wide limit."""
+    return max(1, math.ceil(limit / max(1, workers)))
+
+_EWMA_WEIGHT = 0.2
+
+
+class AdmissionRejected(HTTPException):
+    """Raised when work is shed; rendered by FastAPI with a Retry-After header."""
+
+    def __init__(self, status_code: int, detail: str, retry_after: int):
+        super().__init__(status_code=status_code, detail=detail, headers={"Retry-After": str(retry_after)})
+        self.retry_after = retry_after
+
+
+class Ticket:
+    """A granted slot. release() is idempotent so several cleanup paths may call it."""
+
+    __slots__ = ("_controller", "_granted_at", "_released")
+
+    def __init__(self, controller: "AdmissionController"):
+        self._controller = controller
+        self._granted_at = time.monotonic()
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self._controller._release(time.monotonic() - self._granted_at)
+
+
+class AdmissionController:
+    """Concurrency limiter with a bounded priority wait queue and load shedding."""
+
+    def __init__(
+        self,
+        max_concurrency: int = worker_share(ADMISSION_MAX_CONCURRENCY),
+        max_queue: int = worker_share(ADMISSION_MAX_QUEUE),
+        bulk_queue_share: float = ADMISSION_BULK_QUEUE_SHARE,
+        max_wait: float = ADMISSION_MAX_WAIT,
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.bulk_queue_share = bulk_queue_share
+        self.max_wait = max_wait
+        self._active = 0
+        self._waiters = []  # heap of (priority, seq, name, future)
+        self._seq = itertools.count()
+        self._queued = {name: 0 for name in PRIORITIES}
+        self._service_time = 2.0  # EWMA seconds per generation; seeded with a typical short translation
+        self._wait_time = 0.0  # EWMA seconds spent queued by admitted work
+        self.stats = {
+            "admitted": 0,
+            "queued": 0,
+            "rejected_queue_full": 0,
+            "rejected_timeout": 0,
+            "rejected_deadline": 0,
+        }
+
+    def queue_depth(self) -> int:
+        return sum(self._queued.values())
+
+    def service_rate(self) -> float:
+        """Observed generations completed per second at full concurrency."""
+        return self.max_concurrency / max(self._service_time, 0.001)
+
+    def retry_after(self) -> int:
+        """Seconds until the current backlog (plus one) should have drained."""
+        return max(1, math.ceil((self.queue_depth() + 1) / self.service_rate()))
+
+    def expected_wait(self, name: str) -> float:
+        """Seconds until queued work of this priority would get a slot, from the work queued ahead of it."""
+        if self._active < self.max_concurrency and not self.queue_depth():
+            return 0.0
+        ahead = sum(count for other, count in self._queued.items() if PRIORITIES[other] <= PRIORITIES[name])
+        return (ahead + 1) / self.service_rate()
+
+    def check_deadline(self, priority: Optional[str] = None) -> Optional[float]:
+        """
+        Raise DeadlineExceeded if the current request's deadline has passed or the queue would
+        outlast it. Returns the seconds left, or None without a deadline.
+        """
+        left = remaining()
+        if left is None:
+            return None
+        name = priority or current_priority.get()
+        wait = self.expected_wait(name if name in PRIORITIES else "interactive")
+        if left <= 0 or wait > left:
+            self.stats["rejected_deadline"] += 1
+            logger.warning(f"Rejecting {name} work: {max(left, 0.0):.2f}s left before its deadline, the queue needs {wait:.2f}s")
+            raise DeadlineExceeded("Request deadline cannot be met with the current queue.")
+        return left
+
+    def _queue_limit(self, name: str) -> int:
+        if name == "interactive":
+            return self.max_queue
+        return int(self.max_queue * self.bulk_queue_share)
+
+    async def acquire(self, priority: Optional[str] = None) -> Ticket:
+        """Wait for a slot, or raise AdmissionRejected if the work should be shed."""
+        name = priority or current_priority.get()
+        if name not in PRIORITIES:
+            name = "interactive"
+        left = self.check_deadline(name)
+
+        if self._active < self.max_concurrency and not self.queue_depth():
+            self._active += 1
+            self.stats["admitted"] += 1
+            STAGE_DURATION.labels("queue_wait").observe(0.0)
+            return Ticket(self)
+
+        if self.queue_depth() >= self._queue_limit(name):
+            self.stats["rejected_queue_full"] += 1
+            retry_after = self.retry_after()
+            logger.warning(f"Shedding {name} work: queue full ({self.queue_depth()} waiting), retry after {retry_after}s")
+            raise AdmissionRejected(429, "Translation service is busy, please retry later.", retry_after)
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (PRIORITIES[name], next(self._seq), name, future))
+        self._queued[name] += 1
+        self.stats["queued"] += 1
+        queued_at = time.monotonic()
+        max_wait = self.max_wait if left is None else min(self.max_wait, left)
+        try:
+            await asyncio.wait_for(future, timeout=max_wait)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if future.done() and not future.cancelled():
+                # The slot was handed over just as we gave up; pass it on without a service time
+                self._release(None)
+            else:
+                future.cancel()
+                self._queued[name] -= 1
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            if max_wait < self.max_wait:
+                self.stats["rejected_deadline"] += 1
+                logger.warning(f"Rejecting {name} work: deadline passed after {max_wait:.2f}s in the queue")
+                raise DeadlineExceeded()
+            self.stats["rejected_timeout"] += 1
+            retry_after = self.retry_after()
+            logger.warning(f"Shedding {name} work: waited {self.max_wait}s without a slot, retry after {retry_after}s")
+            raise AdmissionRejected(503, "Translation service is overloaded, please retry later.", retry_after)
+
+        waited = time.monotonic() - queued_at
+        self._wait_time += _EWMA_WEIGHT * (waited - self._wait_time)
+        STAGE_DURATION.labels("queue_wait").observe(waited)
+        self.stats["admitted"] += 1
+        return Ticket(self)
+
+    @asynccontextmanager
+    async def slot(self, priority: Optional[str] = None):
+        """Hold a slot for the duration of the block."""
+        ticket = await self.acquire(priority)
+        try:
+            yield
+        finally:
+            ticket.release()
+
+    def _release(self, held: Optional[float]):
+        """Free a slot held for `held` seconds; None frees a slot that served no work."""
+        if held is not None:
+            self._service_time += _EWMA_WEIGHT * (held - self._service_time)
+        while self._waiters:
+            _, _, name, future = heapq.heappop(self._waiters)
+            if future.done():
+                continue  # Abandoned by its caller
+            self._queued[name] -= 1
+            future.set_result(None)  # Hand the slot straight to the next waiter
+            return
+        self._active -= 1
+
+    def get_stats(self) -> dict:
+        stats = dict(self.stats)
+        stats.update({
+            "active": self._active,
+            "max_concurrency": self.max_concurrency,
+            "queue_depth": self.queue_depth(),
+            "queue_depth_by_priority": dict(self._queued),
+            "max_queue": self.max_queue,
+            "avg_wait_seconds": round(self._wait_time, 3),
+            "avg_service_seconds": round(self._service_time, 3),
+            "service_rate_per_second": round(self.service_rate(), 3),
+            "retry_after_estimate": self.retry_after(),
+        })
+        return stats
+
+
+admission_controller = AdmissionController()
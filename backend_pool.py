@@ -0,0 +1,276 @@
+"""
+Pool of Ollama backends.
+
+Each request is routed to the healthy backend that serves the requested model and has the
+fewest outstanding requests. Every backend has a circuit breaker: after a run of consecutive
+failures it is ejected, and once the cool-down has passed it is half-open, letting a single
+trial request through; success closes the breaker, failure re-opens it. Health probes only
+refresh a backend's model list (or re-open it if they fail): /api/tags answering says nothing
+about generations, so only a successful generation closes a breaker.
+A request that could not connect to its backend is retried once on another one, since
+nothing was generated.
+
+Timeouts are capped to the current request's deadline; a call that runs out of the client's
+time is not counted against the backend. A generation cancelled part-way (the client went away)
+is recorded with an estimate of the tokens it no longer has to produce.
+"""
+
+import asyncio
+import importlib
+import json
+import logging
+import time
+from typing import AsyncIterator, List, Optional
+
+from config import (
+    OLLAMA_BACKENDS,
+    BACKEND_FAILURE_THRESHOLD,
+    BACKEND_OPEN_SECONDS,
+    OLLAMA_WARMUP_TIMEOUT,
+    OLLAMA_TOTAL_TIMEOUT,
+)
+from ollama_client import OllamaClient, OllamaError, OllamaConnectError, model_available
+from request_lifecycle import DeadlineExceeded, cancellations, cap_timeout, expired
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+_EWMA_WEIGHT = 0.2
+
+
+class Backend:
+    """One Ollama server, its connection pool, circuit breaker and stats."""
+
+    def __init__(self, url: str, models: Optional[List[str]] = None):
+        self.url = url.rstrip("/")
+        self.models = models  # None serves any model
+        self.client = OllamaClient(self.url)
+        self.outstanding = 0
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.trial_in_flight = False
+        self.available_models: Optional[dict] = None  # last /api/tags payload
+        self.requests = 0
+        self.errors = 0
+        self.latency = None  # EWMA seconds
+        self.last_error: Optional[str] = None
+
+    def serves(self, model: str) -> bool:
+        if self.models is not None and model not in self.models:
+            return False
+        return self.available_models is None or model_available(self.available_models, model)
+
+    def allows_request(self) -> bool:
+        """Whether the breaker lets a request through, moving open -> half-open after the cool-down."""
+        if self.state == OPEN and time.monotonic() - self.opened_at >= BACKEND_OPEN_SECONDS:
+            self.state = HALF_OPEN
+            logger.info(f"Backend {self.url} half-open")
+        if self.state == HALF_OPEN:
+            return not self.trial_in_flight
+        return self.state == CLOSED
+
+    def record_success(self, latency: float):
+        self.requests += 1
+        self.latency = latency if self.latency is None else self.latency + _EWMA_WEIGHT * (latency - self.latency)
+        self.consecutive_failures = 0
+        if self.state != CLOSED:
+            logger.info(f"Backend {self.url} recovered, closing circuit")
+        self.state = CLOSED
+
+    def record_failure(self, error: Exception, probe: bool = False):
+        if not probe:
+            self.requests += 1
+            self.errors += 1
+        self.last_error = str(error)
+        self.consecutive_failures += 1
+        if self.state == HALF_OPEN or self.consecutive_failures >= BACKEND_FAILURE_THRESHOLD:
+            if self.state != OPEN:
+                logger.warning(f"Ejecting backend {self.url} after {self.consecutive_failures} failure(s): {error}")
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+
+    def get_stats(self) -> dict:
+        return {
+            "url": self.url,
+            "models": self.models,
+            "state": self.state,
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "errors": self.errors,
+            "error_rate": round(self.errors / self.requests, 4) if self.requests else 0.0,
+            "avg_latency_seconds": round(self.latency, 3) if self.latency is not None else None,
+            "consecutive_failures": self.consecutive_failures,
+            "last_error": self.last_error,
+        }
+
+
+def parse_backends(spec: str) -> List[Backend]:
+    """Parse OLLAMA_BACKENDS (comma-separated URLs or a JSON list of {url, models})."""
+    spec = spec.strip()
+    if spec.startswith("["):
+        return [Backend(entry["url"], entry.get("models")) for entry in json.loads(spec)]
+    return [Backend(url.strip()) for url in spec.split(",") if url.strip()]
+
+
+class BackendPool:
+    """Route Ollama requests across backends by least outstanding requests."""
+
+    def __init__(self, backends: List[Backend]):
+        if not backends:
+            raise ValueError("At least one Ollama backend is required")
+        self.backends = backends
+
+    def pick(self, model: str, exclude: Optional[Backend] = None) -> Backend:
+        """Choose the backend for a request, or raise OllamaError if none can take it."""
+        candidates = [b for b in self.backends if b is not exclude and b.serves(model) and b.allows_request()]
+        if not candidates:
+            raise OllamaError(f"No healthy Ollama backend available for {model}")
+        # Fewest outstanding requests first, then lowest observed latency
+        return min(candidates, key=lambda b: (b.outstanding, b.latency or 0.0))
+
+    def _begin(self, backend: Backend) -> bool:
+        """Count a request on backend; returns True if it is the half-open circuit's trial request."""
+        backend.outstanding += 1
+        if backend.state == HALF_OPEN:
+            backend.trial_in_flight = True
+            return True
+        return False
+
+    def _end(self, backend: Backend, trial: bool):
+        backend.outstanding -= 1
+        if trial:
+            backend.trial_in_flight = False
+
+    async def generate(self, payload: dict, timeout: Optional[float] = None) -> dict:
+        """Run a non-streaming generation on the least-loaded backend."""
+        model = payload.get("model", "")
+        timeout = cap_timeout(timeout, OLLAMA_TOTAL_TIMEOUT)
+        backend = self.pick(model)
+        try:
+            return await self._generate_on(backend, payload, timeout)
+        except OllamaConnectError:
+            if len(self.backends) == 1:
+                raise
+            return await self._generate_on(self.pick(model, exclude=backend), payload, timeout)
+
+    async def _generate_on(self, backend: Backend, payload: dict, timeout: Optional[float]) -> dict:
+        trial = self._begin(backend)
+        started = time.monotonic()
+        try:
+            result = await backend.client.generate(payload, timeout=timeout)
+        except OllamaError as e:
+            if expired():
+                raise DeadlineExceeded() from e
+            backend.record_failure(e)
+            raise
+        except asyncio.CancelledError:
+            cancellations.generation_cancelled(payload, time.monotonic() - started)
+            raise
+        finally:
+            self._end(backend, trial)
+        backend.record_success(time.monotonic() - started)
+        return result
+
+    async def generate_stream(self, payload: dict, timeout: Optional[float] = None) -> AsyncIterator[dict]:
+        """Run a streaming generation on the least-loaded backend."""
+        model = payload.get("model", "")
+        timeout = cap_timeout(timeout, OLLAMA_TOTAL_TIMEOUT)
+        backend = self.pick(model)
+        for attempt in range(2):
+            trial = self._begin(backend)
+            started = time.monotonic()
+            chunks = 0
+            finished = False
+            try:
+                async for chunk in backend.client.generate_stream(payload, timeout=timeout):
+                    chunks += 1
+                    finished = bool(chunk.get("done"))
+                    yield chunk
+            except (asyncio.CancelledError, GeneratorExit):
+                if not finished:
+                    cancellations.generation_cancelled(payload, time.monotonic() - started, generated=chunks)
+                raise
+            except OllamaConnectError as e:
+                backend.record_failure(e)
+                if attempt or len(self.backends) == 1:
+                    raise
+                failed = backend
+            except OllamaError as e:
+                if expired():
+                    raise DeadlineExceeded() from e
+                backend.record_failure(e)
+                raise
+            else:
+                backend.record_success(time.monotonic() - started)
+                return
+            finally:
+                self._end(backend, trial)
+            backend = self.pick(model, exclude=failed)
+
+    async def preload(self, model: str, keep_alive, timeout: float = OLLAMA_WARMUP_TIMEOUT) -> List[dict]:
+        """Load a model into memory on every backend that serves it (an empty-prompt generation)."""
+        backends = [b for b in self.backends if b.serves(model) and b.allows_request()]
+        return list(await asyncio.gather(*(self._preload_backend(b, model, keep_alive, timeout) for b in backends)))
+
+    async def _preload_backend(self, backend: Backend, model: str, keep_alive, timeout: float) -> dict:
+        try:
+            result = await backend.client.generate({"model": model, "prompt": "", "stream": False, "keep_alive": keep_alive}, timeout=timeout)
+        except OllamaError as e:
+            return {"url": backend.url, "loaded": False, "load_seconds": None, "error": str(e)}
+        load = result.get("load_duration")
+        return {"url": backend.url, "loaded": True, "load_seconds": load / 1e9 if load is not None else None, "error": None}
+
+    async def probe(self, model: str) -> List[dict]:
+        """Query /api/tags on every backend that is not ejected, refreshing the models it serves."""
+        return list(await asyncio.gather(*(self._probe_backend(b, model) for b in self.backends)))
+
+    async def _probe_backend(self, backend: Backend, model: str) -> dict:
+        if not backend.allows_request():
+            return {"url": backend.url, "available": False, "state": backend.state, "error": backend.last_error}
+        try:
+            backend.available_models = await backend.client.tags()
+        except OllamaError as e:
+            backend.record_failure(e, probe=True)
+            return {"url": backend.url, "available": False, "state": backend.state, "error": str(e)}
+        available = backend.serves(model)
+        return {"url": backend.url, "available": available, "state": backend.state, "error": None if available else f"Model {model} not found"}
+
+    def get_stats(self) -> List[dict]:
+        return [b.get_stats() for b in self.backends]
+
+    async def aclose(self):
+        for backend in self.backends:
+            await backend.client.aclose()
+
+
+_pool: Optional[BackendPool] = None
+
+
+def get_pool() -> BackendPool:
+    """Return the process-wide backend pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        _pool = BackendPool(parse_backends(OLLAMA_BACKENDS))
+    return _pool
+
+
+async def open_pool() -> BackendPool:
+    """
+    Return the process-wide backend pool, importing its HTTP client library off the event loop
+    the first time, so that startup and requests are not held up by it.
+    """
+    if _pool is None:
+        await asyncio.get_running_loop().run_in_executor(None, importlib.import_module, "httpx")
+    return get_pool()
+
+
+async def close_pool():
+    """Close every backend's connection pool."""
+    global _pool
+    if _pool is not None:
+        await _pool.aclose()
+        _pool = None
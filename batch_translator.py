@@ -0,0 +1,190 @@
+"""
+Micro-batching for bulk translation.
+
+Items that share a language pair and model are packed into a few JSON-structured prompts sized to a
+token budget, so a single Ollama generation translates many short strings. Results are
+aligned back to items by key; any item whose output cannot be aligned is retried on its own.
+Items with a near-duplicate in the translation memory are answered from it and never packed.
+"""
+
+import asyncio
+import json
+import logging
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from config import (
+    BATCH_TOKEN_BUDGET,
+    BATCH_MAX_ITEMS_PER_PROMPT,
+    BATCH_CONCURRENCY,
+)
+from admission import admission_controller, AdmissionRejected
+from backend_pool import get_pool
+from request_lifecycle import DeadlineExceeded
+from ollama_health import health_monitor
+from generation_planner import generation_planner
+from metrics import stage_timer, record_generation, record_generation_error
+from model_router import KEEP_ALIVE
+from prompt_templates import prompt_template
+from span_protection import is_translatable, span_protector
+from translation_memory import translation_memory
+from translator import estimate_tokens, clean_translation, translate_text
+
+logger = logging.getLogger(__name__)
+
+
+def pack_chunks(
+    texts: List[Tuple[int, str]],
+    token_budget: int = BATCH_TOKEN_BUDGET,
+    max_items: int = BATCH_MAX_ITEMS_PER_PROMPT,
+) -> List[List[Tuple[int, str]]]:
+    """Greedily pack (index, text) pairs into chunks that fit the token budget."""
+    chunks = []
+    current = []
+    current_tokens = 0
+    for index, text in texts:
+        tokens = estimate_tokens(text)
+        if current and (current_tokens + tokens > token_budget or len(current) >= max_items):
+            chunks.append(current)
+            current = []
+            current_tokens = 0
+        current.append((index, text))
+        current_tokens += tokens
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def parse_batch_response(response: str, keys: List[str]) -> Dict[str, str]:
+    """Extract the translations that can be aligned to the expected keys."""
+    try:
+        parsed = json.loads(response)
+    except ValueError:
+        return {}
+    # Some models wrap the object, e.g. {"translations": {...}}
+    if isinstance(parsed, dict) and len(parsed) == 1 and isinstance(next(iter(parsed.values())), dict):
+        parsed = next(iter(parsed.values()))
+    if not isinstance(parsed, dict):
+        return {}
+
+    aligned = {}
+    for key in keys:
+        value = parsed.get(key)
+        if isinstance(value, str):
+            value = clean_translation(value)
+            if value:
+                aligned[key] = value
+    return aligned
+
+
+async def _translate_chunk(
+    chunk: List[Tuple[int, str]],
+    source_lang: str,
+    target_lang: str,
+    model: str,
+    semaphore: asyncio.Semaphore,
+) -> Dict[int, Optional[str]]:
+    """Translate one packed chunk, retrying unaligned items (or items that lost a placeholder) individually."""
+    if len(chunk) == 1:
+        index, text = chunk[0]
+        async with semaphore:
+            return {index: await translate_text(text, source_lang, target_lang, model=model)}
+
+    masks = {str(n): span_protector.mask(text) for n, (_, text) in enumerate(chunk)}
+    texts = {key: masked.text for key, masked in masks.items()}
+    source_tokens = sum(estimate_tokens(text) for text in texts.values())
+    prompt = prompt_template.batch(texts, source_lang, target_lang)
+    payload = {
+        "model": model,
+        **prompt.fields,
+        "stream": False,
+        "format": "json",
+        "keep_alive": KEEP_ALIVE,
+        "options": generation_planner.plan(source_tokens, estimate_tokens(prompt.text), source_lang, target_lang, items=len(texts)),
+    }
+
+    aligned = {}
+    async with semaphore:
+        try:
+            async with admission_controller.slot():
+                with stage_timer("generate"):
+                    result = await get_pool().generate(payload)
+            record_generation(result, source_lang, target_lang)
+            generation_planner.observe(source_tokens, result, source_lang, target_lang, items=len(texts))
+            with stage_timer("cleanup"):
+                aligned = {}
+                for key, translated_text in parse_batch_response(result.get("response", ""), list(texts)).items():
+                    restored = span_protector.restore(masks[key], translated_text)
+                    if restored is not None:
+                        aligned[key] = restored
+            await translation_memory.add_many([
+                (chunk[int(key)][1], translated_text, source_lang, target_lang, model) for key, translated_text in aligned.items()
+            ])
+        except (AdmissionRejected, DeadlineExceeded):
+            raise
+        except Exception as e:
+            logger.error(f"Batch translation error: {str(e)}")
+            record_generation_error("batch", e)
+            health_monitor.mark_stale(str(e))
+
+    results = {index: aligned.get(str(n)) for n, (index, _) in enumerate(chunk)}
+    missing = [(index, text) for index, text in chunk if results[index] is None]
+    if missing:
+        logger.info(f"Retrying {len(missing)}/{len(chunk)} unaligned batch items individually")
+
+        async def retry(index: int, text: str):
+            async with semaphore:
+                results[index] = await translate_text(text, source_lang, target_lang, model=model)
+
+        await asyncio.gather(*(retry(index, text) for index, text in missing))
+    return results
+
+
+async def translate_batch(
+    items: List[Tuple[str, str, str, str]],
+    concurrency: int = BATCH_CONCURRENCY,
+) -> List[Optional[str]]:
+    """
+    Translate (text, source_language, target_language, model) items with shared prompts.
+    
+    Items with nothing to translate are returned as they are and items found in the translation
+    memory are answered from it; the rest are grouped by language pair and model. Returns translations in input order; None marks an item that could not be
+    translated.
+    """
+    translations: List[Optional[str]] = [None] * len(items)
+    groups = defaultdict(list)
+    pending = []
+    for index, (text, source_lang, target_lang, _) in enumerate(items):
+        if not is_translatable(text):
+            translations[index] = text
+        else:
+            pending.append(index)
+    matches = await translation_memory.lookup_many([items[index] for index in pending])
+    for index, match in zip(pending, matches):
+        text, source_lang, target_lang, model = items[index]
+        if match is not None:
+            translations[index] = match.translated_text
+        else:
+            groups[(source_lang, target_lang, model)].append((index, text))
+
+    semaphore = asyncio.Semaphore(concurrency)
+    tasks = [
+        _translate_chunk(chunk, source_lang, target_lang, model, semaphore)
+        for (source_lang, target_lang, model), texts in groups.items()
+        for chunk in pack_chunks(texts)
+    ]
+    remembered = sum(1 for match in matches if match is not None)
+    bypassed = len(items) - len(pending)
+    logger.info(f"Batch of {len(items)} items ({bypassed} bypassed, {remembered} from translation memory) packed into {len(tasks)} prompts across {len(groups)} language pair/model groups")
+
+    tasks = [asyncio.ensure_future(task) for task in tasks]
+    try:
+        all_results = await asyncio.gather(*tasks)
+    finally:
+        # If one prompt was shed by admission control, don't leave the others running
+        for task in tasks:
+            task.cancel()
+    for chunk_results in all_results:
+        for index, translated_text in chunk_results.items():
+            translations[index] = translated_text
+    return translations
@@ -0,0 +1,8 @@
+"""
+Benchmark tooling for the Translation API.
+
+- `python -m benchmark.ollama_stub`: a local server emulating Ollama's /api/tags and /api/generate
+  with configurable latency, generation speed, streaming and error injection.
+- `python -m benchmark.load_test`: an async load generator that drives the API at fixed
+  concurrency levels and writes p50/p95/p99 latency and requests/sec to JSON.
+"""
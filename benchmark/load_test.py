@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+Async load generator for the Translation API.
+
+Runs each scenario at each concurrency level: `requests` calls are spread over `concurrency`
+workers, and the latency of every call is recorded. Results (p50/p95/p99 latency, requests/sec,
+errors by status, and time to first byte for streaming) are printed and written to JSON.
+
+Scenarios:
+    single  POST /translate with one short text
+    batch   POST /translate/batch with --batch-size items
+    stream  POST /translate/stream (SSE), measuring time to first event and to completion
+    detect  POST /detect-language
+
+Texts are generated from --seed, so runs are reproducible. Unless --allow-cache is given each run
+adds a nonce to every text so the translation cache cannot hide generation cost.
+
+Usage:
+    python -m benchmark.load_test --url http://localhost:8000 --concurrency 1,8,32 --requests 200
+    python -m benchmark.load_test --in-process --scenarios single,detect --output results.json
+    python -m benchmark.load_test --baseline old.json --output new.json
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import platform
+import random
+import sys
+import time
+import uuid
+from collections import Counter
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+SCENARIOS = ("single", "batch", "stream", "detect")
+
+_WORDS = {
+    "English": "the quick brown fox jumps over a lazy dog while people read good books at home".split(),
+    "Spanish": "el rápido zorro marrón salta sobre un perro perezoso mientras la gente lee libros".split(),
+    "French": "le renard brun rapide saute par dessus un chien paresseux pendant que les gens lisent".split(),
+    "German": "der schnelle braune fuchs springt über einen faulen hund während leute bücher lesen".split(),
+}
+_TARGETS = ("English", "Spanish", "French", "German")
+
+
+class TextSource:
+    """Deterministic sentence generator."""
+
+    def __init__(self, seed: int, nonce: str = ""):
+        self.rng = random.Random(seed)
+        self.nonce = nonce
+        self.count = 0
+
+    def sentence(self) -> dict:
+        self.count += 1
+        language = self.rng.choice(list(_WORDS))
+        words = self.rng.choices(_WORDS[language], k=self.rng.randint(4, 12))
+        text = " ".join(words).capitalize() + "."
+        if self.nonce:
+            text += f" ({self.nonce}-{self.count})"
+        target = self.rng.choice([t for t in _TARGETS if t != language])
+        return {"text": text, "target_language": target}
+
+
+def percentile(sorted_values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(values: List[float]) -> dict:
+    values = sorted(values)
+    if not values:
+        return {"p50": None, "p95": None, "p99": None, "mean": None, "max": None}
+    return {
+        "p50": round(percentile(values, 50), 4),
+        "p95": round(percentile(values, 95), 4),
+        "p99": round(percentile(values, 99), 4),
+        "mean": round(sum(values) / len(values), 4),
+        "max": round(values[-1], 4),
+    }
+
+
+class Run:
+    """Samples for one scenario at one concurrency level."""
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.first_byte: List[float] = []
+        self.statuses: Counter = Counter()
+        self.errors = 0
+        self.fallbacks = 0
+
+
+def scenario_call(name: str, texts: TextSource, batch_size: int) -> Callable[[httpx.AsyncClient, Run], Awaitable[None]]:
+    """Return a coroutine function making one call of the scenario and recording it in a Run."""
+
+    async def single(client: httpx.AsyncClient, run: Run):
+        response = await client.post("/translate", json=texts.sentence())
+        run.statuses[response.status_code] += 1
+        if response.status_code == 200 and response.json().get("fallback_used"):
+            run.fallbacks += 1
+
+    async def batch(client: httpx.AsyncClient, run: Run):
+        items = [texts.sentence() for _ in range(batch_size)]
+        response = await client.post("/translate/batch", json={"items": items})
+        run.statuses[response.status_code] += 1
+        if response.status_code == 200:
+            run.fallbacks += response.json().get("fallback", 0)
+
+    async def stream(client: httpx.AsyncClient, run: Run):
+        started = time.perf_counter()
+        async with client.stream("POST", "/translate/stream", json=texts.sentence()) as response:
+            run.statuses[response.status_code] += 1
+            first, event = None, None
+            async for line in response.aiter_lines():
+                if line.startswith("event:"):
+                    event = line[6:].strip()
+                elif line.startswith("data:"):
+                    if first is None:
+                        first = time.perf_counter() - started
+                        run.first_byte.append(first)
+                    if event == "done" and json.loads(line[5:]).get("fallback_used"):
+                        run.fallbacks += 1
+
+    async def detect(client: httpx.AsyncClient, run: Run):
+        response = await client.post("/detect-language", json={"text": texts.sentence()["text"]})
+        run.statuses[response.status_code] += 1
+
+    return {"single": single, "batch": batch, "stream": stream, "detect": detect}[name]
+
+
+async def prompt_eval_totals(client: httpx.AsyncClient) -> Optional[tuple]:
+    """Return (seconds, generations) of Ollama prompt eval so far, from the API's /metrics."""
+    try:
+        response = await client.get("/metrics")
+    except httpx.HTTPError:
+        return None
+    if response.status_code != 200:
+        return None
+    totals = {"_sum": 0.0, "_count": 0.0}
+    for line in response.text.splitlines():
+        name, _, value = line.rpartition(" ")
+        for suffix in totals:
+            if name.startswith("ollama_prompt_eval_duration_seconds" + suffix):
+                totals[suffix] += float(value)
+    return totals["_sum"], totals["_count"]
+
+
+async def run_scenario(client: httpx.AsyncClient, name: str, concurrency: int, requests: int, texts: TextSource, batch_size: int) -> dict:
+    call = scenario_call(name, texts, batch_size)
+    run = Run()
+    remaining = iter(range(requests))
+
+    async def worker():
+        for _ in remaining:
+            started = time.perf_counter()
+            try:
+                await call(client, run)
+            except httpx.HTTPError as e:
+                run.errors += 1
+                run.statuses[type(e).__name__] += 1
+            run.latencies.append(time.perf_counter() - started)
+
+    prompt_eval_before = await prompt_eval_totals(client)
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    prompt_eval_after = await prompt_eval_totals(client)
+
+    failed = run.errors + sum(count for status, count in run.statuses.items() if status != 200 and isinstance(status, int))
+    result = {
+        "scenario": name,
+        "concurrency": concurrency,
+        "requests": requests,
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(requests / elapsed, 2) if elapsed else None,
+        "failed": failed,
+        "fallbacks": run.fallbacks,
+        "statuses": {str(status): count for status, count in sorted(run.statuses.items(), key=str)},
+        "latency": summarize(run.latencies),
+    }
+    if name == "batch":
+        result["items_per_second"] = round(requests * batch_size / elapsed, 2) if elapsed else None
+    if name == "stream":
+        result["time_to_first_event"] = summarize(run.first_byte)
+    if prompt_eval_before and prompt_eval_after and prompt_eval_after[1] > prompt_eval_before[1]:
+        seconds = prompt_eval_after[0] - prompt_eval_before[0]
+        result["mean_prompt_eval_seconds"] = round(seconds / (prompt_eval_after[1] - prompt_eval_before[1]), 4)
+    return result
+
+
+def print_result(result: dict, baseline: Optional[dict] = None):
+    latency = result["latency"]
+    line = (
+        f"{result['scenario']:<7} c={result['concurrency']:<4} {result['requests_per_second']:>9} req/s  "
+        f"p50={latency['p50']}s p95={latency['p95']}s p99={latency['p99']}s  failed={result['failed']}"
+    )
+    if result.get("mean_prompt_eval_seconds") is not None:
+        line += f"  prompt_eval={result['mean_prompt_eval_seconds']}s"
+    if baseline and baseline.get("requests_per_second") and baseline["latency"].get("p95"):
+        rps = (result["requests_per_second"] / baseline["requests_per_second"] - 1) * 100
+        p95 = (latency["p95"] / baseline["latency"]["p95"] - 1) * 100
+        line += f"  (vs baseline: req/s {rps:+.1f}%, p95 {p95:+.1f}%)"
+    print(line)
+
+
+def load_baseline(path: Optional[str]) -> Dict[tuple, dict]:
+    if not path:
+        return {}
+    with open(path) as f:
+        return {(r["scenario"], r["concurrency"]): r for r in json.load(f)["results"]}
+
+
+async def run_benchmark(args: argparse.Namespace) -> dict:
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    for name in scenarios:
+        if name not in SCENARIOS:
+            raise SystemExit(f"Unknown scenario {name!r}; choose from {', '.join(SCENARIOS)}")
+    levels = [int(c) for c in args.concurrency.split(",")]
+    nonce = "" if args.allow_cache else uuid.uuid4().hex[:8]
+    texts = TextSource(args.seed, nonce)
+    baseline = load_baseline(args.baseline)
+
+    timeout = httpx.Timeout(args.timeout)
+    limits = httpx.Limits(max_connections=max(levels), max_keepalive_connections=max(levels))
+    app = None
+    if args.in_process:
+        import main
+        app = main.app
+        await main.start_pipeline()  # Not startup(): the job workers would take over the API's jobs
+        await main.readiness.wait()
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://benchmark", timeout=timeout)
+    else:
+        client = httpx.AsyncClient(base_url=args.url, timeout=timeout, limits=limits)
+
+    results = []
+    try:
+        for name in scenarios:
+            for concurrency in levels:
+                if args.warmup:
+                    await run_scenario(client, name, concurrency, min(args.warmup, args.requests), texts, args.batch_size)
+                result = await run_scenario(client, name, concurrency, args.requests, texts, args.batch_size)
+                print_result(result, baseline.get((name, concurrency)))
+                results.append(result)
+    finally:
+        await client.aclose()
+        if app is not None:
+            import main
+            await main.stop_pipeline()
+
+    return {
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "target": "in-process" if args.in_process else args.url,
+        "settings": {
+            "scenarios": scenarios,
+            "concurrency": levels,
+            "requests": args.requests,
+            "batch_size": args.batch_size,
+            "warmup": args.warmup,
+            "seed": args.seed,
+            "allow_cache": args.allow_cache,
+        },
+        "environment": {"python": sys.version.split()[0], "platform": platform.platform()},
+        "results": results,
+    }
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Load-test the Translation API")
+    parser.add_argument("--url", default="http://localhost:8000", help="Base URL of a running API")
+    parser.add_argument("--in-process", action="store_true", help="Drive main.app directly instead of over HTTP")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Comma-separated subset of: " + ", ".join(SCENARIOS))
+    parser.add_argument("--concurrency", default="1,8,32", help="Comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=100, help="Requests per scenario and concurrency level")
+    parser.add_argument("--batch-size", type=int, default=20, help="Items per /translate/batch request")
+    parser.add_argument("--warmup", type=int, default=5, help="Unrecorded requests before each measurement")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-request timeout in seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--allow-cache", action="store_true", help="Reuse texts across runs so the cache can answer")
+    parser.add_argument("--baseline", help="Earlier results JSON to compare against")
+    parser.add_argument("--output", default="benchmark_results.json", help="Where to write the results JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = asyncio.run(run_benchmark(args))
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Ollama stub server for benchmarks.
+
+Emulates GET /api/tags, POST /api/generate and POST /api/chat (plain, JSON-format and streaming)
+closely enough for the Translation API to run against it without a GPU. The "translation" is the
+source text with a prefix, so results can be checked. Timing follows the shape of a real
+generation: a prompt-eval delay, then output tokens at a fixed rate, with at most `parallel`
+generations running at once, like OLLAMA_NUM_PARALLEL. With --prompt-tokens-per-second the
+prompt-eval delay also grows with the prompt tokens not covered by the longest prefix shared
+with a recent prompt, like Ollama's per-slot KV cache, so prompt templates can be compared.
+
+Usage:
+    python -m benchmark.ollama_stub --port 11434 --prompt-latency 0.05 --tokens-per-second 40
+    python -m benchmark.ollama_stub --error-rate 0.05 --hang-rate 0.01 --seed 1
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import List
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+@dataclass
+class StubSettings:
+    """Behaviour of the stub; every field maps to a command-line option."""
+    models: List[str] = field(default_factory=lambda: ["mistral:latest"])
+    prompt_latency: float = 0.05  # Seconds before the first token (prompt eval)
+    prompt_tokens_per_second: float = 0.0  # Prompt eval speed for uncached tokens; 0 keeps prompt eval at prompt_latency
+    tokens_per_second: float = 40.0  # Output speed; 0 returns instantly
+    load_latency: float = 0.0  # Extra delay on the first generation, like loading the model
+    parallel: int = 4  # Generations processed at once; the rest wait
+    error_rate: float = 0.0  # Fraction of generations answered with HTTP 500
+    hang_rate: float = 0.0  # Fraction of generations that never answer
+    prefix: str = "T:"  # Prepended to the source text as the "translation"
+    seed: int = 0
+
+
+_TEXT_PATTERN = re.compile(r'Text to translate: "(.*)"', re.S)
+_CHAT_TEXT_PATTERN = re.compile(r"\n\nText: (.*)\Z", re.S)
+_JSON_PATTERN = re.compile(r"\{.*\}", re.S)
+_TARGETS_PATTERN = re.compile(r"into each of these languages: (.*?)\.(?:\n|$)")
+_TOKEN_PATTERN = re.compile(r"\S+\s*")
+
+
+def fake_multi_translation(instructions: str, text: str, prefix: str) -> str:
+    """Build a JSON "translation" keyed by the target languages listed in a multi-target prompt."""
+    targets = _TARGETS_PATTERN.search(instructions).group(1).split(", ")
+    return json.dumps({target: f"{prefix}{target}:{text}" for target in targets}, ensure_ascii=False)
+
+
+def fake_translation(prompt: str, response_format: str, prefix: str) -> str:
+    """Build a deterministic "translation" for a single-text, JSON batch or multi-target prompt."""
+    if response_format == "json" and _TARGETS_PATTERN.search(prompt):
+        text = _TEXT_PATTERN.search(prompt)
+        return fake_multi_translation(prompt, text.group(1) if text else "", prefix)
+    if response_format == "json":
+        match = _JSON_PATTERN.search(prompt)
+        items = json.loads(match.group(0)) if match else {}
+        return json.dumps({key: prefix + value for key, value in items.items()}, ensure_ascii=False)
+    match = _TEXT_PATTERN.search(prompt)
+    return prefix + (match.group(1) if match else prompt.strip()[-40:])
+
+
+def fake_chat_translation(messages: List[dict], response_format: str, prefix: str) -> str:
+    """Build a deterministic "translation" of the last user message of a chat."""
+    content = next((m.get("content", "") for m in reversed(messages) if m.get("role") == "user"), "")
+    system = next((m.get("content", "") for m in messages if m.get("role") == "system"), "")
+    if response_format == "json" and _TARGETS_PATTERN.search(system):
+        return fake_multi_translation(system, content, prefix)
+    if response_format == "json":
+        return fake_translation(content, response_format, prefix)
+    match = _CHAT_TEXT_PATTERN.search(content)
+    return prefix + (match.group(1) if match else content)
+
+
+def render_chat(messages: List[dict]) -> str:
+    """Flatten chat messages into the prompt text the model would evaluate."""
+    return "".join(f"<|{m.get('role', '')}|>{m.get('content', '')}" for m in messages)
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def create_app(settings: StubSettings) -> FastAPI:
+    """Create the stub app for the given settings."""
+    app = FastAPI(title="Ollama stub")
+    rng = random.Random(settings.seed)
+    slots = asyncio.Semaphore(settings.parallel)
+    state = {"loaded": False, "requests": 0, "errors": 0, "hangs": 0, "prompt_tokens": 0, "cached_prompt_tokens": 0}
+    recent_prompts = deque(maxlen=settings.parallel)
+
+    def prompt_eval(prompt: str) -> tuple:
+        """Return (evaluated tokens, seconds), skipping the longest prefix shared with a recent prompt."""
+        shared = max((len(os.path.commonprefix([prompt, seen])) for seen in recent_prompts), default=0)
+        recent_prompts.append(prompt)
+        evaluated = estimate_tokens(prompt[shared:])
+        state["prompt_tokens"] += evaluated
+        state["cached_prompt_tokens"] += max(0, estimate_tokens(prompt) - evaluated)
+        if not settings.prompt_tokens_per_second:
+            return estimate_tokens(prompt), settings.prompt_latency
+        return evaluated, settings.prompt_latency + evaluated / settings.prompt_tokens_per_second
+
+    def timing(prompt: str, output: str, load: float) -> dict:
+        eval_count = estimate_tokens(output)
+        eval_seconds = eval_count / settings.tokens_per_second if settings.tokens_per_second else 0.0
+        prompt_count, prompt_seconds = prompt_eval(prompt)
+        return {
+            "model": settings.models[0],
+            "prompt_eval_count": prompt_count,
+            "prompt_eval_duration": int(prompt_seconds * 1e9),
+            "eval_count": eval_count,
+            "eval_duration": max(1, int(eval_seconds * 1e9)),
+            "load_duration": int(load * 1e9),
+        }
+
+    @app.get("/api/tags")
+    async def tags():
+        return {"models": [{"name": name} for name in settings.models]}
+
+    @app.get("/stub/stats")
+    async def stub_stats():
+        return state
+
+    async def run(body: dict, prompt: str, output: str, shape):
+        """Answer one generation; shape(text) builds the response fields holding (part of) the output."""
+        state["requests"] += 1
+        roll = rng.random()
+        if roll < settings.hang_rate:
+            state["hangs"] += 1
+            await asyncio.Event().wait()
+        if roll < settings.hang_rate + settings.error_rate:
+            state["errors"] += 1
+            return JSONResponse({"error": "injected stub failure"}, status_code=500)
+
+        token_delay = 1 / settings.tokens_per_second if settings.tokens_per_second else 0.0
+
+        def first_load() -> float:
+            if state["loaded"]:
+                return 0.0
+            state["loaded"] = True
+            return settings.load_latency
+
+        if body.get("stream"):
+            async def chunks():
+                async with slots:
+                    stats = timing(prompt, output, first_load())
+                    await asyncio.sleep(stats["load_duration"] / 1e9 + stats["prompt_eval_duration"] / 1e9)
+                    for token in _TOKEN_PATTERN.findall(output):
+                        yield json.dumps({"model": stats["model"], **shape(token), "done": False}) + "\n"
+                        await asyncio.sleep(token_delay)
+                    yield json.dumps(dict(stats, **shape(""), done=True)) + "\n"
+            return StreamingResponse(chunks(), media_type="application/x-ndjson")
+
+        async with slots:
+            started = time.monotonic()
+            stats = timing(prompt, output, first_load())
+            await asyncio.sleep((stats["load_duration"] + stats["prompt_eval_duration"] + stats["eval_duration"]) / 1e9)
+            stats["total_duration"] = int((time.monotonic() - started) * 1e9)
+        return dict(stats, **shape(output), done=True)
+
+    @app.post("/api/generate")
+    async def generate(request: Request):
+        body = await request.json()
+        prompt = body.get("prompt", "")
+        output = fake_translation(prompt, body.get("format"), settings.prefix)
+        return await run(body, prompt, output, lambda text: {"response": text})
+
+    @app.post("/api/chat")
+    async def chat(request: Request):
+        body = await request.json()
+        messages = body.get("messages", [])
+        output = fake_chat_translation(messages, body.get("format"), settings.prefix)
+        return await run(body, render_chat(messages), output, lambda text: {"message": {"role": "assistant", "content": text}})
+
+    return app
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Ollama stub server for benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--models", default="mistral:latest", help="Comma-separated model names reported by /api/tags")
+    defaults = StubSettings()
+    for name in ("prompt_latency", "prompt_tokens_per_second", "tokens_per_second", "load_latency", "error_rate", "hang_rate"):
+        parser.add_argument("--" + name.replace("_", "-"), type=float, default=getattr(defaults, name))
+    parser.add_argument("--parallel", type=int, default=defaults.parallel)
+    parser.add_argument("--prefix", default=defaults.prefix)
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    import uvicorn
+
+    args = parse_args(argv)
+    settings = StubSettings(
+        models=[m.strip() for m in args.models.split(",") if m.strip()],
+        prompt_latency=args.prompt_latency,
+        prompt_tokens_per_second=args.prompt_tokens_per_second,
+        tokens_per_second=args.tokens_per_second,
+        load_latency=args.load_latency,
+        parallel=args.parallel,
+        error_rate=args.error_rate,
+        hang_rate=args.hang_rate,
+        prefix=args.prefix,
+        seed=args.seed,
+    )
+    uvicorn.run(create_app(settings), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
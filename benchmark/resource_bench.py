@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark for POST /translate/resource on large localization bundles.
+
+Generates a reproducible bundle (JSON, PO or HTML) of --keys strings, a --duplicate-rate share of
+them repeating earlier ones as real bundles do ("Save", "Cancel", ...), translates it once and
+reports strings per second, distinct strings and where they were answered from. Unless
+--allow-cache is given every run adds a nonce to the strings so the cache cannot answer.
+
+Usage:
+    python -m benchmark.resource_bench --in-process --keys 10000 --format json
+    python -m benchmark.resource_bench --url http://localhost:8000 --keys 20000 --format po
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+
+import httpx
+
+from benchmark.load_test import _WORDS
+
+FORMATS = ("json", "po", "html")
+
+
+def make_strings(keys: int, duplicate_rate: float, seed: int, nonce: str = "") -> list:
+    """Build keys UI strings of 1-10 words, with duplicate_rate of them repeating an earlier one."""
+    rng = random.Random(seed)
+    words = _WORDS["English"]
+    strings = []
+    for n in range(keys):
+        if strings and rng.random() < duplicate_rate:
+            strings.append(rng.choice(strings[:50]))  # Repeats concentrate on a few common strings
+            continue
+        text = " ".join(rng.choices(words, k=rng.randint(1, 10))).capitalize()
+        strings.append(f"{text} {nonce}{n}" if nonce else f"{text} {n}")
+    return strings
+
+
+def make_bundle(strings: list, resource_format: str) -> str:
+    if resource_format == "json":
+        sections = {}
+        for n, text in enumerate(strings):
+            sections.setdefault(f"section{n // 100}", {})[f"key{n}"] = text
+        return json.dumps(sections, indent=2, ensure_ascii=False)
+    if resource_format == "po":
+        entries = ['msgid ""\nmsgstr ""\n"Content-Type: text/plain; charset=UTF-8\\n"\n']
+        entries += [f'#: src/view.py:{n}\nmsgctxt "key{n}"\nmsgid "{text}"\nmsgstr ""\n' for n, text in enumerate(strings)]
+        return "\n".join(entries)
+    rows = "\n".join(f'  <li class="item"><a href="/p/{n}">{text}</a></li>' for n, text in enumerate(strings))
+    return f"<ul>\n{rows}\n</ul>\n"
+
+
+async def run(args: argparse.Namespace) -> dict:
+    nonce = "" if args.allow_cache else uuid.uuid4().hex[:8]
+    strings = make_strings(args.keys, args.duplicate_rate, args.seed, nonce)
+    content = make_bundle(strings, args.format)
+    body = {"content": content, "format": args.format, "source_language": "English", "target_language": args.target_language}
+
+    timeout = httpx.Timeout(args.timeout)
+    app = None
+    if args.in_process:
+        import main
+        app = main.app
+        await main.start_pipeline()  # Not startup(): the job workers would take over the API's jobs
+        await main.readiness.wait()
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://benchmark", timeout=timeout)
+    else:
+        client = httpx.AsyncClient(base_url=args.url, timeout=timeout)
+
+    try:
+        started = time.perf_counter()
+        response = await client.post("/translate/resource", json=body)
+        elapsed = time.perf_counter() - started
+    finally:
+        await client.aclose()
+        if app is not None:
+            import main
+            await main.stop_pipeline()
+
+    response.raise_for_status()
+    result = response.json()
+    return {
+        "format": args.format,
+        "bytes": len(content.encode()),
+        "strings": result["strings"],
+        "unique_strings": result["unique_strings"],
+        "cached": result["cached"],
+        "translated": result["translated"],
+        "failed": result["failed"],
+        "seconds": round(elapsed, 3),
+        "strings_per_second": round(result["strings"] / elapsed, 1),
+        "unique_per_second": round(result["unique_strings"] / elapsed, 1),
+    }
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark /translate/resource on a large bundle")
+    parser.add_argument("--url", default="http://localhost:8000", help="Base URL of a running API")
+    parser.add_argument("--in-process", action="store_true", help="Drive main.app directly instead of over HTTP")
+    parser.add_argument("--format", choices=FORMATS, default="json")
+    parser.add_argument("--keys", type=int, default=10000, help="Strings in the bundle")
+    parser.add_argument("--duplicate-rate", type=float, default=0.2, help="Share of strings repeating an earlier one")
+    parser.add_argument("--target-language", default="Spanish")
+    parser.add_argument("--timeout", type=float, default=3600.0, help="Request timeout in seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--allow-cache", action="store_true", help="Reuse strings across runs so the cache can answer")
+    parser.add_argument("--output", help="Also write the result as JSON here")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    result = asyncio.run(run(args))
+    for name, value in result.items():
+        print(f"{name:>20}: {value}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
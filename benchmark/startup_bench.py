@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark for server.py.
+
+Starts the server --runs times and measures, from process start: when GET /health/live first
+answers (the process serves), when GET /health/ready first answers 200 (every required
+subsystem is warm) and how long the first POST /translate takes once ready, then how long the
+server takes to exit on SIGTERM. It also times `import main` in a fresh interpreter, the part of
+startup no warm-up can move off the critical path. Reports the median of each.
+
+Usage:
+    python -m benchmark.ollama_stub --port 11434 &
+    python -m benchmark.startup_bench --runs 5
+    python -m benchmark.startup_bench --runs 5 --workers 4 --output startup.json
+"""
+
+import argparse
+import json
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import time
+from typing import Optional
+
+import httpx
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_seconds() -> float:
+    """Seconds a fresh interpreter takes to import main."""
+    code = "import time; t = time.perf_counter(); import main; print(time.perf_counter() - t)"
+    output = subprocess.run([sys.executable, "-c", code], cwd=_ROOT, capture_output=True, text=True, check=True).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def _poll(client: httpx.Client, path: str, started: float, timeout: float, process: subprocess.Popen) -> Optional[float]:
+    """Seconds from started until path answers 200, or None if the server exited or timeout passed."""
+    while time.perf_counter() - started < timeout:
+        if process.poll() is not None:
+            return None
+        try:
+            if client.get(path).status_code == 200:
+                return time.perf_counter() - started
+        except httpx.TransportError:
+            pass
+        time.sleep(0.01)
+    return None
+
+
+def run_once(args: argparse.Namespace) -> dict:
+    url = f"http://127.0.0.1:{args.port}"
+    command = [sys.executable, "server.py", "--port", str(args.port), "--workers", str(args.workers), "--log-level", "warning"]
+    env = dict(os.environ, OLLAMA_BASE_URL=args.ollama_url)
+    started = time.perf_counter()
+    process = subprocess.Popen(command, cwd=_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    result = {"live": None, "ready": None, "first_translation": None, "shutdown": None}
+    try:
+        with httpx.Client(base_url=url, timeout=args.timeout) as client:
+            result["live"] = _poll(client, "/health/live", started, args.timeout, process)
+            result["ready"] = _poll(client, "/health/ready", started, args.timeout, process)
+            if result["ready"] is not None:
+                request_started = time.perf_counter()
+                response = client.post("/translate", json={"text": f"Good morning, run {started}", "target_language": "Spanish"})
+                if response.status_code == 200:
+                    result["first_translation"] = time.perf_counter() - request_started
+    finally:
+        stopping = time.perf_counter()
+        process.send_signal(signal.SIGTERM)
+        try:
+            process.wait(timeout=args.timeout)
+            result["shutdown"] = time.perf_counter() - stopping
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+    return result
+
+
+def _median(values: list) -> Optional[float]:
+    values = [v for v in values if v is not None]
+    return round(statistics.median(values), 3) if values else None
+
+
+def run(args: argparse.Namespace) -> dict:
+    imports = [import_seconds() for _ in range(args.runs)]
+    runs = [run_once(args) for _ in range(args.runs)]
+    result = {"runs": args.runs, "workers": args.workers, "import_main": _median(imports)}
+    for name in ("live", "ready", "first_translation", "shutdown"):
+        result[name] = _median([r[name] for r in runs])
+        result[f"{name}_failures"] = sum(r[name] is None for r in runs)
+    return result
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark server.py startup, readiness and shutdown")
+    parser.add_argument("--runs", type=int, default=5, help="Server starts to measure")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes")
+    parser.add_argument("--port", type=int, default=8765, help="Port the benchmarked server listens on")
+    parser.add_argument("--ollama-url", default=os.getenv("OLLAMA_BASE_URL", "http://localhost:11434"),
+                        help="Ollama (or benchmark.ollama_stub) the server talks to")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Seconds allowed for each phase")
+    parser.add_argument("--output", help="Also write the result as JSON here")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    result = run(args)
+    for name, value in result.items():
+        print(f"{name:>26}: {value}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
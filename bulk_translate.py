@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+Offline bulk translation of a JSONL file.
+
+Each input line is a JSON object with `text` and optionally `id`, `source_language` and
+`target_language` (the same fields as a /translate/batch item). The file is streamed in batches
+that go through the same detection, cache, micro-batching and fallback pipeline as
+/translate/batch, with several batches in flight at once. Results are appended to the output
+JSONL as batches complete, so the output order may differ from the input; every result keeps
+the record's `id` (the input line number when the record has none).
+
+Progress is saved to a checkpoint file: the input position below which every record is done,
+the batches beyond it that are also done, and the output size at that moment. An interrupted
+run started again with the same arguments truncates the output to that size and resumes from
+there, so no record is lost or written twice.
+
+Usage:
+    python bulk_translate.py input.jsonl output.jsonl
+    python bulk_translate.py input.jsonl output.jsonl --target-language Spanish --concurrency 8
+    python bulk_translate.py input.jsonl output.jsonl --restart
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException
+
+logger = logging.getLogger("bulk_translate")
+
+
+class Batch:
+    """A contiguous run of input lines and the byte offset just past them."""
+
+    __slots__ = ("start_line", "end_line", "end_offset", "records")
+
+    def __init__(self, start_line: int, end_line: int, end_offset: int, records: List[Tuple[int, bytes]]):
+        self.start_line = start_line
+        self.end_line = end_line  # exclusive
+        self.end_offset = end_offset
+        self.records = records  # (line_number, raw line)
+
+
+class Checkpoint:
+    """Resume state; written atomically so a crash mid-write leaves the previous one intact."""
+
+    def __init__(self, path: str, input_path: str):
+        self.path = path
+        self.input_path = os.path.abspath(input_path)
+        self.next_line = 0  # every line below this is done
+        self.offset = 0  # input byte offset of next_line
+        self.done: List[List[int]] = []  # [start_line, end_line) batches finished beyond next_line
+        self.output_bytes = 0
+        self.records = 0
+
+    @classmethod
+    def load(cls, path: str, input_path: str) -> "Checkpoint":
+        checkpoint = cls(path, input_path)
+        if not os.path.exists(path):
+            return checkpoint
+        with open(path) as f:
+            state = json.load(f)
+        if state.get("input") != checkpoint.input_path:
+            raise SystemExit(f"Checkpoint {path} belongs to {state.get('input')}; use --restart to start over")
+        checkpoint.next_line = state["next_line"]
+        checkpoint.offset = state["offset"]
+        checkpoint.done = state["done"]
+        checkpoint.output_bytes = state["output_bytes"]
+        checkpoint.records = state["records"]
+        return checkpoint
+
+    def is_done(self, line: int) -> bool:
+        return any(start <= line < end for start, end in self.done)
+
+    def save(self):
+        state = {
+            "input": self.input_path,
+            "next_line": self.next_line,
+            "offset": self.offset,
+            "done": self.done,
+            "output_bytes": self.output_bytes,
+            "records": self.records,
+            "saved_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        }
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+
+class Progress:
+    """Throughput and ETA, estimated from the share of input bytes consumed."""
+
+    def __init__(self, total_bytes: int, start_offset: int, interval: float):
+        self.total_bytes = total_bytes
+        self.start_offset = start_offset
+        self.interval = interval
+        self.started = time.monotonic()
+        self.last_report = self.started
+        self.records = 0
+        self.fallback = 0
+        self.errors = 0
+
+    def update(self, offset: int, force: bool = False):
+        now = time.monotonic()
+        if not force and now - self.last_report < self.interval:
+            return
+        self.last_report = now
+        elapsed = max(now - self.started, 1e-6)
+        rate = self.records / elapsed
+        line = f"{self.records} records, {rate:.1f} rec/s, fallback={self.fallback} errors={self.errors}"
+        if self.total_bytes:
+            consumed = offset - self.start_offset
+            line += f", {100 * offset / self.total_bytes:.1f}%"
+            if consumed > 0 and offset < self.total_bytes:
+                eta = elapsed * (self.total_bytes - offset) / consumed
+                line += f", ETA {time.strftime('%H:%M:%S', time.gmtime(eta))}"
+        print(line, file=sys.stderr, flush=True)
+
+
+def read_batches(f, checkpoint: Checkpoint, batch_size: int):
+    """Yield batches from the checkpointed position, skipping lines already done."""
+    f.seek(checkpoint.offset)
+    line_number = checkpoint.next_line
+    offset = checkpoint.offset
+    start_line = line_number
+    records = []
+    for raw in f:
+        offset += len(raw)
+        if raw.strip() and not checkpoint.is_done(line_number):
+            records.append((line_number, raw))
+        line_number += 1
+        if len(records) >= batch_size:
+            yield Batch(start_line, line_number, offset, records)
+            start_line = line_number
+            records = []
+    if line_number > start_line:
+        yield Batch(start_line, line_number, offset, records)
+
+
+def parse_record(line_number: int, raw: bytes, args: argparse.Namespace) -> Tuple[object, Optional[dict], Optional[str]]:
+    """Return (id, batch item fields, error) for one input line."""
+    try:
+        record = json.loads(raw)
+    except ValueError as e:
+        return line_number, None, f"Invalid JSON: {e}"
+    if not isinstance(record, dict):
+        return line_number, None, "Record is not a JSON object"
+    record_id = record.get(args.id_field, line_number)
+    text = record.get(args.text_field)
+    if not isinstance(text, str) or not text:
+        return record_id, None, f"Missing '{args.text_field}'"
+    return record_id, {
+        "text": text,
+        "source_language": record.get("source_language") or args.source_language,
+        "target_language": record.get("target_language") or args.target_language,
+    }, None
+
+
+async def translate_records(batch: Batch, args: argparse.Namespace) -> List[dict]:
+    """Translate one batch, retrying when the service sheds it or Ollama is down."""
+    import main
+
+    ids, items, rows = [], [], []
+    for line_number, raw in batch.records:
+        record_id, fields, error = parse_record(line_number, raw, args)
+        if error:
+            rows.append({"id": record_id, "error": error})
+        else:
+            ids.append(record_id)
+            items.append(main.BatchTranslationItem(**fields))
+    if not items:
+        return rows
+
+    for attempt in range(args.max_retries + 1):
+        try:
+            response = await main.run_batch_translation(items)
+            break
+        except HTTPException as e:
+            if attempt == args.max_retries:
+                logger.error(f"Giving up on lines {batch.start_line}-{batch.end_line - 1}: {e.detail}")
+                return rows + [{"id": record_id, "error": e.detail} for record_id in ids]
+            retry_after = float((e.headers or {}).get("Retry-After", args.retry_delay))
+            logger.warning(f"Lines {batch.start_line}-{batch.end_line - 1}: {e.detail} Retrying in {retry_after}s")
+            await asyncio.sleep(retry_after)
+
+    for record_id, result in zip(ids, response.results):
+        rows.append({"id": record_id, **result.model_dump(exclude={"id"})})
+    return rows
+
+
+async def run_bulk(args: argparse.Namespace) -> Progress:
+    import main
+    from admission import current_priority
+
+    if args.restart:
+        for path in (args.output, args.checkpoint):
+            if os.path.exists(path):
+                os.remove(path)
+    checkpoint = Checkpoint.load(args.checkpoint, args.input)
+    if checkpoint.next_line or checkpoint.done:
+        logger.info(f"Resuming at line {checkpoint.next_line} ({checkpoint.records} records already written)")
+
+    output = open(args.output, "ab")
+    output.truncate(checkpoint.output_bytes)  # Drop results written after the last checkpoint
+    output.seek(checkpoint.output_bytes)
+
+    current_priority.set("bulk")
+    await main.start_pipeline()  # Not startup(): the job workers would take over the API's jobs
+    # Warm-ups run in the background; without the first Ollama probe every batch would be shed
+    await main.readiness.wait()
+    progress = Progress(os.path.getsize(args.input), checkpoint.offset, args.progress_interval)
+    in_flight = set()
+    finished = {}  # start_line -> Batch, completed but not yet below the watermark
+    last_saved = time.monotonic()
+
+    def advance(batch: Batch, rows: List[dict]):
+        for row in rows:
+            output.write(json.dumps(row, ensure_ascii=False).encode("utf-8") + b"\n")
+            if "error" in row:
+                progress.errors += 1
+            elif row.get("fallback_used"):
+                progress.fallback += 1
+        progress.records += len(rows)
+        checkpoint.records += len(rows)
+        finished[batch.start_line] = batch
+        # Move the watermark over every contiguous finished batch
+        while checkpoint.next_line in finished:
+            done = finished.pop(checkpoint.next_line)
+            checkpoint.next_line = done.end_line
+            checkpoint.offset = done.end_offset
+        checkpoint.done = sorted([b.start_line, b.end_line] for b in finished.values())
+
+    def save():
+        nonlocal last_saved
+        output.flush()
+        os.fsync(output.fileno())
+        checkpoint.output_bytes = output.tell()
+        checkpoint.save()
+        last_saved = time.monotonic()
+
+    async def run(batch: Batch) -> Tuple[Batch, List[dict]]:
+        return batch, await translate_records(batch, args)
+
+    def collect(done):
+        for task in done:
+            advance(*task.result())
+        if time.monotonic() - last_saved >= args.checkpoint_interval:
+            save()
+        progress.update(checkpoint.offset)
+
+    try:
+        with open(args.input, "rb") as f:
+            for batch in read_batches(f, checkpoint, args.batch_size):
+                if len(in_flight) >= args.concurrency:
+                    done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                    collect(done)
+                in_flight.add(asyncio.create_task(run(batch)))
+            while in_flight:
+                done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                collect(done)
+    finally:
+        for task in in_flight:
+            task.cancel()
+        save()
+        output.close()
+        await main.stop_pipeline()
+    progress.update(checkpoint.offset, force=True)
+    return progress
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Translate a JSONL file through the translation pipeline")
+    parser.add_argument("input", help="Input JSONL, one translation request per line")
+    parser.add_argument("output", help="Output JSONL; results are appended as they complete")
+    parser.add_argument("--checkpoint", help="Checkpoint file (default: <output>.checkpoint)")
+    parser.add_argument("--restart", action="store_true", help="Ignore any checkpoint and overwrite the output")
+    parser.add_argument("--batch-size", type=int, default=50, help="Records per batch")
+    parser.add_argument("--concurrency", type=int, default=4, help="Batches translated in parallel")
+    parser.add_argument("--text-field", default="text", help="Field holding the text to translate")
+    parser.add_argument("--id-field", default="id", help="Field holding the record id")
+    parser.add_argument("--source-language", help="Source language for records without one (detected if omitted)")
+    parser.add_argument("--target-language", default="English", help="Target language for records without one")
+    parser.add_argument("--max-retries", type=int, default=5, help="Retries of a batch that is shed or hits an Ollama outage")
+    parser.add_argument("--retry-delay", type=float, default=5.0, help="Seconds between retries when no Retry-After is given")
+    parser.add_argument("--checkpoint-interval", type=float, default=5.0, help="Seconds between checkpoints")
+    parser.add_argument("--progress-interval", type=float, default=10.0, help="Seconds between progress lines")
+    args = parser.parse_args(argv)
+    args.checkpoint = args.checkpoint or args.output + ".checkpoint"
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    try:
+        progress = asyncio.run(run_bulk(args))
+    except KeyboardInterrupt:
+        print(f"Interrupted; progress saved to {args.checkpoint}. Run the same command again to resume.", file=sys.stderr)
+        sys.exit(130)
+    print(f"Wrote {progress.records} records to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
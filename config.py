@@ -0,0 +1,126 @@
+"""
+Service configuration. Every value can be overridden through an environment variable
+of the same name.
+"""
+
+import os
+
+# Ollama configuration
+OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "mistral:latest")  # You can change this to any model you have pulled
+
+# Model residency and size-based routing
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")  # Sent with every generation; "-1" keeps models loaded forever
+OLLAMA_WARMUP = os.getenv("OLLAMA_WARMUP", "1") not in ("0", "false", "False")  # Preload the models in use at startup
+OLLAMA_WARMUP_TIMEOUT = float(os.getenv("OLLAMA_WARMUP_TIMEOUT", "120"))  # Seconds allowed for loading one model
+OLLAMA_SMALL_MODEL = os.getenv("OLLAMA_SMALL_MODEL", "")  # Faster model for short texts; empty disables routing
+# Largest estimated token count routed to the small model, as a number or a JSON object keyed by
+# "Source:Target" language pair with "*" wildcards, e.g. {"*": 32, "English:Spanish": 64, "*:Japanese": 16}
+MODEL_ROUTING_THRESHOLDS = os.getenv("MODEL_ROUTING_THRESHOLDS", "32")
+
+# Prompt templates: "v2" uses /api/chat with a fixed system message per language pair (prefix-cache friendly),
+# "v1" the original single /api/generate prompt
+PROMPT_TEMPLATE_VERSION = os.getenv("PROMPT_TEMPLATE_VERSION", "v2")
+
+# Generation options planner (num_predict / num_ctx sized per request)
+PLANNER_DEFAULT_RATIO = float(os.getenv("PLANNER_DEFAULT_RATIO", "1.5"))  # Output tokens per input token before any are observed
+PLANNER_MARGIN = float(os.getenv("PLANNER_MARGIN", "1.5"))  # num_predict = expected output tokens * margin + slack
+PLANNER_MIN_PREDICT = int(os.getenv("PLANNER_MIN_PREDICT", "32"))
+PLANNER_MAX_PREDICT = int(os.getenv("PLANNER_MAX_PREDICT", "4096"))
+# Allowed num_ctx values. One value keeps the context fixed so the model is never reloaded for it; several
+# let short prompts use a smaller context, but Ollama reloads the model every time num_ctx changes
+PLANNER_CTX_BUCKETS = os.getenv("PLANNER_CTX_BUCKETS", "4096")
+
+# Ollama HTTP client (seconds / connection counts)
+OLLAMA_CONNECT_TIMEOUT = float(os.getenv("OLLAMA_CONNECT_TIMEOUT", "5"))
+OLLAMA_READ_TIMEOUT = float(os.getenv("OLLAMA_READ_TIMEOUT", "30"))
+OLLAMA_TOTAL_TIMEOUT = float(os.getenv("OLLAMA_TOTAL_TIMEOUT", "30"))
+OLLAMA_STATUS_TIMEOUT = float(os.getenv("OLLAMA_STATUS_TIMEOUT", "5"))
+OLLAMA_MAX_CONNECTIONS = int(os.getenv("OLLAMA_MAX_CONNECTIONS", "64"))
+OLLAMA_MAX_KEEPALIVE = int(os.getenv("OLLAMA_MAX_KEEPALIVE", "32"))
+OLLAMA_KEEPALIVE_EXPIRY = float(os.getenv("OLLAMA_KEEPALIVE_EXPIRY", "60"))
+
+# Ollama health monitor (seconds)
+OLLAMA_HEALTH_INTERVAL = float(os.getenv("OLLAMA_HEALTH_INTERVAL", "15"))
+OLLAMA_HEALTH_RETRY_INTERVAL = float(os.getenv("OLLAMA_HEALTH_RETRY_INTERVAL", "2"))
+
+# Translation result cache
+TRANSLATION_CACHE_SIZE = int(os.getenv("TRANSLATION_CACHE_SIZE", "10000"))  # In-memory entries
+TRANSLATION_CACHE_TTL = float(os.getenv("TRANSLATION_CACHE_TTL", str(7 * 24 * 3600)))  # Seconds
+TRANSLATION_CACHE_DB = os.getenv("TRANSLATION_CACHE_DB", "translation_cache.db")  # Empty disables the disk tier
+
+# Fuzzy translation memory: reuses translations of near-duplicate segments
+TM_DB = os.getenv("TM_DB", "translation_memory.db")  # Empty disables the translation memory
+TM_THRESHOLD = float(os.getenv("TM_THRESHOLD", "0.85"))  # Minimum character n-gram similarity of segment skeletons
+TM_MAX_ENTRIES = int(os.getenv("TM_MAX_ENTRIES", "1000000"))  # Oldest segments are pruned beyond this
+TM_MAX_CHARS = int(os.getenv("TM_MAX_CHARS", "1000"))  # Longer texts are neither stored nor looked up
+
+# Batch translation
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "1000"))  # Items accepted per /translate/batch request
+BATCH_TOKEN_BUDGET = int(os.getenv("BATCH_TOKEN_BUDGET", "1024"))  # Estimated source tokens packed into one prompt
+BATCH_MAX_ITEMS_PER_PROMPT = int(os.getenv("BATCH_MAX_ITEMS_PER_PROMPT", "50"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))  # Prompts generated in parallel per batch
+
+# Multi-target translation (/translate/multi)
+MULTI_MAX_TARGETS = int(os.getenv("MULTI_MAX_TARGETS", "50"))  # Target languages accepted per request
+MULTI_TARGETS_PER_PROMPT = int(os.getenv("MULTI_TARGETS_PER_PROMPT", "5"))  # Targets combined into one prompt for short texts; 1 disables
+MULTI_CONCURRENCY = int(os.getenv("MULTI_CONCURRENCY", "4"))  # Generations in parallel per request
+
+# Long-document translation
+DOCUMENT_MAX_CHARS = int(os.getenv("DOCUMENT_MAX_CHARS", "5000000"))
+DOCUMENT_CHUNK_TOKENS = int(os.getenv("DOCUMENT_CHUNK_TOKENS", "400"))  # Estimated source tokens per chunk
+DOCUMENT_CONCURRENCY = int(os.getenv("DOCUMENT_CONCURRENCY", "4"))  # Chunks translated in parallel per document
+
+# Admission control in front of Ollama
+ADMISSION_MAX_CONCURRENCY = int(os.getenv("ADMISSION_MAX_CONCURRENCY", "4"))  # Match Ollama's OLLAMA_NUM_PARALLEL
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "64"))  # Waiting generations before rejecting with 429
+ADMISSION_BULK_QUEUE_SHARE = float(os.getenv("ADMISSION_BULK_QUEUE_SHARE", "0.5"))  # Part of the queue bulk work may fill
+ADMISSION_MAX_WAIT = float(os.getenv("ADMISSION_MAX_WAIT", "20"))  # Seconds in the queue before rejecting with 503
+
+# Client deadlines, sent as an X-Request-Timeout header in seconds
+REQUEST_DEFAULT_TIMEOUT = float(os.getenv("REQUEST_DEFAULT_TIMEOUT", "0"))  # Deadline for requests without the header; 0 means none
+REQUEST_MAX_TIMEOUT = float(os.getenv("REQUEST_MAX_TIMEOUT", "3600"))  # Longer client deadlines are capped to this
+
+# Ollama backend pool. Either a comma-separated list of URLs, or a JSON list such as
+# [{"url": "http://gpu1:11434", "models": ["mistral:latest"]}, {"url": "http://gpu2:11434"}].
+# Defaults to the single OLLAMA_BASE_URL backend.
+OLLAMA_BACKENDS = os.getenv("OLLAMA_BACKENDS", OLLAMA_BASE_URL)
+BACKEND_FAILURE_THRESHOLD = int(os.getenv("BACKEND_FAILURE_THRESHOLD", "3"))  # Consecutive failures before ejecting
+BACKEND_OPEN_SECONDS = float(os.getenv("BACKEND_OPEN_SECONDS", "30"))  # Ejection time before a half-open trial request
+
+# Language detection
+DETECTION_CACHE_SIZE = int(os.getenv("DETECTION_CACHE_SIZE", "50000"))  # Cached detection results
+DETECTION_MAX_CHARS = int(os.getenv("DETECTION_MAX_CHARS", "1000"))  # Leading characters used for detection
+DETECTION_SEED = int(os.getenv("DETECTION_SEED", "0"))  # Makes langdetect deterministic
+
+# Fallback phrase table used while Ollama is unavailable
+# TSV: header of language names, one phrase per row. The shipped file is a small sample; supply your own
+PHRASE_TABLE_PATH = os.getenv("PHRASE_TABLE_PATH", "fallback_phrases.tsv")
+PHRASE_TABLE_RELOAD_INTERVAL = float(os.getenv("PHRASE_TABLE_RELOAD_INTERVAL", "30"))  # Seconds between mtime checks; 0 disables
+PHRASE_MAX_CHARS = int(os.getenv("PHRASE_MAX_CHARS", "200"))  # Longer phrases are skipped when loading
+
+# Asynchronous translation jobs (/jobs)
+JOB_DB = os.getenv("JOB_DB", "translation_jobs.db")  # Persistent job queue and partial results
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "1"))  # Jobs run at the same time
+JOB_CONCURRENCY = int(os.getenv("JOB_CONCURRENCY", "2"))  # Generations per job; keep below ADMISSION_MAX_CONCURRENCY
+JOB_BATCH_SIZE = int(os.getenv("JOB_BATCH_SIZE", "50"))  # Items recorded per step of an item job
+JOB_MAX_ITEMS = int(os.getenv("JOB_MAX_ITEMS", "100000"))  # Items accepted per job
+JOB_RETRY_DELAY = float(os.getenv("JOB_RETRY_DELAY", "5"))  # Seconds a job pauses while Ollama is down or work is shed
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "5"))  # Seconds between checks of the queue by idle workers
+JOB_RETENTION = float(os.getenv("JOB_RETENTION", str(7 * 24 * 3600)))  # Seconds finished jobs are kept; 0 keeps them forever
+
+# Serving (server.py)
+API_HOST = os.getenv("API_HOST", "0.0.0.0")
+API_PORT = int(os.getenv("API_PORT", "8000"))
+API_WORKERS = int(os.getenv("API_WORKERS", "1"))  # Worker processes; admission limits are split between them
+API_LOOP = os.getenv("API_LOOP", "auto")  # "auto" uses uvloop when installed, else "asyncio"
+API_HTTP = os.getenv("API_HTTP", "auto")  # "auto" uses httptools when installed, else "h11"
+API_GRACEFUL_SHUTDOWN_TIMEOUT = float(os.getenv("API_GRACEFUL_SHUTDOWN_TIMEOUT", "30"))  # Seconds in-flight requests get to finish on SIGTERM
+
+# State shared by worker processes when API_WORKERS > 1: Ollama health, metrics, cache purges
+SHARED_STATE_DB = os.getenv("SHARED_STATE_DB", "shared_state.db")  # Local SQLite file; empty gives each worker its own state
+SHARED_STATE_HEARTBEAT = float(os.getenv("SHARED_STATE_HEARTBEAT", "5"))  # Seconds between worker heartbeats and metrics publishes
+
+# Startup readiness (GET /health/ready): comma-separated subsystems that must be warm,
+# out of detector, phrase_table, ollama (first probe done), models (preloaded) and cache (expired entries swept)
+READINESS_REQUIRED = os.getenv("READINESS_REQUIRED", "detector,phrase_table,ollama")
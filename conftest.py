@@ -0,0 +1,10 @@
+"""
+Shared test setup: keep the module-level singletons off the SQLite files in the working directory.
+
+Set here rather than per test module, since whichever module imports config first fixes them.
+"""
+
+import os
+
+os.environ.setdefault("TM_DB", "")
+os.environ.setdefault("TRANSLATION_CACHE_DB", "")
@@ -0,0 +1,214 @@
+"""
+Long-document translation pipeline.
+
+The input is split into paragraphs and sentences with a script-aware segmenter, sentences
+are packed into chunks sized to a token budget, and chunks are translated concurrently with
+bounded parallelism. Whitespace and paragraph breaks are kept outside the model and put back
+verbatim, so the translated document has the same layout as the original.
+
+Segmentation is lazy and at most `concurrency` chunks are in flight or waiting to be emitted
+in order at a time, so memory stays flat beyond the input and output text themselves.
+"""
+
+import asyncio
+import logging
+import re
+import time
+from collections import deque
+from dataclasses import dataclass, asdict
+from typing import Iterator, List, Optional, Tuple
+
+from config import DOCUMENT_CHUNK_TOKENS, DOCUMENT_CONCURRENCY
+from translator import estimate_tokens, translate_text
+
+logger = logging.getLogger(__name__)
+
+_PARAGRAPH_BREAK = re.compile(r"\n[ \t]*\n\s*")
+# Sentence ends: Latin-style terminators followed by whitespace, or CJK / Indic / Arabic
+# terminators, which are not necessarily followed by a space.
+_SENTENCE_END = re.compile(r"[.!?;](?=\s)\s*|[。！？；｡．][」』”’)]?\s*|[।॥؟۔]\s*|\n\s*")
+
+
+@dataclass
+class DocumentChunk:
+    """One unit of translation and the layout around it."""
+    index: int
+    text: str
+    prefix: str = ""
+    suffix: str = ""
+    context: Optional[str] = None
+
+
+@dataclass
+class ChunkTiming:
+    """Per-chunk outcome reported back to the client."""
+    index: int
+    characters: int
+    seconds: float
+    translated: bool
+
+
+def iter_paragraphs(text: str) -> Iterator[Tuple[str, str]]:
+    """Yield (paragraph, separator) pairs; joining them reproduces the input."""
+    start = 0
+    for match in _PARAGRAPH_BREAK.finditer(text):
+        yield text[start:match.start()], match.group(0)
+        start = match.end()
+    yield text[start:], ""
+
+
+def iter_sentences(paragraph: str) -> Iterator[str]:
+    """Yield sentences with their trailing whitespace; joining them reproduces the paragraph."""
+    start = 0
+    for match in _SENTENCE_END.finditer(paragraph):
+        if match.end() > start:
+            yield paragraph[start:match.end()]
+            start = match.end()
+    if start < len(paragraph):
+        yield paragraph[start:]
+
+
+def _split_oversized(sentence: str, token_budget: int) -> Iterator[str]:
+    """Split a sentence that alone exceeds the budget, preferring whitespace boundaries."""
+    chars_per_token = max(1.0, len(sentence) / estimate_tokens(sentence))
+    max_chars = max(1, int(token_budget * chars_per_token))
+    while len(sentence) > max_chars:
+        cut = sentence.rfind(" ", 0, max_chars) + 1 or max_chars
+        yield sentence[:cut]
+        sentence = sentence[cut:]
+    if sentence:
+        yield sentence
+
+
+def iter_chunks(text: str, token_budget: int = DOCUMENT_CHUNK_TOKENS, context_sentences: int = 0) -> Iterator[DocumentChunk]:
+    """
+    Pack sentences into chunks of at most token_budget estimated tokens.
+    
+    Chunks never span a paragraph break. With context_sentences > 0 each chunk carries the
+    preceding source sentences as context for the model.
+    """
+    index = 0
+    recent = deque(maxlen=context_sentences or None)
+    pending_prefix = ""
+
+    def make_chunk(body: str) -> Optional[DocumentChunk]:
+        nonlocal index, pending_prefix
+        content = body.strip()
+        if not content:
+            pending_prefix += body
+            return None
+        leading = body[:len(body) - len(body.lstrip())]
+        trailing = body[len(body.rstrip()):]
+        context = " ".join(s.strip() for s in recent) if context_sentences else None
+        chunk = DocumentChunk(index=index, text=content, prefix=pending_prefix + leading, suffix=trailing, context=context or None)
+        pending_prefix = ""
+        index += 1
+        return chunk
+
+    for paragraph, separator in iter_paragraphs(text):
+        current = []
+        current_tokens = 0
+        for sentence in iter_sentences(paragraph):
+            for piece in _split_oversized(sentence, token_budget):
+                tokens = estimate_tokens(piece)
+                if current and current_tokens + tokens > token_budget:
+                    chunk = make_chunk("".join(current))
+                    if chunk:
+                        yield chunk
+                    if context_sentences:
+                        recent.extend(current)
+                    current = []
+                    current_tokens = 0
+                current.append(piece)
+                current_tokens += tokens
+        if current:
+            chunk = make_chunk("".join(current))
+            if chunk:
+                chunk.suffix += separator
+                yield chunk
+                separator = ""
+            if context_sentences:
+                recent.extend(current)
+        pending_prefix += separator
+
+    if pending_prefix:
+        # Trailing whitespace-only content: carried by an empty chunk that is never translated
+        yield DocumentChunk(index=index, text="", prefix=pending_prefix)
+
+
+@dataclass
+class DocumentResult:
+    translated_text: str
+    chunks: List[ChunkTiming]
+    seconds: float
+
+    @property
+    def failed_chunks(self) -> int:
+        return sum(1 for c in self.chunks if not c.translated)
+
+    def timings(self) -> List[dict]:
+        return [asdict(c) for c in self.chunks]
+
+
+async def translate_document(
+    text: str,
+    source_lang: str,
+    target_lang: str,
+    token_budget: int = DOCUMENT_CHUNK_TOKENS,
+    concurrency: int = DOCUMENT_CONCURRENCY,
+    context_sentences: int = 0,
+) -> DocumentResult:
+    """
+    Translate a long document chunk by chunk and rebuild its original layout.
+    
+    Chunks that cannot be translated are kept in the source language and reported with
+    translated=False.
+    """
+    started = time.monotonic()
+
+    async def run(chunk: DocumentChunk) -> Tuple[DocumentChunk, Optional[str], float]:
+        chunk_started = time.monotonic()
+        if not chunk.text:
+            return chunk, "", 0.0
+        translated = await translate_text(chunk.text, source_lang, target_lang, context=chunk.context)
+        return chunk, translated, time.monotonic() - chunk_started
+
+    pieces: List[str] = []
+    timings: List[ChunkTiming] = []
+    finished = {}
+    next_index = 0
+    in_flight = set()
+
+    def collect(done):
+        nonlocal next_index
+        for task in done:
+            chunk, translated, seconds = task.result()
+            finished[chunk.index] = (chunk, translated, seconds)
+        # Emit finished chunks in document order
+        while next_index in finished:
+            chunk, translated, seconds = finished.pop(next_index)
+            pieces.append(chunk.prefix + (translated if translated is not None else chunk.text) + chunk.suffix)
+            if chunk.text:
+                timings.append(ChunkTiming(chunk.index, len(chunk.text), round(seconds, 3), translated is not None))
+            next_index += 1
+
+    try:
+        for chunk in iter_chunks(text, token_budget, context_sentences):
+            # Chunks finished ahead of a slow one still count against the window until emitted
+            while in_flight and len(in_flight) + len(finished) >= concurrency:
+                done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                collect(done)
+            in_flight.add(asyncio.create_task(run(chunk)))
+        while in_flight:
+            done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+            collect(done)
+    finally:
+        for task in in_flight:
+            task.cancel()
+
+    result = DocumentResult("".join(pieces), timings, round(time.monotonic() - started, 3))
+    logger.info(
+        f"Translated document of {len(text)} chars in {len(timings)} chunks "
+        f"({result.failed_chunks} failed) in {result.seconds}s"
+    )
+    return result
@@ -0,0 +1,158 @@
+"""
+Per-request generation options.
+
+Instead of one fixed budget for every request, the planner estimates how many tokens the
+translation will need from the input size and language pair and sets `num_predict` to that
+estimate plus a safety margin, so short inputs stop early and long inputs are not cut off.
+The output/input token ratio starts from a default and is learned per language pair from the
+`eval_count` Ollama reports; a generation that hits the limit (`done_reason: "length"`) pushes
+the ratio up.
+
+`num_ctx` comes from a fixed list of buckets, by default a single one: Ollama reloads the model
+whenever the context size changes, so mixed traffic (short single translations next to
+batch-sized prompts) alternating between buckets would reload it over and over. With one
+bucket num_ctx never changes and a budget that does not fit is capped to the room left.
+Several buckets are opt-in, for deployments whose traffic stays within one of them.
+"""
+
+import math
+from typing import Dict, Optional, Tuple
+
+from config import (
+    PLANNER_DEFAULT_RATIO,
+    PLANNER_MARGIN,
+    PLANNER_MIN_PREDICT,
+    PLANNER_MAX_PREDICT,
+    PLANNER_CTX_BUCKETS,
+)
+
+_EWMA_WEIGHT = 0.1
+_SLACK_TOKENS = 16  # Covers stray whitespace, quotes and the end-of-sequence token
+_BATCH_ITEM_TOKENS = 8  # JSON key, quotes and separators per item of a batch prompt
+_DEFAULT_TOKENS_PER_SECOND = 30.0  # Output speed assumed for a model before any is observed
+
+# Sampling options shared by every request; also part of the translation cache key
+GENERATION_OPTIONS = {
+    "temperature": 0.1,  # Low temperature for more consistent translations
+    "top_p": 0.9,
+}
+
+
+class GenerationPlanner:
+    """Size num_predict / num_ctx per request from learned output/input token ratios."""
+
+    def __init__(
+        self,
+        default_ratio: float = PLANNER_DEFAULT_RATIO,
+        margin: float = PLANNER_MARGIN,
+        min_predict: int = PLANNER_MIN_PREDICT,
+        max_predict: int = PLANNER_MAX_PREDICT,
+        ctx_buckets: str = PLANNER_CTX_BUCKETS,
+    ):
+        self.default_ratio = default_ratio
+        self.margin = margin
+        self.min_predict = min_predict
+        self.max_predict = max_predict
+        self.ctx_buckets = sorted(int(b) for b in ctx_buckets.split(",") if b.strip())
+        self._ratios: Dict[Tuple[str, str], float] = {}  # (source, target) -> EWMA output/input tokens
+        self._token_rates: Dict[str, float] = {}  # model -> EWMA output tokens per second
+        self.stats = {"planned": 0, "observed": 0, "truncated": 0}
+
+    def ratio(self, source_lang: str, target_lang: str) -> float:
+        return self._ratios.get((source_lang.lower(), target_lang.lower()), self.default_ratio)
+
+    def tokens_per_second(self, model: str) -> float:
+        return self._token_rates.get(model, _DEFAULT_TOKENS_PER_SECOND)
+
+    def expected_output(self, num_predict: int) -> float:
+        """Invert plan(): the output tokens a generation planned with num_predict was expected to produce."""
+        return max(0.0, (num_predict - _SLACK_TOKENS) / self.margin)
+
+    def plan(
+        self,
+        input_tokens: int,
+        prompt_tokens: int,
+        source_lang: str,
+        target_lang: str,
+        items: int = 1,
+        single_line: bool = False,
+    ) -> dict:
+        """
+        Return the options for one generation.
+
+        input_tokens is the estimated size of the text(s) to translate and prompt_tokens the size
+        of the whole prompt. A single-line input also stops at the first blank line, which is
+        where models start appending notes and explanations.
+        """
+        expected = input_tokens * self.ratio(source_lang, target_lang)
+        if items > 1:
+            expected += items * _BATCH_ITEM_TOKENS
+        num_predict = math.ceil(expected * self.margin) + _SLACK_TOKENS
+        num_predict = max(self.min_predict, min(self.max_predict, num_predict))
+
+        options = dict(GENERATION_OPTIONS, **self._fit(prompt_tokens, num_predict))
+        if single_line and items == 1:
+            options["stop"] = ["\n\n"]
+        self.stats["planned"] += 1
+        return options
+
+    def retry(self, options: dict, prompt_tokens: int) -> Optional[dict]:
+        """
+        Return the options for retrying a generation that hit num_predict, or None if no larger
+        budget fits.
+
+        The retry asks for max_predict tokens, with num_ctx re-planned so that the prompt and the
+        larger budget still fit; without a big enough bucket the budget is capped to the room left.
+        """
+        retried = dict(options, **self._fit(prompt_tokens, self.max_predict))
+        if retried["num_predict"] <= options["num_predict"]:
+            return None
+        return retried
+
+    def _fit(self, prompt_tokens: int, num_predict: int) -> dict:
+        """Pick the smallest bucket fitting prompt + num_predict, capping num_predict to the largest."""
+        needed = prompt_tokens + num_predict
+        num_ctx = next((b for b in self.ctx_buckets if b >= needed), self.ctx_buckets[-1])
+        num_predict = max(self.min_predict, min(num_predict, num_ctx - prompt_tokens))
+        return {"num_predict": num_predict, "num_ctx": num_ctx}
+
+    def observe(self, input_tokens: int, result: dict, source_lang: str, target_lang: str, items: int = 1) -> bool:
+        """
+        Learn from a finished generation. Returns True if the output was cut off by num_predict.
+        """
+        eval_count = result.get("eval_count")
+        if eval_count and result.get("eval_duration") and result.get("model"):
+            model = result["model"]
+            current = self._token_rates.get(model, _DEFAULT_TOKENS_PER_SECOND)
+            self._token_rates[model] = current + _EWMA_WEIGHT * (eval_count / (result["eval_duration"] / 1e9) - current)
+        if not eval_count or input_tokens <= 0:
+            return False
+        if items > 1:
+            eval_count = max(1, eval_count - items * _BATCH_ITEM_TOKENS)
+        truncated = result.get("done_reason") == "length"
+        sample = eval_count / input_tokens
+        if truncated:
+            # The real ratio is at least this; overshoot so the next request gets more room
+            sample *= self.margin
+            self.stats["truncated"] += 1
+        key = (source_lang.lower(), target_lang.lower())
+        current = self._ratios.get(key, self.default_ratio)
+        self._ratios[key] = current + _EWMA_WEIGHT * (sample - current)
+        self.stats["observed"] += 1
+        return truncated
+
+    def get_stats(self) -> dict:
+        stats = dict(self.stats)
+        stats.update({
+            "default_ratio": self.default_ratio,
+            "margin": self.margin,
+            "min_predict": self.min_predict,
+            "max_predict": self.max_predict,
+            "ctx_buckets": self.ctx_buckets,
+            "ratios": {f"{s}:{t}": round(r, 3) for (s, t), r in sorted(self._ratios.items())},
+            "tokens_per_second": {model: round(rate, 1) for model, rate in sorted(self._token_rates.items())},
+        })
+        return stats
+
+
+generation_planner = GenerationPlanner()
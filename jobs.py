@@ -0,0 +1,331 @@
+"""
+Asynchronous translation jobs.
+
+Jobs are stored in SQLite together with every unit of work already finished (a batch item or a
+document chunk), so a job survives a restart and resumes where it stopped instead of starting
+over. A small pool of background workers claims queued jobs oldest first and runs them through
+a handler registered for the job kind. Handlers record results as they go, which is what
+GET /jobs/{id} reports as progress and partial results.
+
+With several worker processes every process runs JOB_WORKERS workers over the same database.
+Claims are atomic, and interrupted jobs are requeued only by the first worker of a server run.
+"""
+
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass, asdict
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from config import JOB_DB, JOB_WORKERS, JOB_POLL_INTERVAL, JOB_RETENTION
+from shared_state import shared_state
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+FINISHED = (COMPLETED, FAILED, CANCELLED)
+
+
+@dataclass
+class Job:
+    """A job's stored state (without its per-unit results)."""
+    id: str
+    kind: str
+    status: str
+    payload: dict
+    total: int
+    completed: int = 0
+    failed: int = 0
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    created_at: float = 0.0
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    def to_dict(self) -> dict:
+        data = asdict(self)
+        del data["payload"]
+        return data
+
+
+# A handler runs one job to completion and returns its final result
+JobHandler = Callable[[Job, "JobQueue"], Awaitable[Optional[dict]]]
+
+
+class JobQueue:
+    """SQLite-backed job queue with in-process background workers."""
+
+    def __init__(self, db_path: str = JOB_DB, workers: int = JOB_WORKERS, poll_interval: float = JOB_POLL_INTERVAL):
+        self.db_path = db_path
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self._handlers: Dict[str, JobHandler] = {}
+        self._db: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._wake: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+        self._running: Dict[str, asyncio.Task] = {}  # job id -> task running it
+        self.stats = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "cancelled": 0,
+            "resumed": 0,
+        }
+
+    def register(self, kind: str, handler: JobHandler):
+        """Set the handler that runs jobs of this kind."""
+        self._handlers[kind] = handler
+
+    def _open_db(self):
+        self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                status TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                total INTEGER NOT NULL,
+                completed INTEGER NOT NULL DEFAULT 0,
+                failed INTEGER NOT NULL DEFAULT 0,
+                result TEXT,
+                error TEXT,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL
+            )
+            """
+        )
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS job_results (
+                job_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                result TEXT NOT NULL,
+                PRIMARY KEY (job_id, seq)
+            )
+            """
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at)")
+        # Jobs that were running when the server stopped go back to the queue; other workers' jobs are still running
+        resumed = 0
+        if shared_state.first_worker:
+            resumed = self._db.execute("UPDATE jobs SET status = ? WHERE status = ?", (QUEUED, RUNNING)).rowcount
+        if resumed:
+            self.stats["resumed"] += resumed
+            logger.info(f"Requeued {resumed} interrupted job(s)")
+        if JOB_RETENTION > 0:
+            expired = [row[0] for row in self._db.execute(
+                f"SELECT id FROM jobs WHERE status IN ({','.join('?' * len(FINISHED))}) AND finished_at < ?",
+                FINISHED + (time.time() - JOB_RETENTION,),
+            )]
+            for job_id in expired:
+                self._db.execute("DELETE FROM job_results WHERE job_id = ?", (job_id,))
+                self._db.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+        self._db.commit()
+
+    async def _call(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, fn, *args)
+
+    async def submit(self, kind: str, payload: dict, total: int) -> Job:
+        """Store a new job and wake a worker."""
+        if kind not in self._handlers:
+            raise ValueError(f"Unknown job kind {kind!r}")
+        job = Job(id=uuid.uuid4().hex, kind=kind, status=QUEUED, payload=payload, total=total, created_at=time.time())
+        await self._call(self._db_insert, job)
+        self.stats["submitted"] += 1
+        if self._wake is not None:
+            self._wake.set()
+        return job
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        return await self._call(self._db_get, job_id)
+
+    async def results(self, job_id: str, offset: int = 0, limit: int = 100) -> List[Tuple[int, dict]]:
+        """Return (seq, result) pairs recorded so far, ordered by seq."""
+        return await self._call(self._db_results, job_id, offset, limit)
+
+    async def done_units(self, job_id: str) -> Set[int]:
+        """Sequence numbers already recorded for a job, so a resumed job can skip them."""
+        return await self._call(self._db_done_units, job_id)
+
+    async def record(self, job_id: str, results: List[Tuple[int, dict, bool]]):
+        """
+        Store finished units as (seq, result, ok) and update the job's progress counters.
+
+        Stops the job if it was cancelled through another worker process in the meantime.
+        """
+        status = await self._call(self._db_record, job_id, results)
+        if status == CANCELLED:
+            raise asyncio.CancelledError()
+
+    async def cancel(self, job_id: str) -> Optional[Job]:
+        """Cancel a queued or running job. Returns the job, or None if it does not exist."""
+        job = await self.get(job_id)
+        if job is None or job.status in FINISHED:
+            return job
+        await self._call(self._db_finish, job_id, CANCELLED, None, "Cancelled by client")
+        self.stats["cancelled"] += 1
+        task = self._running.get(job_id)
+        if task is not None:
+            task.cancel()
+        return await self.get(job_id)
+
+    async def start(self):
+        """Open the database and start the workers."""
+        if self._tasks:
+            return
+        if self._db is None:
+            self._open_db()
+        self._wake = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker(n)) for n in range(self.workers)]
+
+    async def stop(self):
+        """Stop the workers; running jobs stay marked running and are requeued on the next start."""
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+        if self._db is not None:
+            with self._lock:
+                self._db.close()
+            self._db = None
+
+    async def _worker(self, number: int):
+        while True:
+            job = await self._call(self._db_claim)
+            if job is None:
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            logger.info(f"Worker {number} running {job.kind} job {job.id} ({job.completed}/{job.total} done)")
+            task = asyncio.create_task(self._handlers[job.kind](job, self))
+            self._running[job.id] = task
+            try:
+                result = await asyncio.shield(task)
+            except asyncio.CancelledError:
+                if not task.cancelled():
+                    # The worker itself is stopping; leave the job to be requeued
+                    task.cancel()
+                    raise
+                logger.info(f"Job {job.id} cancelled")
+                continue
+            except Exception as e:
+                logger.error(f"Job {job.id} failed: {str(e)}")
+                await self._call(self._db_finish, job.id, FAILED, None, str(e))
+                self.stats["failed"] += 1
+                continue
+            finally:
+                self._running.pop(job.id, None)
+            await self._call(self._db_finish, job.id, COMPLETED, result, None)
+            self.stats["completed"] += 1
+            logger.info(f"Job {job.id} completed")
+
+    def get_stats(self) -> dict:
+        stats = dict(self.stats)
+        stats["running"] = len(self._running)
+        stats["workers"] = self.workers
+        if self._db is not None:
+            with self._lock:
+                stats["queued"] = self._db.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (QUEUED,)).fetchone()[0]
+        return stats
+
+    def _row_to_job(self, row) -> Job:
+        return Job(
+            id=row[0], kind=row[1], status=row[2], payload=json.loads(row[3]), total=row[4],
+            completed=row[5], failed=row[6], result=json.loads(row[7]) if row[7] else None, error=row[8],
+            created_at=row[9], started_at=row[10], finished_at=row[11],
+        )
+
+    _COLUMNS = "id, kind, status, payload, total, completed, failed, result, error, created_at, started_at, finished_at"
+
+    def _db_insert(self, job: Job):
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO jobs (id, kind, status, payload, total, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (job.id, job.kind, job.status, json.dumps(job.payload, ensure_ascii=False), job.total, job.created_at),
+            )
+            self._db.commit()
+
+    def _db_get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            row = self._db.execute(f"SELECT {self._COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def _db_claim(self) -> Optional[Job]:
+        with self._lock:
+            while True:
+                row = self._db.execute(
+                    f"SELECT {self._COLUMNS} FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1", (QUEUED,)
+                ).fetchone()
+                if row is None:
+                    return None
+                # Conditional, so that of several worker processes only one claims the job
+                claimed = self._db.execute(
+                    "UPDATE jobs SET status = ?, started_at = COALESCE(started_at, ?) WHERE id = ? AND status = ?",
+                    (RUNNING, time.time(), row[0], QUEUED),
+                ).rowcount
+                self._db.commit()
+                if claimed:
+                    break
+        job = self._row_to_job(row)
+        job.status = RUNNING
+        return job
+
+    def _db_results(self, job_id: str, offset: int, limit: int) -> List[Tuple[int, dict]]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT seq, result FROM job_results WHERE job_id = ? ORDER BY seq LIMIT ? OFFSET ?",
+                (job_id, limit, offset),
+            ).fetchall()
+        return [(seq, json.loads(result)) for seq, result in rows]
+
+    def _db_done_units(self, job_id: str) -> Set[int]:
+        with self._lock:
+            return {row[0] for row in self._db.execute("SELECT seq FROM job_results WHERE job_id = ?", (job_id,))}
+
+    def _db_record(self, job_id: str, results: List[Tuple[int, dict, bool]]):
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO job_results (job_id, seq, result) VALUES (?, ?, ?)",
+                [(job_id, seq, json.dumps(result, ensure_ascii=False)) for seq, result, _ in results],
+            )
+            self._db.execute(
+                "UPDATE jobs SET completed = completed + ?, failed = failed + ? WHERE id = ?",
+                (len(results), sum(1 for _, _, ok in results if not ok), job_id),
+            )
+            self._db.commit()
+            row = self._db.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return row[0] if row else None
+
+    def _db_finish(self, job_id: str, status: str, result: Optional[dict], error: Optional[str]):
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ? AND status IN (?, ?)",
+                (status, json.dumps(result, ensure_ascii=False) if result is not None else None, error, time.time(), job_id, QUEUED, RUNNING),
+            )
+            self._db.commit()
+
+
+job_queue = JobQueue()
@@ -0,0 +1,183 @@
+"""
+Language detection.
+
+Text written in a script used by a single language (Hangul, Thai, Kana, Devanagari, ...) is
+resolved from its Unicode code points without running the n-gram model. Everything else goes
+to langdetect, seeded so results are deterministic. Results are kept in an LRU cache.
+
+langdetect and its language profiles (about a quarter of a second to load) are loaded on first
+use, which startup triggers in the background with preload().
+"""
+
+import logging
+import threading
+from bisect import bisect_right
+from collections import Counter
+from functools import lru_cache
+from typing import Optional
+
+from config import DETECTION_CACHE_SIZE, DETECTION_MAX_CHARS, DETECTION_SEED
+
+logger = logging.getLogger(__name__)
+
+_detector_lock = threading.Lock()
+_langdetect = None  # The langdetect module, once its profiles are loaded
+
+# Map language codes to full names
+LANGUAGE_MAP = {
+    'en': 'English', 'es': 'Spanish', 'fr': 'French', 'de': 'German',
+    'it': 'Italian', 'pt': 'Portuguese', 'ru': 'Russian', 'ja': 'Japanese',
+    'ko': 'Korean', 'zh': 'Chinese', 'ar': 'Arabic', 'hi': 'Hindi',
+    'bn': 'Bengali', 'ur': 'Urdu', 'tr': 'Turkish', 'nl': 'Dutch',
+    'sv': 'Swedish', 'da': 'Danish', 'no': 'Norwegian', 'fi': 'Finnish',
+    'pl': 'Polish', 'cs': 'Czech', 'sk': 'Slovak', 'hu': 'Hungarian',
+    'ro': 'Romanian', 'bg': 'Bulgarian', 'hr': 'Croatian', 'sr': 'Serbian',
+    'sl': 'Slovenian', 'et': 'Estonian', 'lv': 'Latvian', 'lt': 'Lithuanian',
+    'mt': 'Maltese', 'el': 'Greek', 'he': 'Hebrew', 'th': 'Thai',
+    'vi': 'Vietnamese', 'id': 'Indonesian', 'ms': 'Malay', 'tl': 'Filipino',
+    'sw': 'Swahili', 'af': 'Afrikaans', 'is': 'Icelandic', 'ga': 'Irish',
+    'cy': 'Welsh', 'eu': 'Basque', 'ca': 'Catalan', 'gl': 'Galician',
+    'fy': 'Frisian', 'lb': 'Luxembourgish', 'sq': 'Albanian', 'mk': 'Macedonian',
+    'bs': 'Bosnian', 'me': 'Montenegrin', 'ky': 'Kyrgyz', 'kk': 'Kazakh',
+    'uz': 'Uzbek', 'tk': 'Turkmen', 'tg': 'Tajik', 'mn': 'Mongolian',
+    'ka': 'Georgian', 'hy': 'Armenian', 'az': 'Azerbaijani', 'ku': 'Kurdish',
+    'fa': 'Persian', 'ps': 'Pashto', 'sd': 'Sindhi', 'ne': 'Nepali',
+    'si': 'Sinhala', 'my': 'Burmese', 'km': 'Khmer', 'lo': 'Lao',
+    'am': 'Amharic', 'ti': 'Tigrinya', 'so': 'Somali', 'ha': 'Hausa',
+    'yo': 'Yoruba', 'ig': 'Igbo', 'zu': 'Zulu', 'xh': 'Xhosa',
+    'st': 'Southern Sotho', 'tn': 'Tswana', 'ss': 'Swati', 've': 'Venda',
+    'ts': 'Tsonga', 'nr': 'Southern Ndebele', 'sn': 'Shona', 'rw': 'Kinyarwanda',
+    'lg': 'Ganda', 'ak': 'Akan', 'tw': 'Twi', 'ee': 'Ewe', 'ff': 'Fula',
+    'wo': 'Wolof', 'dy': 'Dyula', 'bm': 'Bambara', 'sg': 'Sango',
+    'ln': 'Lingala', 'sw': 'Swahili', 'mg': 'Malagasy', 'co': 'Corsican',
+    'oc': 'Occitan', 'an': 'Aragonese', 'ast': 'Asturian', 'ext': 'Extremaduran',
+    'lad': 'Ladino', 'sc': 'Sardinian', 'fur': 'Friulian', 'lld': 'Ladin',
+    'rm': 'Romansh', 'vec': 'Venetian', 'lmo': 'Lombard', 'pms': 'Piedmontese',
+    'eml': 'Emilian-Romagnol', 'lij': 'Ligurian', 'nap': 'Neapolitan',
+    'scn': 'Sicilian', 'cal': 'Calabrian', 'srd': 'Sardinian', 'it': 'Italian',
+    # Codes langdetect emits that have no entry above
+    'zh-cn': 'Chinese', 'zh-tw': 'Chinese', 'uk': 'Ukrainian', 'mr': 'Marathi',
+    'pa': 'Punjabi', 'gu': 'Gujarati', 'ta': 'Tamil', 'te': 'Telugu',
+    'kn': 'Kannada', 'ml': 'Malayalam'
+}
+
+# (first code point, last code point, script), sorted by first code point
+_SCRIPT_RANGES = [
+    (0x0370, 0x03FF, "Greek"),
+    (0x0400, 0x052F, "Cyrillic"),
+    (0x0530, 0x058F, "Armenian"),
+    (0x0590, 0x05FF, "Hebrew"),
+    (0x0600, 0x06FF, "Arabic"),
+    (0x0750, 0x077F, "Arabic"),
+    (0x0900, 0x097F, "Devanagari"),
+    (0x0980, 0x09FF, "Bengali"),
+    (0x0A00, 0x0A7F, "Gurmukhi"),
+    (0x0A80, 0x0AFF, "Gujarati"),
+    (0x0B80, 0x0BFF, "Tamil"),
+    (0x0C00, 0x0C7F, "Telugu"),
+    (0x0C80, 0x0CFF, "Kannada"),
+    (0x0D00, 0x0D7F, "Malayalam"),
+    (0x0D80, 0x0DFF, "Sinhala"),
+    (0x0E00, 0x0E7F, "Thai"),
+    (0x0E80, 0x0EFF, "Lao"),
+    (0x0F00, 0x0FFF, "Tibetan"),
+    (0x1000, 0x109F, "Myanmar"),
+    (0x10A0, 0x10FF, "Georgian"),
+    (0x1100, 0x11FF, "Hangul"),
+    (0x1200, 0x137F, "Ethiopic"),
+    (0x1780, 0x17FF, "Khmer"),
+    (0x3040, 0x30FF, "Kana"),
+    (0x3130, 0x318F, "Hangul"),
+    (0x31F0, 0x31FF, "Kana"),
+    (0x3400, 0x4DBF, "Han"),
+    (0x4E00, 0x9FFF, "Han"),
+    (0xAC00, 0xD7AF, "Hangul"),
+    (0xF900, 0xFAFF, "Han"),
+    (0xFF66, 0xFF9F, "Kana"),
+]
+_SCRIPT_STARTS = [start for start, _, _ in _SCRIPT_RANGES]
+
+# Scripts that identify a single language. Latin, Cyrillic and Arabic are shared by many
+# languages and always go to langdetect.
+_SCRIPT_LANGUAGE = {
+    "Greek": "Greek", "Armenian": "Armenian", "Hebrew": "Hebrew", "Devanagari": "Hindi",
+    "Bengali": "Bengali", "Gurmukhi": "Punjabi", "Gujarati": "Gujarati", "Tamil": "Tamil",
+    "Telugu": "Telugu", "Kannada": "Kannada", "Malayalam": "Malayalam", "Sinhala": "Sinhala",
+    "Thai": "Thai", "Lao": "Lao", "Tibetan": "Tibetan", "Myanmar": "Burmese",
+    "Georgian": "Georgian", "Hangul": "Korean", "Ethiopic": "Amharic", "Khmer": "Khmer",
+    "Han": "Chinese",
+}
+
+stats = {"fast_path": 0, "model": 0, "no_letters": 0}
+
+
+def script_of(char: str) -> str:
+    """Return the script name of a letter."""
+    code = ord(char)
+    if code < 0x0250:
+        return "Latin"
+    i = bisect_right(_SCRIPT_STARTS, code) - 1
+    if i >= 0 and code <= _SCRIPT_RANGES[i][1]:
+        return _SCRIPT_RANGES[i][2]
+    return "Other"
+
+
+def classify_script(text: str) -> Optional[str]:
+    """
+    Resolve the language from the script alone when that is unambiguous.
+    
+    Returns "Unknown" for text without letters and None when the n-gram model is needed.
+    """
+    counts = Counter(script_of(c) for c in text if c.isalpha())
+    if not counts:
+        return "Unknown"
+    total = sum(counts.values())
+    # Kana only appears in Japanese, which also uses Han characters
+    if counts["Kana"] and counts["Kana"] + counts["Han"] * 2 > total:
+        return "Japanese"
+    script, count = counts.most_common(1)[0]
+    if count * 2 <= total:
+        return None  # Mixed scripts
+    return _SCRIPT_LANGUAGE.get(script)
+
+
+@lru_cache(maxsize=DETECTION_CACHE_SIZE)
+def _detect_sample(sample: str) -> str:
+    language = classify_script(sample)
+    if language == "Unknown":
+        stats["no_letters"] += 1
+        return language
+    if language is not None:
+        stats["fast_path"] += 1
+        return language
+    stats["model"] += 1
+    langdetect = _langdetect or preload()
+    try:
+        code = langdetect.detect(sample)
+    except langdetect.LangDetectException:
+        return "Unknown"
+    return LANGUAGE_MAP.get(code, code.title())
+
+
+def preload():
+    """Import langdetect and load its language profiles; safe to call from several threads."""
+    global _langdetect
+    with _detector_lock:
+        if _langdetect is None:
+            import langdetect
+            from langdetect import detector_factory
+            langdetect.DetectorFactory.seed = DETECTION_SEED
+            detector_factory.init_factory()
+            _langdetect = langdetect
+    return _langdetect
+
+
+def detect_language(text: str) -> str:
+    """Detect the language of the input text."""
+    return _detect_sample(text.strip()[:DETECTION_MAX_CHARS])
+
+
+def get_stats() -> dict:
+    """Return fast-path/model counters and cache hit rates."""
+    info = _detect_sample.cache_info()
+    return dict(stats, cache_hits=info.hits, cache_misses=info.misses, cache_size=info.currsize, cache_max_size=info.maxsize)
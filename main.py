@@ -1,73 +1,80 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-import requests
-import os
-from langdetect import detect, LangDetectException
-from typing import Optional
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.background import BackgroundTask
+from pydantic import BaseModel, Field
+from typing import Any, Dict, List, Optional
+import asyncio
+import json
 import logging
+import os
+
+from config import (
+    OLLAMA_BASE_URL, OLLAMA_MODEL, BATCH_MAX_ITEMS, BATCH_CONCURRENCY, DOCUMENT_MAX_CHARS, DOCUMENT_CHUNK_TOKENS,
+    JOB_MAX_ITEMS, JOB_BATCH_SIZE, JOB_CONCURRENCY, JOB_RETRY_DELAY, MULTI_MAX_TARGETS,
+)
+from admission import admission_controller, current_priority, PRIORITIES
+from backend_pool import get_pool, close_pool
+from ollama_client import OllamaError
+from ollama_health import health_monitor
+from translation_cache import translation_cache, make_key
+from translation_memory import translation_memory
+from language_detection import detect_language
+import language_detection
+from translator import CACHE_KEY_OPTIONS, translate_text, stream_translation, translation_flights
+from batch_translator import translate_batch
+from multi_target import translate_targets
+from document_translator import translate_document, iter_chunks
+from resource_translator import FORMATS, parse_resource, translate_resource
+from jobs import job_queue, Job, JobQueue
+from phrase_table import phrase_table
+from model_router import model_router
+from generation_planner import generation_planner
+import metrics
+from metrics import MetricsMiddleware, FALLBACKS, stage_timer
+from request_lifecycle import RequestLifecycleMiddleware, cancellations, format_stream_event
+from span_protection import span_protector
+from shared_state import shared_state
+from readiness import readiness
 # Fallback translator functions
 def create_fallback_response(text: str, detected_lang: str, target_lang: str) -> dict:
-    """Create a fallback response when Ollama is not available."""
-    fallback_translations = {
-        "hello": {
-            "Spanish": "hola",
-            "French": "bonjour", 
-            "German": "hallo",
-            "Italian": "ciao",
-            "Portuguese": "olá",
-            "Russian": "привет",
-            "Japanese": "こんにちは",
-            "Korean": "안녕하세요",
-            "Chinese": "你好",
-            "Arabic": "مرحبا",
-            "Hindi": "नमस्ते"
-        },
-        "thank you": {
-            "Spanish": "gracias",
-            "French": "merci",
-            "German": "danke",
-            "Italian": "grazie", 
-            "Portuguese": "obrigado",
-            "Russian": "спасибо",
-            "Japanese": "ありがとう",
-            "Korean": "감사합니다",
-            "Chinese": "谢谢",
-            "Arabic": "شكرا",
-            "Hindi": "धन्यवाद"
-        },
-        "goodbye": {
-            "Spanish": "adiós",
-            "French": "au revoir",
-            "German": "auf wiedersehen",
-            "Italian": "arrivederci",
-            "Portuguese": "adeus",
-            "Russian": "до свидания",
-            "Japanese": "さようなら",
-            "Korean": "안녕히 가세요",
-            "Chinese": "再见",
-            "Arabic": "مع السلامة",
-            "Hindi": "अलविदा"
-        }
-    }
+    """
+    Create a fallback response from the phrase table when Ollama is not available.
     
-    # Try to find a fallback translation
-    text_lower = text.lower().strip()
-    for phrase, translations in fallback_translations.items():
-        if phrase in text_lower:
-            if target_lang in translations:
-                return {
-                    "original_text": text,
-                    "translated_text": translations[target_lang],
-                    "detected_language": detected_lang,
-                    "source_language": detected_lang,
-                    "target_language": target_lang,
-                    "confidence": 0.3,
-                    "fallback_used": True,
-                    "message": f"Fallback translation used for '{phrase}'"
-                }
+    Only phrases covering the whole text are used as the translation. A phrase found in part of
+    the text is not a translation of it: the text is returned as it is, with that phrase's
+    translation in partial_translation.
+    """
+    match = phrase_table.translate(text, target_lang)
+    if match is not None and match["covered"]:
+        FALLBACKS.labels("phrase_covered").inc()
+        phrases = ", ".join(f"'{phrase}'" for phrase in match["phrases"])
+        return {
+            "original_text": text,
+            "translated_text": match["translated_text"],
+            "detected_language": detected_lang,
+            "source_language": detected_lang,
+            "target_language": target_lang,
+            "confidence": 0.5,
+            "fallback_used": True,
+            "message": f"Fallback translation used for {phrases}"
+        }
+    if match is not None:
+        FALLBACKS.labels("phrase_partial").inc()
+        return {
+            "original_text": text,
+            "translated_text": text,
+            "detected_language": detected_lang,
+            "source_language": detected_lang,
+            "target_language": target_lang,
+            "confidence": 0.1,
+            "fallback_used": True,
+            "partial_translation": match["translated_text"],
+            "message": f"No fallback translation available for the whole text, only for '{match['phrases'][0]}' (see partial_translation). Please ensure Ollama is running."
+        }
     
     # If no fallback found, return the original text with a message
+    FALLBACKS.labels("none").inc()
     return {
         "original_text": text,
         "translated_text": text,
@@ -82,6 +89,7 @@ def create_fallback_response(text: str, detected_lang: str, target_lang: str) ->
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
+logging.getLogger("httpx").setLevel(logging.WARNING)  # Don't log every pooled Ollama call
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -90,6 +98,10 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# Cancel work for clients that disconnect and enforce X-Request-Timeout deadlines; innermost so
+# its 504s get CORS headers and cancelled requests are still counted in the metrics
+app.add_middleware(RequestLifecycleMiddleware)
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -99,9 +111,48 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Ollama configuration
-OLLAMA_BASE_URL = "http://localhost:11434"
-OLLAMA_MODEL = "mistral:latest"  # You can change this to any model you have pulled
+# Per-endpoint request metrics, exposed with the service counters at /metrics
+app.add_middleware(MetricsMiddleware)
+metrics.register_service_metrics()
+
+async def start_pipeline():
+    """
+    Start what translating needs: the health monitor, the model warm-up and the background
+    warm-ups tracked for /health/ready. The Ollama backend pool is opened by the first probe, in
+    the background. Also used by the bulk CLI, which must not run API jobs.
+    """
+    await health_monitor.start()
+    await model_router.start()
+    loop = asyncio.get_running_loop()
+    readiness.warm("detector", loop.run_in_executor(None, language_detection.preload))
+    readiness.warm("phrase_table", phrase_table.start())
+    readiness.warm("ollama", health_monitor.wait_probed())
+    readiness.warm("models", model_router.warm_up_task())
+    readiness.warm("cache", translation_cache.sweep_expired())
+
+async def stop_pipeline():
+    """Stop what start_pipeline() started, close the Ollama backend pool and the SQLite tiers."""
+    await readiness.stop()
+    await model_router.stop()
+    await health_monitor.stop()
+    await phrase_table.stop()
+    await close_pool()
+    translation_cache.close()
+    translation_memory.close()
+
+@app.on_event("startup")
+async def startup():
+    """Join the other worker processes, start the translation pipeline and the job workers."""
+    await shared_state.start(metrics.snapshot)
+    await start_pipeline()
+    await job_queue.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Stop the job workers and the translation pipeline, then leave the shared state."""
+    await job_queue.stop()
+    await stop_pipeline()
+    await shared_state.stop()
 
 # Pydantic models
 class TranslationRequest(BaseModel):
@@ -117,120 +168,135 @@ class TranslationResponse(BaseModel):
     target_language: str
     confidence: Optional[float] = None
     fallback_used: Optional[bool] = False
+    cached: Optional[bool] = False
+    partial_translation: Optional[str] = None  # Phrase-table translation of part of the text, when no full one exists
+    message: Optional[str] = None
+
+class MultiTargetTranslationRequest(BaseModel):
+    text: str
+    source_language: Optional[str] = None
+    target_languages: List[str] = Field(..., min_length=1, max_length=MULTI_MAX_TARGETS)
+
+class MultiTargetTranslationResponse(BaseModel):
+    original_text: str
+    detected_language: str
+    source_language: str
+    translations: List[TranslationResponse]
+    total: int
+    translated: int
+    cached: int
+    fallback: int
+
+class BatchTranslationItem(BaseModel):
+    id: Optional[str] = None
+    text: str
+    source_language: Optional[str] = None
+    target_language: str = "English"
+
+class BatchTranslationRequest(BaseModel):
+    items: List[BatchTranslationItem] = Field(..., min_length=1, max_length=BATCH_MAX_ITEMS)
+
+class BatchTranslationResult(TranslationResponse):
+    id: Optional[str] = None
+
+class BatchTranslationResponse(BaseModel):
+    results: List[BatchTranslationResult]
+    total: int
+    translated: int
+    cached: int
+    fallback: int
+
+class DocumentTranslationRequest(BaseModel):
+    text: str = Field(..., max_length=DOCUMENT_MAX_CHARS)
+    source_language: Optional[str] = None
+    target_language: str = "English"
+    chunk_tokens: int = Field(DOCUMENT_CHUNK_TOKENS, ge=50, le=2000)
+    context_sentences: int = Field(0, ge=0, le=5)
+
+class ChunkTimingResponse(BaseModel):
+    index: int
+    characters: int
+    seconds: float
+    translated: bool
+
+class DocumentTranslationResponse(BaseModel):
+    translated_text: str
+    detected_language: str
+    source_language: str
+    target_language: str
+    characters: int
+    chunks: int
+    failed_chunks: int
+    seconds: float
+    chunk_timings: List[ChunkTimingResponse]
     message: Optional[str] = None
 
+class ResourceTranslationRequest(BaseModel):
+    content: str = Field(..., max_length=DOCUMENT_MAX_CHARS)
+    format: str = "json"
+    source_language: Optional[str] = None
+    target_language: str = "English"
+
+class ResourceTranslationResponse(BaseModel):
+    content: str
+    format: str
+    detected_language: str
+    source_language: str
+    target_language: str
+    strings: int
+    unique_strings: int
+    cached: int
+    translated: int
+    failed: int
+    seconds: float
+    message: Optional[str] = None
+
+class LanguageDetectionBatchRequest(BaseModel):
+    texts: List[str] = Field(..., min_length=1, max_length=BATCH_MAX_ITEMS)
+
+class LanguageDetectionResult(BaseModel):
+    text: str
+    detected_language: str
+
+class LanguageDetectionBatchResponse(BaseModel):
+    results: List[LanguageDetectionResult]
+
+class JobRequest(BaseModel):
+    text: Optional[str] = Field(None, max_length=DOCUMENT_MAX_CHARS)
+    items: Optional[List[BatchTranslationItem]] = Field(None, min_length=1, max_length=JOB_MAX_ITEMS)
+    source_language: Optional[str] = None
+    target_language: str = "English"
+    chunk_tokens: int = Field(DOCUMENT_CHUNK_TOKENS, ge=50, le=2000)
+    context_sentences: int = Field(0, ge=0, le=5)
+
+class JobResponse(BaseModel):
+    id: str
+    kind: str
+    status: str
+    total: int
+    completed: int
+    failed: int
+    progress: float
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+    result: Optional[Dict[str, Any]] = None
+    results: List[Dict[str, Any]] = []
+    results_offset: int = 0
+
 class HealthResponse(BaseModel):
     status: str
     message: str
 
-def detect_language(text: str) -> str:
-    """Detect the language of the input text."""
-    try:
-        detected_lang = detect(text)
-        # Map language codes to full names
-        language_map = {
-            'en': 'English', 'es': 'Spanish', 'fr': 'French', 'de': 'German',
-            'it': 'Italian', 'pt': 'Portuguese', 'ru': 'Russian', 'ja': 'Japanese',
-            'ko': 'Korean', 'zh': 'Chinese', 'ar': 'Arabic', 'hi': 'Hindi',
-            'bn': 'Bengali', 'ur': 'Urdu', 'tr': 'Turkish', 'nl': 'Dutch',
-            'sv': 'Swedish', 'da': 'Danish', 'no': 'Norwegian', 'fi': 'Finnish',
-            'pl': 'Polish', 'cs': 'Czech', 'sk': 'Slovak', 'hu': 'Hungarian',
-            'ro': 'Romanian', 'bg': 'Bulgarian', 'hr': 'Croatian', 'sr': 'Serbian',
-            'sl': 'Slovenian', 'et': 'Estonian', 'lv': 'Latvian', 'lt': 'Lithuanian',
-            'mt': 'Maltese', 'el': 'Greek', 'he': 'Hebrew', 'th': 'Thai',
-            'vi': 'Vietnamese', 'id': 'Indonesian', 'ms': 'Malay', 'tl': 'Filipino',
-            'sw': 'Swahili', 'af': 'Afrikaans', 'is': 'Icelandic', 'ga': 'Irish',
-            'cy': 'Welsh', 'eu': 'Basque', 'ca': 'Catalan', 'gl': 'Galician',
-            'fy': 'Frisian', 'lb': 'Luxembourgish', 'sq': 'Albanian', 'mk': 'Macedonian',
-            'bs': 'Bosnian', 'me': 'Montenegrin', 'ky': 'Kyrgyz', 'kk': 'Kazakh',
-            'uz': 'Uzbek', 'tk': 'Turkmen', 'tg': 'Tajik', 'mn': 'Mongolian',
-            'ka': 'Georgian', 'hy': 'Armenian', 'az': 'Azerbaijani', 'ku': 'Kurdish',
-            'fa': 'Persian', 'ps': 'Pashto', 'sd': 'Sindhi', 'ne': 'Nepali',
-            'si': 'Sinhala', 'my': 'Burmese', 'km': 'Khmer', 'lo': 'Lao',
-            'am': 'Amharic', 'ti': 'Tigrinya', 'so': 'Somali', 'ha': 'Hausa',
-            'yo': 'Yoruba', 'ig': 'Igbo', 'zu': 'Zulu', 'xh': 'Xhosa',
-            'st': 'Southern Sotho', 'tn': 'Tswana', 'ss': 'Swati', 've': 'Venda',
-            'ts': 'Tsonga', 'nr': 'Southern Ndebele', 'sn': 'Shona', 'rw': 'Kinyarwanda',
-            'lg': 'Ganda', 'ak': 'Akan', 'tw': 'Twi', 'ee': 'Ewe', 'ff': 'Fula',
-            'wo': 'Wolof', 'dy': 'Dyula', 'bm': 'Bambara', 'sg': 'Sango',
-            'ln': 'Lingala', 'sw': 'Swahili', 'mg': 'Malagasy', 'co': 'Corsican',
-            'oc': 'Occitan', 'an': 'Aragonese', 'ast': 'Asturian', 'ext': 'Extremaduran',
-            'lad': 'Ladino', 'sc': 'Sardinian', 'fur': 'Friulian', 'lld': 'Ladin',
-            'rm': 'Romansh', 'vec': 'Venetian', 'lmo': 'Lombard', 'pms': 'Piedmontese',
-            'eml': 'Emilian-Romagnol', 'lij': 'Ligurian', 'nap': 'Neapolitan',
-            'scn': 'Sicilian', 'cal': 'Calabrian', 'srd': 'Sardinian', 'it': 'Italian'
-        }
-        return language_map.get(detected_lang, detected_lang.title())
-    except LangDetectException:
-        return "Unknown"
-
 def check_ollama_status() -> bool:
-    """Check if Ollama is running and the model is available."""
-    try:
-        # Check if Ollama is running
-        response = requests.get(f"{OLLAMA_BASE_URL}/api/tags", timeout=5)
-        if response.status_code != 200:
-            return False
-        
-        # Check if the model is available
-        models = response.json().get("models", [])
-        model_names = [model.get("name", "") for model in models]
-        # Check for exact match or partial match (e.g., "mistral" matches "mistral:latest")
-        return any(ollama_model in model_name or model_name.startswith(ollama_model.split(':')[0]) 
-                  for model_name in model_names 
-                  for ollama_model in [OLLAMA_MODEL])
-        
-    except Exception as e:
-        logger.error(f"Ollama status check failed: {str(e)}")
-        return False
+    """Check if Ollama is running and the model is available (cached by the health monitor)."""
+    return health_monitor.is_available()
 
-def translate_text(text: str, source_lang: str, target_lang: str = "English") -> str:
-    """Translate text using Ollama with Mistral."""
-    try:
-        prompt = f"""
-        You are a professional translator. Translate the following text from {source_lang} to {target_lang}.
-        
-        Text to translate: "{text}"
-        
-        Please provide only the translated text without any additional explanations, quotes, or formatting.
-        """
-        
-        payload = {
-            "model": OLLAMA_MODEL,
-            "prompt": prompt,
-            "stream": False,
-            "options": {
-                "temperature": 0.1,  # Low temperature for more consistent translations
-                "top_p": 0.9,
-                "max_tokens": 500
-            }
-        }
-        
-        response = requests.post(
-            f"{OLLAMA_BASE_URL}/api/generate",
-            json=payload,
-            timeout=30
-        )
-        
-        if response.status_code == 200:
-            result = response.json()
-            translated_text = result.get("response", "").strip()
-            
-            # Clean up the response - remove quotes if present
-            if translated_text.startswith('"') and translated_text.endswith('"'):
-                translated_text = translated_text[1:-1]
-            
-            if translated_text:
-                return translated_text
-            else:
-                raise Exception("Empty response from Ollama")
-        else:
-            raise Exception(f"Ollama API error: {response.status_code} - {response.text}")
-            
-    except Exception as e:
-        logger.error(f"Translation error: {str(e)}")
-        # Return None to indicate fallback should be used
-        return None
+def set_request_priority(http_request: Request, default: str):
+    """Set the admission priority for this request from the X-Priority header, or the endpoint default."""
+    priority = http_request.headers.get("x-priority", default).lower()
+    current_priority.set(priority if priority in PRIORITIES else default)
 
 @app.get("/", response_model=HealthResponse)
 async def root():
@@ -250,8 +316,22 @@ async def health_check():
         message=f"Translation API is running. Ollama status: {ollama_status}"
     )
 
+@app.get("/health/live")
+async def liveness():
+    """Liveness probe: the process is up and serving requests."""
+    return {"status": "alive"}
+
+@app.get("/health/ready")
+async def readiness_check():
+    """
+    Readiness probe: 200 once every subsystem in READINESS_REQUIRED has warmed up, 503 until
+    then. The body lists each subsystem's warm-up state and time.
+    """
+    stats = readiness.get_stats()
+    return JSONResponse(stats, status_code=200 if stats["ready"] else 503)
+
 @app.post("/translate", response_model=TranslationResponse)
-async def translate(request: TranslationRequest):
+async def translate(request: TranslationRequest, http_request: Request):
     """
     Translate text using Ollama with Mistral.
     
@@ -259,17 +339,12 @@ async def translate(request: TranslationRequest):
     - **source_language**: Optional source language (if not provided, will be auto-detected)
     - **target_language**: Target language (defaults to English)
     """
+    set_request_priority(http_request, "interactive")
     try:
-        # Check if Ollama is available
-        if not check_ollama_status():
-            raise HTTPException(
-                status_code=503, 
-                detail="Ollama service not available. Please ensure Ollama is running and the mistral model is pulled."
-            )
-        
         # Detect language if not provided
         if not request.source_language:
-            detected_lang = detect_language(request.text)
+            with stage_timer("detect"):
+                detected_lang = detect_language(request.text)
             source_language = detected_lang
         else:
             source_language = request.source_language
@@ -288,8 +363,51 @@ async def translate(request: TranslationRequest):
                 message="Source and target languages are the same"
             )
         
+        # Return text with nothing to translate (numbers, URLs, placeholders, identifiers) as it is
+        if span_protector.bypass(request.text, source_language, request.target_language):
+            return TranslationResponse(
+                original_text=request.text,
+                translated_text=request.text,
+                detected_language=detected_lang,
+                source_language=source_language,
+                target_language=request.target_language,
+                confidence=1.0,
+                fallback_used=False,
+                message="Nothing to translate"
+            )
+        
+        # Serve repeated translations from the cache
+        model = model_router.select(request.text, source_language, request.target_language)
+        with stage_timer("cache_lookup"):
+            cache_key = make_key(request.text, source_language, request.target_language, model, CACHE_KEY_OPTIONS)
+            cached_text = await translation_cache.get(cache_key)
+        if cached_text is not None:
+            return TranslationResponse(
+                original_text=request.text,
+                translated_text=cached_text,
+                detected_language=detected_lang,
+                source_language=source_language,
+                target_language=request.target_language,
+                confidence=0.9,
+                fallback_used=False,
+                cached=True,
+                message="Translation served from cache"
+            )
+        
+        # Check if Ollama is available; serve a phrase-table translation during an outage if there is one
+        with stage_timer("status_check"):
+            ollama_available = check_ollama_status()
+        if not ollama_available:
+            fallback_response = create_fallback_response(request.text, detected_lang, request.target_language)
+            if fallback_response["translated_text"] != request.text:
+                return TranslationResponse(**fallback_response)
+            raise HTTPException(
+                status_code=503,
+                detail="Ollama service not available. Please ensure Ollama is running and the mistral model is pulled."
+            )
+
         # Try to translate the text with Ollama
-        translated_text = translate_text(request.text, source_language, request.target_language)
+        translated_text = await translate_text(request.text, source_language, request.target_language, model=model)
         
         # If Ollama failed, use fallback
         if translated_text is None:
@@ -298,6 +416,9 @@ async def translate(request: TranslationRequest):
             )
             return TranslationResponse(**fallback_response)
         
+        with stage_timer("cache_store"):
+            await translation_cache.set(cache_key, translated_text, source_language, request.target_language, model)
+        
         return TranslationResponse(
             original_text=request.text,
             translated_text=translated_text,
@@ -309,10 +430,743 @@ async def translate(request: TranslationRequest):
             message="Translation completed successfully using Ollama with Mistral"
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Translation request failed: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Translation failed: {str(e)}")
 
+@app.post("/translate/stream")
+async def translate_stream(request: TranslationRequest, http_request: Request):
+    """
+    Translate text and stream the translation as it is generated.
+    
+    Responds with Server-Sent Events, or NDJSON when the `Accept` header asks for
+    `application/x-ndjson`. Each `token` event carries a `text` delta; a final `done` event
+    carries the full translation response, and an `error` event is sent if generation fails
+    after text has already been streamed.
+    """
+    set_request_priority(http_request, "interactive")
+    ndjson = "application/x-ndjson" in http_request.headers.get("accept", "")
+    media_type = "application/x-ndjson" if ndjson else "text/event-stream"
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    
+    # Detect language if not provided
+    if not request.source_language:
+        detected_lang = detect_language(request.text)
+        source_language = detected_lang
+    else:
+        source_language = request.source_language
+        detected_lang = source_language
+    
+    def done(translated_text: str, **fields) -> str:
+        response = TranslationResponse(
+            original_text=request.text,
+            translated_text=translated_text,
+            detected_language=detected_lang,
+            source_language=source_language,
+            target_language=request.target_language,
+            **fields
+        )
+        return format_stream_event("done", response.model_dump(), ndjson)
+    
+    # Don't translate if source and target are the same
+    if source_language.lower() == request.target_language.lower():
+        event = done(request.text, confidence=1.0, message="Source and target languages are the same")
+        return StreamingResponse(iter([event]), media_type=media_type, headers=headers)
+    if span_protector.bypass(request.text, source_language, request.target_language):
+        event = done(request.text, confidence=1.0, message="Nothing to translate")
+        return StreamingResponse(iter([event]), media_type=media_type, headers=headers)
+    
+    # Serve repeated translations from the cache
+    model = model_router.select(request.text, source_language, request.target_language)
+    cache_key = make_key(request.text, source_language, request.target_language, model, CACHE_KEY_OPTIONS)
+    cached_text = await translation_cache.get(cache_key)
+    if cached_text is not None:
+        events = [
+            format_stream_event("token", {"text": cached_text}, ndjson),
+            done(cached_text, confidence=0.9, cached=True, message="Translation served from cache"),
+        ]
+        return StreamingResponse(iter(events), media_type=media_type, headers=headers)
+    
+    # Check if Ollama is available
+    if not check_ollama_status():
+        raise HTTPException(
+            status_code=503, 
+            detail="Ollama service not available. Please ensure Ollama is running and the mistral model is pulled."
+        )
+    
+    # Admit before the response starts so a shed request still gets a 429/503 status
+    ticket = await admission_controller.acquire()
+    
+    async def events():
+        parts = []
+        try:
+            async for delta in stream_translation(request.text, source_language, request.target_language, model=model):
+                parts.append(delta)
+                yield format_stream_event("token", {"text": delta}, ndjson)
+        except OllamaError as e:
+            if parts:
+                yield format_stream_event("error", {"detail": f"Translation failed: {str(e)}"}, ndjson)
+                return
+        finally:
+            ticket.release()
+        
+        translated_text = "".join(parts)
+        # If Ollama failed before producing any text, use fallback
+        if not translated_text:
+            fallback_response = create_fallback_response(request.text, detected_lang, request.target_language)
+            yield format_stream_event("done", TranslationResponse(**fallback_response).model_dump(), ndjson)
+            return
+        
+        await translation_cache.set(cache_key, translated_text, source_language, request.target_language, model)
+        yield done(
+            translated_text,
+            confidence=0.9,
+            message="Translation completed successfully using Ollama with Mistral"
+        )
+    
+    # The background task releases the slot if the client disconnects before streaming starts
+    return StreamingResponse(events(), media_type=media_type, headers=headers, background=BackgroundTask(ticket.release))
+
+async def plan_multi_target(request: MultiTargetTranslationRequest):
+    """
+    Detect the source language once and answer every target that needs no generation.
+    
+    Returns (detected_language, source_language, ready responses, pending (target, model, cache_key)).
+    Raises HTTPException(422) when a target language is repeated (case-insensitively) and
+    HTTPException(503) when Ollama is unavailable and nothing can be answered from the cache or
+    the phrase table.
+    """
+    seen = set()
+    for target_language in request.target_languages:
+        if target_language.lower() in seen:
+            raise HTTPException(status_code=422, detail=f"Target language {target_language!r} is repeated")
+        seen.add(target_language.lower())
+    
+    if not request.source_language:
+        with stage_timer("detect"):
+            detected_lang = detect_language(request.text)
+        source_language = detected_lang
+    else:
+        source_language = request.source_language
+        detected_lang = source_language
+    
+    ready: List[TranslationResponse] = []
+    pending = []
+    for target_language in request.target_languages:
+        # Don't translate if source and target are the same
+        if source_language.lower() == target_language.lower():
+            ready.append(TranslationResponse(
+                original_text=request.text,
+                translated_text=request.text,
+                detected_language=detected_lang,
+                source_language=source_language,
+                target_language=target_language,
+                confidence=1.0,
+                fallback_used=False,
+                message="Source and target languages are the same"
+            ))
+            continue
+        if span_protector.bypass(request.text, source_language, target_language):
+            ready.append(TranslationResponse(
+                original_text=request.text,
+                translated_text=request.text,
+                detected_language=detected_lang,
+                source_language=source_language,
+                target_language=target_language,
+                confidence=1.0,
+                fallback_used=False,
+                message="Nothing to translate"
+            ))
+            continue
+        
+        model = model_router.select(request.text, source_language, target_language)
+        with stage_timer("cache_lookup"):
+            cache_key = make_key(request.text, source_language, target_language, model, CACHE_KEY_OPTIONS)
+            cached_text = await translation_cache.get(cache_key)
+        if cached_text is not None:
+            ready.append(TranslationResponse(
+                original_text=request.text,
+                translated_text=cached_text,
+                detected_language=detected_lang,
+                source_language=source_language,
+                target_language=target_language,
+                confidence=0.9,
+                fallback_used=False,
+                cached=True,
+                message="Translation served from cache"
+            ))
+            continue
+        pending.append((target_language, model, cache_key))
+    
+    # Check once whether Ollama is available; serve phrase-table translations during an outage
+    if pending:
+        with stage_timer("status_check"):
+            ollama_available = check_ollama_status()
+        if not ollama_available:
+            fallbacks = [
+                TranslationResponse(**create_fallback_response(request.text, detected_lang, target_language))
+                for target_language, _, _ in pending
+            ]
+            if not ready and all(response.translated_text == request.text for response in fallbacks):
+                raise HTTPException(
+                    status_code=503,
+                    detail="Ollama service not available. Please ensure Ollama is running and the mistral model is pulled."
+                )
+            ready.extend(fallbacks)
+            pending = []
+    return detected_lang, source_language, ready, pending
+
+async def multi_target_results(
+    request: MultiTargetTranslationRequest,
+    detected_lang: str,
+    source_language: str,
+    pending: List[tuple],
+):
+    """Translate the pending targets, caching and yielding each response as soon as it is ready."""
+    targets = {target_language: (model, cache_key) for target_language, model, cache_key in pending}
+    async for target_language, translated_text in translate_targets(
+        request.text, source_language, [(target_language, model) for target_language, (model, _) in targets.items()]
+    ):
+        # If Ollama failed for this target, use fallback
+        if translated_text is None:
+            yield TranslationResponse(**create_fallback_response(request.text, detected_lang, target_language))
+            continue
+        
+        model, cache_key = targets[target_language]
+        with stage_timer("cache_store"):
+            await translation_cache.set(cache_key, translated_text, source_language, target_language, model)
+        yield TranslationResponse(
+            original_text=request.text,
+            translated_text=translated_text,
+            detected_language=detected_lang,
+            source_language=source_language,
+            target_language=target_language,
+            confidence=0.9,
+            fallback_used=False,
+            message="Translation completed successfully using Ollama with Mistral"
+        )
+
+def multi_target_counts(translations: List[TranslationResponse], translated: int) -> dict:
+    return {
+        "total": len(translations),
+        "translated": translated,
+        "cached": sum(1 for r in translations if r.cached),
+        "fallback": sum(1 for r in translations if r.fallback_used),
+    }
+
+@app.post("/translate/multi", response_model=MultiTargetTranslationResponse)
+async def translate_multi(request: MultiTargetTranslationRequest, http_request: Request):
+    """
+    Translate one text into several languages.
+    
+    - **text**: The text to translate
+    - **source_language**: Optional source language (detected once if not provided)
+    - **target_languages**: Target languages; each gets one entry in `translations`, in request order.
+      Repeating a language (in any case) is rejected with 422
+    
+    Short texts are translated into several languages per Ollama prompt; the remaining
+    generations run concurrently.
+    """
+    set_request_priority(http_request, "interactive")
+    try:
+        detected_lang, source_language, ready, pending = await plan_multi_target(request)
+        generated = [r async for r in multi_target_results(request, detected_lang, source_language, pending)]
+        
+        order = {}
+        for index, target_language in enumerate(request.target_languages):
+            order.setdefault(target_language.lower(), index)
+        translations = sorted(ready + generated, key=lambda r: order[r.target_language.lower()])
+        translated = sum(1 for r in generated if not r.fallback_used)
+        return MultiTargetTranslationResponse(
+            original_text=request.text,
+            detected_language=detected_lang,
+            source_language=source_language,
+            translations=translations,
+            **multi_target_counts(translations, translated)
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Multi-target translation request failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Translation failed: {str(e)}")
+
+@app.post("/translate/multi/stream")
+async def translate_multi_stream(request: MultiTargetTranslationRequest, http_request: Request):
+    """
+    Translate one text into several languages, streaming each translation as soon as it is ready.
+    
+    Responds with Server-Sent Events, or NDJSON when the `Accept` header asks for
+    `application/x-ndjson`. Each `translation` event carries the translation response for one
+    target language, in completion order (cached targets first); a final `done` event carries the
+    counts, and an `error` event is sent if translation fails after streaming has started.
+    """
+    set_request_priority(http_request, "interactive")
+    ndjson = "application/x-ndjson" in http_request.headers.get("accept", "")
+    media_type = "application/x-ndjson" if ndjson else "text/event-stream"
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    detected_lang, source_language, ready, pending = await plan_multi_target(request)
+    
+    async def events():
+        translations = list(ready)
+        translated = 0
+        for response in ready:
+            yield format_stream_event("translation", response.model_dump(), ndjson)
+        try:
+            async for response in multi_target_results(request, detected_lang, source_language, pending):
+                translations.append(response)
+                translated += not response.fallback_used
+                yield format_stream_event("translation", response.model_dump(), ndjson)
+        except Exception as e:
+            detail = e.detail if isinstance(e, HTTPException) else str(e)
+            logger.error(f"Multi-target translation stream failed: {detail}")
+            yield format_stream_event("error", {"detail": f"Translation failed: {detail}"}, ndjson)
+            return
+        yield format_stream_event("done", {
+            "original_text": request.text,
+            "detected_language": detected_lang,
+            "source_language": source_language,
+            **multi_target_counts(translations, translated),
+        }, ndjson)
+    
+    return StreamingResponse(events(), media_type=media_type, headers=headers)
+
+@app.post("/translate/batch", response_model=BatchTranslationResponse)
+async def translate_batch_endpoint(request: BatchTranslationRequest, http_request: Request):
+    """
+    Translate many texts in one call.
+    
+    - **items**: List of `{id, text, source_language, target_language}`; `id` is echoed back and
+      `source_language` is auto-detected when omitted
+    
+    Items are grouped by language pair and packed into shared Ollama prompts. Results are returned
+    in the same order as the request items.
+    """
+    set_request_priority(http_request, "bulk")
+    try:
+        return await run_batch_translation(request.items)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Batch translation request failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Batch translation failed: {str(e)}")
+
+async def run_batch_translation(items: List[BatchTranslationItem], concurrency: int = BATCH_CONCURRENCY) -> BatchTranslationResponse:
+    """
+    Translate items through the detection, cache, micro-batching and fallback pipeline.
+    
+    Shared by /translate/batch, translation jobs and the offline bulk CLI. Raises HTTPException(503)
+    when Ollama is unavailable and AdmissionRejected when the work is shed.
+    """
+    results: List[Optional[BatchTranslationResult]] = [None] * len(items)
+    pending = []  # (index, detected_language, source_language, model, cache_key)
+    translated = 0
+    
+    for index, item in enumerate(items):
+        # Detect language if not provided
+        if not item.source_language:
+            detected_lang = detect_language(item.text)
+            source_language = detected_lang
+        else:
+            source_language = item.source_language
+            detected_lang = source_language
+        
+        # Don't translate if source and target are the same
+        if source_language.lower() == item.target_language.lower():
+            results[index] = BatchTranslationResult(
+                id=item.id,
+                original_text=item.text,
+                translated_text=item.text,
+                detected_language=detected_lang,
+                source_language=source_language,
+                target_language=item.target_language,
+                confidence=1.0,
+                fallback_used=False,
+                message="Source and target languages are the same"
+            )
+            continue
+        if span_protector.bypass(item.text, source_language, item.target_language):
+            results[index] = BatchTranslationResult(
+                id=item.id,
+                original_text=item.text,
+                translated_text=item.text,
+                detected_language=detected_lang,
+                source_language=source_language,
+                target_language=item.target_language,
+                confidence=1.0,
+                fallback_used=False,
+                message="Nothing to translate"
+            )
+            continue
+        
+        model = model_router.select(item.text, source_language, item.target_language)
+        cache_key = make_key(item.text, source_language, item.target_language, model, CACHE_KEY_OPTIONS)
+        cached_text = await translation_cache.get(cache_key)
+        if cached_text is not None:
+            results[index] = BatchTranslationResult(
+                id=item.id,
+                original_text=item.text,
+                translated_text=cached_text,
+                detected_language=detected_lang,
+                source_language=source_language,
+                target_language=item.target_language,
+                confidence=0.9,
+                fallback_used=False,
+                cached=True,
+                message="Translation served from cache"
+            )
+            continue
+        
+        pending.append((index, detected_lang, source_language, model, cache_key))
+    
+    if pending:
+        # Check if Ollama is available
+        if not check_ollama_status():
+            raise HTTPException(
+                status_code=503, 
+                detail="Ollama service not available. Please ensure Ollama is running and the mistral model is pulled."
+            )
+        
+        translations = await translate_batch([
+            (items[index].text, source_language, items[index].target_language, model)
+            for index, _, source_language, model, _ in pending
+        ], concurrency=concurrency)
+        
+        for (index, detected_lang, source_language, model, cache_key), translated_text in zip(pending, translations):
+            item = items[index]
+            # If Ollama failed for this item, use fallback
+            if translated_text is None:
+                fallback_response = create_fallback_response(item.text, detected_lang, item.target_language)
+                results[index] = BatchTranslationResult(id=item.id, **fallback_response)
+                continue
+            
+            await translation_cache.set(cache_key, translated_text, source_language, item.target_language, model)
+            translated += 1
+            results[index] = BatchTranslationResult(
+                id=item.id,
+                original_text=item.text,
+                translated_text=translated_text,
+                detected_language=detected_lang,
+                source_language=source_language,
+                target_language=item.target_language,
+                confidence=0.9,
+                fallback_used=False,
+                message="Translation completed successfully using Ollama with Mistral"
+            )
+    
+    return BatchTranslationResponse(
+        results=results,
+        total=len(results),
+        translated=translated,
+        cached=sum(1 for r in results if r.cached),
+        fallback=sum(1 for r in results if r.fallback_used)
+    )
+
+@app.post("/translate/document", response_model=DocumentTranslationResponse)
+async def translate_document_endpoint(request: DocumentTranslationRequest, http_request: Request):
+    """
+    Translate a long document.
+    
+    - **text**: The document (paragraphs separated by blank lines are preserved)
+    - **source_language**: Optional source language (detected from the start of the document if omitted)
+    - **target_language**: Target language (defaults to English)
+    - **chunk_tokens**: Approximate source tokens per chunk sent to the model
+    - **context_sentences**: Number of preceding sentences passed to the model as context for each chunk
+    
+    The document is split into sentence-aligned chunks that are translated concurrently; chunks that
+    fail are kept in the source language and reported in `chunk_timings`.
+    """
+    set_request_priority(http_request, "bulk")
+    try:
+        # Detect language if not provided
+        if not request.source_language:
+            detected_lang = detect_language(request.text[:2000])
+            source_language = detected_lang
+        else:
+            source_language = request.source_language
+            detected_lang = source_language
+        
+        # Don't translate if source and target are the same
+        if source_language.lower() == request.target_language.lower():
+            return DocumentTranslationResponse(
+                translated_text=request.text,
+                detected_language=detected_lang,
+                source_language=source_language,
+                target_language=request.target_language,
+                characters=len(request.text),
+                chunks=0,
+                failed_chunks=0,
+                seconds=0.0,
+                chunk_timings=[],
+                message="Source and target languages are the same"
+            )
+        
+        # Check if Ollama is available
+        if not check_ollama_status():
+            raise HTTPException(
+                status_code=503, 
+                detail="Ollama service not available. Please ensure Ollama is running and the mistral model is pulled."
+            )
+        
+        result = await translate_document(
+            request.text,
+            source_language,
+            request.target_language,
+            token_budget=request.chunk_tokens,
+            context_sentences=request.context_sentences
+        )
+        
+        return DocumentTranslationResponse(
+            translated_text=result.translated_text,
+            detected_language=detected_lang,
+            source_language=source_language,
+            target_language=request.target_language,
+            characters=len(request.text),
+            chunks=len(result.chunks),
+            failed_chunks=result.failed_chunks,
+            seconds=result.seconds,
+            chunk_timings=result.timings(),
+            message=(
+                "Document translated successfully using Ollama with Mistral" if not result.failed_chunks
+                else f"{result.failed_chunks} chunk(s) could not be translated and were left in the source language"
+            )
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Document translation request failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Document translation failed: {str(e)}")
+
+@app.post("/translate/resource", response_model=ResourceTranslationResponse)
+async def translate_resource_endpoint(request: ResourceTranslationRequest, http_request: Request):
+    """
+    Translate a localization resource and return it in the same format.
+    
+    - **content**: The resource file as text
+    - **format**: `json` (string values of a key/value bundle), `po` (untranslated gettext entries)
+      or `html` (text nodes and alt/title/placeholder/aria-label attributes)
+    - **source_language**: Optional source language (detected from the strings if omitted)
+    - **target_language**: Target language (defaults to English)
+    
+    Keys, comments, markup and layout are kept as written. Identical strings are translated once
+    and short strings share prompts; strings that fail are kept in the source language and
+    counted in `failed`.
+    """
+    set_request_priority(http_request, "bulk")
+    if request.format not in FORMATS:
+        raise HTTPException(status_code=422, detail=f"Unsupported format {request.format!r}; use one of: {', '.join(FORMATS)}")
+    try:
+        with stage_timer("parse"):
+            resource = parse_resource(request.content, request.format)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=f"Invalid {request.format} resource: {str(e)}")
+    
+    try:
+        # Detect language if not provided
+        if not request.source_language:
+            detected_lang = detect_language(" ".join(dict.fromkeys(resource.strings))[:2000]) if resource.strings else "English"
+            source_language = detected_lang
+        else:
+            source_language = request.source_language
+            detected_lang = source_language
+        
+        def unchanged(message: str) -> ResourceTranslationResponse:
+            strings = resource.strings
+            return ResourceTranslationResponse(
+                content=request.content,
+                format=request.format,
+                detected_language=detected_lang,
+                source_language=source_language,
+                target_language=request.target_language,
+                strings=len(strings),
+                unique_strings=len(set(strings)),
+                cached=0,
+                translated=0,
+                failed=0,
+                seconds=0.0,
+                message=message
+            )
+        
+        if not resource.strings:
+            return unchanged("No translatable strings found")
+        # Don't translate if source and target are the same
+        if source_language.lower() == request.target_language.lower():
+            return unchanged("Source and target languages are the same")
+        
+        # Check if Ollama is available
+        if not check_ollama_status():
+            raise HTTPException(
+                status_code=503, 
+                detail="Ollama service not available. Please ensure Ollama is running and the mistral model is pulled."
+            )
+        
+        result = await translate_resource(resource, source_language, request.target_language)
+        
+        return ResourceTranslationResponse(
+            content=result.content,
+            format=request.format,
+            detected_language=detected_lang,
+            source_language=source_language,
+            target_language=request.target_language,
+            strings=result.strings,
+            unique_strings=result.unique_strings,
+            cached=result.cached,
+            translated=result.translated,
+            failed=result.failed,
+            seconds=result.seconds,
+            message=(
+                "Resource translated successfully using Ollama with Mistral" if not result.failed
+                else f"{result.failed} string(s) could not be translated and were left in the source language"
+            )
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Resource translation request failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Resource translation failed: {str(e)}")
+
+async def run_job_step(step):
+    """Run one step of a job, pausing while Ollama is down or the work is shed instead of failing the job."""
+    while True:
+        if not check_ollama_status():
+            await asyncio.sleep(JOB_RETRY_DELAY)
+            continue
+        try:
+            return await step()
+        except HTTPException as e:
+            retry_after = float((e.headers or {}).get("Retry-After", JOB_RETRY_DELAY))
+            logger.warning(f"Job step deferred: {e.detail} Retrying in {retry_after}s")
+            await asyncio.sleep(retry_after)
+
+async def run_items_job(job: Job, queue: JobQueue) -> Optional[dict]:
+    """Translate a job's items in slices of JOB_BATCH_SIZE, recording each slice as it finishes."""
+    current_priority.set("background")
+    items = [BatchTranslationItem(**item) for item in job.payload["items"]]
+    done = await queue.done_units(job.id)
+    pending = [index for index in range(len(items)) if index not in done]
+    for start in range(0, len(pending), JOB_BATCH_SIZE):
+        indexes = pending[start:start + JOB_BATCH_SIZE]
+        response = await run_job_step(
+            lambda: run_batch_translation([items[index] for index in indexes], concurrency=JOB_CONCURRENCY)
+        )
+        await queue.record(job.id, [
+            (index, result.model_dump(), not result.fallback_used)
+            for index, result in zip(indexes, response.results)
+        ])
+    # Item results are read page by page from GET /jobs/{id}
+    return None
+
+async def run_document_job(job: Job, queue: JobQueue) -> dict:
+    """Translate a job's document chunk by chunk, recording each chunk, then assemble the document."""
+    current_priority.set("background")
+    payload = job.payload
+    done = await queue.done_units(job.id)
+    chunks = (
+        chunk for chunk in iter_chunks(payload["text"], payload["chunk_tokens"], payload["context_sentences"])
+        if chunk.index not in done
+    )
+    
+    async def worker():
+        # The workers share the lazy chunk iterator, so only JOB_CONCURRENCY chunks exist at a time
+        for chunk in chunks:
+            translated = None
+            if chunk.text:
+                translated = await run_job_step(
+                    lambda: translate_text(chunk.text, payload["source_language"], payload["target_language"], context=chunk.context)
+                )
+            ok = translated is not None or not chunk.text
+            text = chunk.prefix + (translated if translated is not None else chunk.text) + chunk.suffix
+            await queue.record(job.id, [(chunk.index, {"index": chunk.index, "text": text, "translated": ok}, ok)])
+    
+    await asyncio.gather(*(worker() for _ in range(JOB_CONCURRENCY)))
+    pieces = await queue.results(job.id, 0, job.total)
+    return {
+        "translated_text": "".join(piece["text"] for _, piece in pieces),
+        "detected_language": payload["detected_language"],
+        "source_language": payload["source_language"],
+        "target_language": payload["target_language"],
+        "failed_chunks": sum(1 for _, piece in pieces if not piece["translated"])
+    }
+
+job_queue.register("items", run_items_job)
+job_queue.register("document", run_document_job)
+
+def job_response(job: Job, results: Optional[list] = None, offset: int = 0) -> JobResponse:
+    return JobResponse(
+        **job.to_dict(),
+        progress=round(job.completed / job.total, 4) if job.total else 1.0,
+        results=[result for _, result in results or []],
+        results_offset=offset
+    )
+
+@app.post("/jobs", response_model=JobResponse, status_code=202)
+async def create_job(request: JobRequest):
+    """
+    Queue a large translation and return its job id right away.
+    
+    Send either **text** (a document, translated chunk by chunk like /translate/document) or
+    **items** (like /translate/batch, up to JOB_MAX_ITEMS). Jobs are stored on disk, run by
+    background workers at the lowest admission priority, and resume after a restart.
+    """
+    if (request.text is None) == (request.items is None):
+        raise HTTPException(status_code=422, detail="Provide exactly one of 'text' or 'items'")
+    
+    if request.items is not None:
+        items = [
+            dict(item.model_dump(), source_language=item.source_language or request.source_language)
+            for item in request.items
+        ]
+        job = await job_queue.submit("items", {"items": items}, total=len(items))
+    else:
+        if not request.source_language:
+            detected_lang = detect_language(request.text[:2000])
+            source_language = detected_lang
+        else:
+            source_language = request.source_language
+            detected_lang = source_language
+        # Segmenting a multi-megabyte document takes a while; keep it off the event loop
+        total = await asyncio.get_running_loop().run_in_executor(
+            None, lambda: sum(1 for _ in iter_chunks(request.text, request.chunk_tokens, request.context_sentences))
+        )
+        job = await job_queue.submit("document", {
+            "text": request.text,
+            "detected_language": detected_lang,
+            "source_language": source_language,
+            "target_language": request.target_language,
+            "chunk_tokens": request.chunk_tokens,
+            "context_sentences": request.context_sentences
+        }, total=total)
+    logger.info(f"Queued {job.kind} job {job.id} with {job.total} unit(s)")
+    return job_response(job)
+
+@app.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str, offset: int = Query(0, ge=0), limit: int = Query(100, ge=0, le=1000)):
+    """
+    Get a job's status and progress, with a page of the results recorded so far.
+    
+    - **offset** / **limit**: Page through per-item (or per-chunk) results in input order
+    
+    Completed document jobs also carry the assembled document in `result`.
+    """
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    results = await job_queue.results(job_id, offset, limit) if limit else []
+    return job_response(job, results, offset)
+
+@app.post("/jobs/{job_id}/cancel", response_model=JobResponse)
+async def cancel_job(job_id: str):
+    """
+    Cancel a queued or running job. Results recorded before cancellation are kept.
+    """
+    job = await job_queue.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job_response(job)
+
 @app.post("/detect-language")
 async def detect_language_endpoint(request: TranslationRequest):
     """
@@ -328,6 +1182,22 @@ async def detect_language_endpoint(request: TranslationRequest):
         logger.error(f"Language detection failed: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Language detection failed: {str(e)}")
 
+@app.post("/detect-language/batch", response_model=LanguageDetectionBatchResponse)
+async def detect_language_batch(request: LanguageDetectionBatchRequest):
+    """
+    Detect the language of many texts in one request.
+    
+    - **texts**: Up to BATCH_MAX_ITEMS texts; results are returned in the same order
+    """
+    try:
+        return LanguageDetectionBatchResponse(results=[
+            LanguageDetectionResult(text=text, detected_language=detect_language(text))
+            for text in request.texts
+        ])
+    except Exception as e:
+        logger.error(f"Language detection failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Language detection failed: {str(e)}")
+
 @app.get("/supported-languages")
 async def get_supported_languages():
     """
@@ -360,12 +1230,17 @@ async def check_ollama_status_endpoint():
     Check Ollama service status and model availability.
     """
     try:
-        is_available = check_ollama_status()
+        state = health_monitor.state
         return {
-            "ollama_available": is_available,
+            "ollama_available": state.available,
             "model": OLLAMA_MODEL,
             "base_url": OLLAMA_BASE_URL,
-            "status": "running" if is_available else "not available"
+            "status": "running" if state.available else "not available",
+            "last_checked": state.checked_at,
+            "stale": state.stale,
+            "error": state.error,
+            "backends_available": state.backends_available,
+            "backends_total": state.backends_total
         }
     except Exception as e:
         return {
@@ -376,11 +1251,165 @@ async def check_ollama_status_endpoint():
             "error": str(e)
         }
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """
+    Prometheus metrics: per-endpoint and per-stage latency histograms, Ollama token throughput and
+    prompt-eval time per model and language pair, fallback/cache/error counters and in-flight gauges.
+    """
+    if shared_state.enabled:
+        # Add up every worker's samples, so a scrape sees the whole server whichever worker answers it
+        live, retired = await shared_state.worker_metrics()
+        return PlainTextResponse(metrics.merge(live, retired), media_type="text/plain; version=0.0.4; charset=utf-8")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/admin/cache")
+async def cache_stats():
+    """
+    Get translation cache hit/miss/eviction counters.
+    """
+    return await translation_cache.get_stats()
+
+@app.get("/admin/memory")
+async def memory_stats():
+    """
+    Get translation memory counters: `hits` reused a near-duplicate (`substituted` of them with
+    numbers, names or other placeholders replaced), `unsafe` found similar segments that differ in
+    more than placeholders and punctuation, plus mean lookup time and stored segments.
+    """
+    return await translation_memory.get_stats()
+
+@app.get("/admin/coalescing")
+async def coalescing_stats():
+    """
+    Get request-coalescing counters: `leaders` started an Ollama generation, `coalesced` joined one
+    already in flight (duplicate generations avoided), `abandoned` were cancelled because every
+    waiting client went away.
+    """
+    return translation_flights.get_stats()
+
+@app.get("/admin/cancellations")
+async def cancellation_stats():
+    """
+    Get cancellation counters: requests cancelled because the client disconnected or their
+    X-Request-Timeout deadline passed, Ollama generations aborted part-way, and the estimated
+    output tokens and generation seconds that saved.
+    """
+    return cancellations.get_stats()
+
+@app.get("/admin/workers")
+async def worker_stats():
+    """
+    Get the worker processes of this server run (pid, heartbeat, whether still alive), this
+    worker's shared-state counters and how often it probed Ollama itself or reused another
+    worker's probe. The other /admin endpoints report the worker that answers the request.
+    """
+    return {
+        **shared_state.get_stats(),
+        "pid": os.getpid(),
+        "health": health_monitor.stats,
+        "workers": await shared_state.workers() if shared_state.enabled else [],
+    }
+
+@app.get("/admin/protection")
+async def protection_stats():
+    """
+    Get placeholder protection counters: texts returned as they are because there was nothing to
+    translate, placeholders and markup sent to the model as sentinels, outputs rejected because a
+    sentinel went missing, and the estimated prompt tokens saved.
+    """
+    return span_protector.get_stats()
+
+@app.get("/admin/backends")
+async def backend_stats():
+    """
+    Get per-backend circuit state, outstanding requests, latency and error stats.
+    """
+    return get_pool().get_stats()
+
+@app.get("/admin/admission")
+async def admission_stats():
+    """
+    Get admission-control gauges: active generations, queue depth per priority, average queue wait
+    and the observed service rate used for Retry-After estimates.
+    """
+    return admission_controller.get_stats()
+
+@app.get("/admin/models")
+async def model_stats():
+    """
+    Get model routing: default and small model, per-language-pair thresholds, keep_alive, routing
+    counts and the outcome of the last warm-up per model.
+    """
+    return model_router.get_stats()
+
+@app.post("/admin/models/warmup")
+async def warm_up_models():
+    """
+    Preload every routed model on its backends now, e.g. after Ollama was restarted.
+    """
+    return {model: await model_router.preload(model) for model in model_router.models()}
+
+@app.get("/admin/generation")
+async def generation_stats():
+    """
+    Get the generation planner state: learned output/input token ratios per language pair,
+    planned and observed generations, and how many hit num_predict.
+    """
+    return generation_planner.get_stats()
+
+@app.get("/admin/jobs")
+async def job_stats():
+    """
+    Get job queue counters: submitted, completed, failed, cancelled and resumed jobs, plus jobs
+    queued and running now.
+    """
+    return job_queue.get_stats()
+
+@app.get("/admin/detection")
+async def detection_stats():
+    """
+    Get language-detection counters: `fast_path` was resolved from the script alone, `model` ran
+    langdetect, plus detection cache hits and misses.
+    """
+    return language_detection.get_stats()
+
+@app.get("/admin/phrase-table")
+async def phrase_table_stats():
+    """
+    Get the loaded fallback phrase table (languages, rows, index size, load time) and lookup counters.
+    """
+    return phrase_table.get_stats()
+
+@app.post("/admin/phrase-table/reload")
+async def reload_phrase_table():
+    """
+    Reload the fallback phrase table from disk now instead of waiting for the file watcher.
+    """
+    reloaded = await phrase_table.reload(force=True)
+    if not reloaded:
+        raise HTTPException(status_code=500, detail=f"Failed to reload phrase table {phrase_table.path}")
+    return phrase_table.get_stats()
+
+@app.delete("/admin/cache")
+async def purge_cache(
+    source_language: Optional[str] = None,
+    target_language: Optional[str] = None,
+    model: Optional[str] = None
+):
+    """
+    Purge cached translations.
+    
+    - **source_language** / **target_language**: Only purge entries for this language pair (either side may be omitted)
+    - **model**: Only purge entries produced by this model
+    
+    With no filters the whole cache is cleared. Matching translation memory segments are purged too.
+    """
+    purged = await translation_cache.purge(source_language, target_language, model)
+    memory_purged = await translation_memory.purge(source_language, target_language, model)
+    logger.info(f"Purged {purged} cache entries and {memory_purged} translation memory segments (source={source_language}, target={target_language}, model={model})")
+    return {"purged": purged, "memory_purged": memory_purged}
+
 if __name__ == "__main__":
-    import uvicorn
-    print("Starting Translation API")
-    print(f"Ollama URL: {OLLAMA_BASE_URL}")
-    print(f"Model: {OLLAMA_MODEL}")
-    print("API will be available at: http://localhost:8000")
-    print("API docs at: http://localhost:8000/docs")
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    from server import serve
+    serve()
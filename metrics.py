@@ -0,0 +1,501 @@
+"""
+Prometheus metrics.
+
+A small in-process registry of counters, gauges and histograms rendered in the Prometheus text
+exposition format at /metrics. Recording a sample is a dict lookup and an addition, so request
+paths can be instrumented freely. Counters that other modules already keep (cache, admission,
+backends, coalescing, ...) are exported through callbacks read at scrape time instead of being
+counted twice. With several worker processes each one publishes snapshot() through the shared
+state and /metrics renders merge() of them all, so a scrape sees the whole server.
+"""
+
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from config import OLLAMA_MODEL, PROMPT_TEMPLATE_VERSION
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+TOKENS_PER_SECOND_BUCKETS = (1, 2, 5, 10, 20, 30, 50, 75, 100, 150, 200, 300, 500)
+
+_registry: List["_Metric"] = []
+_service_metrics_registered = False  # main.py is imported twice when run as a script
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Timer:
+    """Context manager that observes the elapsed wall time into a histogram child."""
+
+    __slots__ = ("_child", "_started")
+
+    def __init__(self, child: "_HistogramChild"):
+        self._child = child
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._child.observe(time.perf_counter() - self._started)
+
+
+class _ValueChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+    def dec(self, amount: float = 1):
+        self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def time(self) -> _Timer:
+        return _Timer(self)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), aggregate: str = "sum"):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.aggregate = aggregate  # How merge() combines workers' samples: "sum" or "max"
+        self._children: Dict[Tuple[str, ...], object] = {}
+        _registry.append(self)
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values: str):
+        """Return the child for these label values, creating it on first use."""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+            child = self._children[values] = self._new_child()
+        return child
+
+    def _samples(self) -> Iterable[str]:
+        for values, child in list(self._children.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"
+
+    def _header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self) -> str:
+        lines = self._header()
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _ValueChild()
+
+    def inc(self, amount: float = 1):
+        self.labels().inc(amount)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _ValueChild()
+
+    def inc(self, amount: float = 1):
+        self.labels().inc(amount)
+
+    def dec(self, amount: float = 1):
+        self.labels().dec(amount)
+
+    def set(self, value: float):
+        self.labels().set(value)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def time(self) -> _Timer:
+        return self.labels().time()
+
+    def _samples(self) -> Iterable[str]:
+        for values, child in list(self._children.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), child.counts):
+                cumulative += count
+                le = f'le="{_format_value(float(bound))}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, values, le)} {cumulative}"
+            labels = _format_labels(self.labelnames, values)
+            yield f"{self.name}_sum{labels} {_format_value(child.sum)}"
+            yield f"{self.name}_count{labels} {child.count}"
+
+
+class CallbackMetric(_Metric):
+    """Counter or gauge whose samples are read from fn() at scrape time as (label values, value) pairs."""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        kind: str,
+        labelnames: Sequence[str],
+        fn: Callable[[], Iterable[Tuple[Tuple[str, ...], float]]],
+        aggregate: str = "sum",
+    ):
+        super().__init__(name, documentation, labelnames, aggregate)
+        self.kind = kind
+        self.fn = fn
+
+    def _samples(self) -> Iterable[str]:
+        for values, value in self.fn():
+            yield f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(value)}"
+
+
+def render() -> str:
+    """Render every registered metric in the Prometheus text format."""
+    return "\n".join(metric.render() for metric in _registry) + "\n"
+
+
+def snapshot() -> Dict[str, List[str]]:
+    """This process's samples by metric name, as published to the other workers."""
+    return {metric.name: list(metric._samples()) for metric in _registry}
+
+
+def merge(snapshots: Sequence[Dict[str, List[str]]], retired: Sequence[Dict[str, List[str]]] = ()) -> str:
+    """
+    Render the snapshots of several processes as one, adding up each series (taking the largest
+    value for metrics marked aggregate="max"). Histogram buckets are cumulative counts, so they
+    add up too. Retired processes (stopped or gone) still count towards counters and histograms,
+    which must never go down, but no longer towards gauges.
+    """
+    blocks = []
+    for metric in _registry:
+        series: Dict[str, float] = {}
+        for samples in list(snapshots) + ([] if metric.kind == "gauge" else list(retired)):
+            for line in samples.get(metric.name, ()):
+                key, value = line.rsplit(" ", 1)
+                value = float(value)
+                if key not in series:
+                    series[key] = value
+                elif metric.aggregate == "max":
+                    series[key] = max(series[key], value)
+                else:
+                    series[key] += value
+        lines = metric._header()
+        lines.extend(f"{key} {_format_value(int(value) if value.is_integer() else value)}" for key, value in series.items())
+        blocks.append("\n".join(lines))
+    return "\n".join(blocks) + "\n"
+
+
+# HTTP
+HTTP_REQUESTS = Counter("translation_http_requests_total", "HTTP requests by endpoint, method and status.", ["endpoint", "method", "status"])
+HTTP_DURATION = Histogram("translation_http_request_duration_seconds", "HTTP request latency until the response body is complete.", ["endpoint"])
+HTTP_IN_FLIGHT = Gauge("translation_http_requests_in_flight", "HTTP requests currently being served.")
+
+# Translation pipeline
+STAGE_DURATION = Histogram(
+    "translation_stage_duration_seconds",
+    "Time spent in each translation stage (detect, parse, cache_lookup, status_check, queue_wait, generate, cleanup, cache_store).",
+    ["stage"],
+)
+FALLBACKS = Counter("translation_fallbacks_total", "Fallback responses by outcome (phrase_covered, phrase_partial, none).", ["outcome"])
+GENERATION_ERRORS = Counter("translation_generation_errors_total", "Failed Ollama generations by path and error type.", ["path", "error"])
+
+# Ollama generation stats reported in each final response
+OLLAMA_PROMPT_TOKENS = Counter("ollama_prompt_tokens_total", "Prompt tokens evaluated by Ollama (cached prefixes excluded).", ["model", "template"])
+OLLAMA_EVAL_TOKENS = Counter("ollama_eval_tokens_total", "Tokens generated by Ollama.", ["model", "source_language", "target_language"])
+OLLAMA_TOKENS_PER_SECOND = Histogram(
+    "ollama_eval_tokens_per_second",
+    "Generation speed (eval_count / eval_duration).",
+    ["model", "source_language", "target_language"],
+    buckets=TOKENS_PER_SECOND_BUCKETS,
+)
+OLLAMA_PROMPT_EVAL_SECONDS = Histogram(
+    "ollama_prompt_eval_duration_seconds",
+    "Time Ollama spent evaluating the prompt, by prompt template version.",
+    ["model", "source_language", "target_language", "template"],
+)
+OLLAMA_LOAD_SECONDS = Histogram("ollama_load_duration_seconds", "Time Ollama spent loading the model.", ["model"])
+
+# Model routing and warm-up
+MODEL_ROUTES = Counter(
+    "translation_model_routes_total",
+    "Model chosen for each translation by the size router (reason: short, long, unrouted).",
+    ["model", "reason", "source_language", "target_language"],
+)
+MODEL_WARMUPS = Counter("ollama_model_warmups_total", "Model preloads by outcome (loaded, failed).", ["model", "outcome"])
+
+_known_languages: Optional[set] = None
+
+
+def language_label(language: Optional[str]) -> str:
+    """Bound label cardinality: languages the service knows keep their name, anything else is "other"."""
+    global _known_languages
+    if _known_languages is None:
+        from language_detection import LANGUAGE_MAP
+        _known_languages = set(LANGUAGE_MAP.values()) | {"Unknown"}
+    return language if language in _known_languages else "other"
+
+
+def stage_timer(stage: str) -> _Timer:
+    """Time a block as one translation stage."""
+    return STAGE_DURATION.labels(stage).time()
+
+
+def record_generation(result: dict, source_lang: str, target_lang: str):
+    """Record the token counts and durations (nanoseconds) from a final Ollama response."""
+    model = result.get("model") or OLLAMA_MODEL
+    source, target = language_label(source_lang), language_label(target_lang)
+    OLLAMA_PROMPT_TOKENS.labels(model, PROMPT_TEMPLATE_VERSION).inc(result.get("prompt_eval_count") or 0)
+    eval_count = result.get("eval_count") or 0
+    OLLAMA_EVAL_TOKENS.labels(model, source, target).inc(eval_count)
+    eval_duration = result.get("eval_duration")
+    if eval_count and eval_duration:
+        OLLAMA_TOKENS_PER_SECOND.labels(model, source, target).observe(eval_count / (eval_duration / 1e9))
+    if result.get("prompt_eval_duration") is not None:
+        OLLAMA_PROMPT_EVAL_SECONDS.labels(model, source, target, PROMPT_TEMPLATE_VERSION).observe(result["prompt_eval_duration"] / 1e9)
+    if result.get("load_duration") is not None:
+        OLLAMA_LOAD_SECONDS.labels(model).observe(result["load_duration"] / 1e9)
+
+
+def record_multi_generation(result: dict, source_lang: str, shares: Dict[str, float]):
+    """
+    Record a generation that translated into several targets at once.
+
+    The generated tokens are split between the targets by their share of the output; speed and
+    prompt evaluation are observed under every target, and the prompt tokens and load once.
+    """
+    model = result.get("model") or OLLAMA_MODEL
+    source = language_label(source_lang)
+    OLLAMA_PROMPT_TOKENS.labels(model, PROMPT_TEMPLATE_VERSION).inc(result.get("prompt_eval_count") or 0)
+    eval_count = result.get("eval_count") or 0
+    eval_duration = result.get("eval_duration")
+    total = sum(shares.values())
+    for target_lang, share in shares.items():
+        target = language_label(target_lang)
+        if total:
+            OLLAMA_EVAL_TOKENS.labels(model, source, target).inc(round(eval_count * share / total))
+        if eval_count and eval_duration:
+            OLLAMA_TOKENS_PER_SECOND.labels(model, source, target).observe(eval_count / (eval_duration / 1e9))
+        if result.get("prompt_eval_duration") is not None:
+            OLLAMA_PROMPT_EVAL_SECONDS.labels(model, source, target, PROMPT_TEMPLATE_VERSION).observe(result["prompt_eval_duration"] / 1e9)
+    if result.get("load_duration") is not None:
+        OLLAMA_LOAD_SECONDS.labels(model).observe(result["load_duration"] / 1e9)
+
+
+def record_generation_error(path: str, error: Exception):
+    GENERATION_ERRORS.labels(path, type(error).__name__).inc()
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording per-endpoint request counts, latency and the in-flight gauge."""
+
+    def __init__(self, app):
+        self.app = app
+        self._paths: Optional[Dict[Callable, str]] = None
+
+    def _endpoint(self, scope) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        if self._paths is None:
+            self._paths = {route.endpoint: route.path for route in scope["app"].routes if hasattr(route, "endpoint")}
+        return self._paths.get(endpoint, "unmatched")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            endpoint = self._endpoint(scope)
+            HTTP_REQUESTS.labels(endpoint, scope["method"], str(status)).inc()
+            HTTP_DURATION.labels(endpoint).observe(time.perf_counter() - started)
+
+
+def register_service_metrics():
+    """Export the counters and gauges other modules already keep, read at scrape time. Runs once."""
+    global _service_metrics_registered
+    if _service_metrics_registered:
+        return
+    _service_metrics_registered = True
+    from admission import admission_controller
+    from backend_pool import get_pool
+    import language_detection
+    from ollama_health import health_monitor
+    from phrase_table import phrase_table
+    from readiness import readiness
+    from request_lifecycle import cancellations
+    from span_protection import span_protector
+    from translation_cache import translation_cache
+    from translation_memory import translation_memory
+    from translator import translation_flights
+
+    def cache_lookups():
+        stats = translation_cache.stats
+        return [(("memory_hit",), stats["memory_hits"]), (("disk_hit",), stats["disk_hits"]), (("miss",), stats["misses"])]
+
+    CallbackMetric("translation_cache_lookups_total", "Translation cache lookups by result.", "counter", ["result"], cache_lookups)
+
+    def memory_lookups():
+        stats = translation_memory.stats
+        return [(("hit",), stats["hits"]), (("unsafe",), stats["unsafe"]), (("miss",), stats["misses"])]
+
+    CallbackMetric("translation_memory_lookups_total", "Translation memory lookups by result (hit, unsafe, miss).", "counter", ["result"], memory_lookups)
+    CallbackMetric(
+        "translation_cache_evictions_total", "Entries evicted from the in-memory cache tier.", "counter", [],
+        lambda: [((), translation_cache.stats["evictions"])],
+    )
+    CallbackMetric(
+        "translation_cache_memory_entries", "Entries in the in-memory cache tier.", "gauge", [],
+        lambda: [((), len(translation_cache._memory))],
+    )
+
+    def admission_events():
+        stats = admission_controller.stats
+        return [((event,), stats[event]) for event in ("admitted", "queued", "rejected_queue_full", "rejected_timeout", "rejected_deadline")]
+
+    CallbackMetric("translation_admission_events_total", "Admission decisions.", "counter", ["event"], admission_events)
+    CallbackMetric(
+        "translation_generations_in_flight", "Ollama generations holding an admission slot.", "gauge", [],
+        lambda: [((), admission_controller._active)],
+    )
+    CallbackMetric(
+        "translation_admission_queue_depth", "Generations waiting for an admission slot.", "gauge", ["priority"],
+        lambda: [((name,), count) for name, count in admission_controller._queued.items()],
+    )
+
+    def coalescing_events():
+        stats = translation_flights.stats
+        return [((event,), stats[event]) for event in ("leaders", "coalesced", "abandoned")]
+
+    CallbackMetric("translation_coalescing_total", "Request coalescing outcomes.", "counter", ["outcome"], coalescing_events)
+
+    CallbackMetric(
+        "translation_requests_cancelled_total", "Requests cancelled before completing, by reason (client_disconnect, deadline).", "counter", ["reason"],
+        lambda: [(("client_disconnect",), cancellations.stats["client_disconnects"]), (("deadline",), cancellations.stats["deadlines_exceeded"])],
+    )
+    CallbackMetric(
+        "ollama_generations_cancelled_total", "Ollama generations aborted part-way because nobody was waiting for them.", "counter", [],
+        lambda: [((), cancellations.stats["generations_cancelled"])],
+    )
+    CallbackMetric(
+        "ollama_cancelled_tokens_saved_total", "Estimated output tokens Ollama did not generate thanks to cancellation.", "counter", [],
+        lambda: [((), cancellations.stats["tokens_saved"])],
+    )
+    CallbackMetric(
+        "ollama_cancelled_seconds_saved_total", "Estimated generation seconds saved by cancellation.", "counter", [],
+        lambda: [((), cancellations.stats["seconds_saved"])],
+    )
+
+    CallbackMetric(
+        "translation_bypassed_total", "Texts returned as they are because there was nothing to translate.", "counter", [],
+        lambda: [((), span_protector.stats["bypassed"])],
+    )
+    CallbackMetric(
+        "translation_protected_spans_total", "Placeholders, markup and URLs sent to the model as sentinels.", "counter", [],
+        lambda: [((), span_protector.stats["spans"])],
+    )
+    CallbackMetric(
+        "translation_placeholder_restore_failures_total", "Model outputs that lost a protected span.", "counter", [],
+        lambda: [((), span_protector.stats["restore_failures"])],
+    )
+    CallbackMetric(
+        # A gauge: sentinels can cost more tokens than the span they replace
+        "translation_prompt_tokens_saved", "Estimated prompt tokens saved, by reason (bypass, masking).", "gauge", ["reason"],
+        lambda: [(("bypass",), span_protector.stats["bypass_tokens_saved"]), (("masking",), span_protector.stats["mask_tokens_saved"])],
+    )
+
+    def backend_stats(field: str):
+        return lambda: [((b.url,), getattr(b, field)) for b in get_pool().backends]
+
+    CallbackMetric("ollama_backend_outstanding_requests", "Requests in flight per Ollama backend.", "gauge", ["backend"], backend_stats("outstanding"))
+    CallbackMetric("ollama_backend_requests_total", "Requests sent per Ollama backend.", "counter", ["backend"], backend_stats("requests"))
+    CallbackMetric("ollama_backend_errors_total", "Failed requests per Ollama backend.", "counter", ["backend"], backend_stats("errors"))
+    CallbackMetric(
+        "ollama_backend_up", "1 when the backend's circuit is closed.", "gauge", ["backend"],
+        lambda: [((b.url,), int(b.state == "closed")) for b in get_pool().backends], aggregate="max",
+    )
+    CallbackMetric(
+        "ollama_available", "1 when the health monitor last saw the model available.", "gauge", [],
+        lambda: [((), int(health_monitor.state.available))], aggregate="max",
+    )
+    CallbackMetric(
+        "translation_ready", "1 when every required subsystem has warmed up (summed: workers ready).", "gauge", [],
+        lambda: [((), int(readiness.is_ready()))],
+    )
+    CallbackMetric(
+        "translation_startup_seconds", "Seconds each subsystem took to warm up after startup.", "gauge", ["subsystem"],
+        lambda: [((name,), s.seconds) for name, s in readiness.subsystems.items() if s.seconds is not None], aggregate="max",
+    )
+
+    CallbackMetric(
+        "translation_language_detections_total", "Language detections by path (fast_path, model, no_letters).", "counter", ["path"],
+        lambda: [((path,), count) for path, count in language_detection.stats.items()],
+    )
+    CallbackMetric(
+        "translation_phrase_table_lookups_total", "Fallback phrase-table lookups by result.", "counter", ["result"],
+        lambda: [((result,), phrase_table.stats[result]) for result in ("covered", "partial", "misses")],
+    )
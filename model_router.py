@@ -0,0 +1,158 @@
+"""
+Model selection and residency.
+
+Short texts are routed to a smaller, faster model (OLLAMA_SMALL_MODEL) and everything else to
+OLLAMA_MODEL. The cut-off is an estimated token count that can differ per language pair. At
+startup every model in use is preloaded on each backend that serves it, and every generation
+carries an explicit keep_alive so Ollama keeps the models resident between bursts instead of
+reloading them on the first request after an idle period.
+"""
+
+import asyncio
+import json
+import logging
+from typing import Dict, List, Optional, Union
+
+from config import OLLAMA_MODEL, OLLAMA_SMALL_MODEL, OLLAMA_KEEP_ALIVE, OLLAMA_WARMUP, MODEL_ROUTING_THRESHOLDS
+from backend_pool import get_pool, open_pool
+from ollama_client import OllamaError
+from metrics import MODEL_ROUTES, MODEL_WARMUPS, OLLAMA_LOAD_SECONDS, language_label
+
+logger = logging.getLogger(__name__)
+
+
+def parse_keep_alive(value: str) -> Union[int, float, str]:
+    """Ollama takes keep_alive as a duration string ("30m") or a number of seconds (-1 = forever)."""
+    try:
+        number = float(value)
+    except ValueError:
+        return value
+    return int(number) if number.is_integer() else number
+
+
+def parse_thresholds(spec: str) -> Dict[str, int]:
+    """Parse MODEL_ROUTING_THRESHOLDS into {"source:target": tokens}, always with a "*" default."""
+    spec = spec.strip()
+    if spec.startswith("{"):
+        thresholds = {key.lower().replace(" ", ""): int(value) for key, value in json.loads(spec).items()}
+    else:
+        thresholds = {"*": int(spec or 0)}
+    thresholds.setdefault("*", 0)
+    return thresholds
+
+
+KEEP_ALIVE = parse_keep_alive(OLLAMA_KEEP_ALIVE)
+
+
+class ModelRouter:
+    """Pick the model for a text by its size and language pair, and keep the models warm."""
+
+    def __init__(
+        self,
+        default_model: str = OLLAMA_MODEL,
+        small_model: str = OLLAMA_SMALL_MODEL,
+        thresholds: str = MODEL_ROUTING_THRESHOLDS,
+        warmup: bool = OLLAMA_WARMUP,
+    ):
+        self.default_model = default_model
+        self.small_model = small_model or None
+        self.thresholds = parse_thresholds(thresholds)
+        self.warmup = warmup
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"short": 0, "long": 0, "unrouted": 0}
+        self.warmups: Dict[str, dict] = {}  # model -> last preload outcome
+
+    def models(self) -> List[str]:
+        """Every model the router may send work to."""
+        return [self.default_model] + ([self.small_model] if self.small_model else [])
+
+    def threshold(self, source_lang: str, target_lang: str) -> int:
+        source, target = source_lang.lower(), target_lang.lower()
+        for key in (f"{source}:{target}", f"{source}:*", f"*:{target}", "*"):
+            if key in self.thresholds:
+                return self.thresholds[key]
+        return 0
+
+    def _small_model_usable(self) -> bool:
+        return any(b.serves(self.small_model) and b.allows_request() for b in get_pool().backends)
+
+    def select(self, text: str, source_lang: str, target_lang: str) -> str:
+        """Return the model that should translate text; logs and counts the decision."""
+        if self.small_model is None:
+            reason, model = "unrouted", self.default_model
+        else:
+            from translator import estimate_tokens
+            tokens = estimate_tokens(text)
+            limit = self.threshold(source_lang, target_lang)
+            if tokens <= limit and self._small_model_usable():
+                reason, model = "short", self.small_model
+            else:
+                reason, model = "long", self.default_model
+            logger.debug(f"Routed {tokens}-token {source_lang}->{target_lang} text to {model} ({reason}, threshold {limit})")
+        self.stats[reason] += 1
+        MODEL_ROUTES.labels(model, reason, language_label(source_lang), language_label(target_lang)).inc()
+        return model
+
+    async def preload(self, model: str) -> dict:
+        """Load a model on every backend that serves it, with the configured keep_alive."""
+        results = await (await open_pool()).preload(model, KEEP_ALIVE)
+        loaded = [r for r in results if r["loaded"]]
+        for result in results:
+            MODEL_WARMUPS.labels(model, "loaded" if result["loaded"] else "failed").inc()
+            if result.get("load_seconds") is not None:
+                OLLAMA_LOAD_SECONDS.labels(model).observe(result["load_seconds"])
+            if result["loaded"]:
+                logger.info(f"Preloaded {model} on {result['url']} (load_duration {result['load_seconds']}s)")
+            else:
+                logger.warning(f"Could not preload {model} on {result['url']}: {result['error']}")
+        outcome = {"backends": results, "loaded": len(loaded)}
+        self.warmups[model] = outcome
+        return outcome
+
+    async def _warm_up(self):
+        """Preload every model; raises OllamaError if one could not be loaded on any backend."""
+        cold = []
+        for model in self.models():
+            try:
+                outcome = await self.preload(model)
+            except OllamaError as e:
+                logger.warning(f"Could not preload {model}: {str(e)}")
+                cold.append(model)
+                continue
+            if not outcome["loaded"]:
+                cold.append(model)
+        if cold:
+            # Fails the "models" readiness subsystem, so a replica with cold models gets no traffic
+            raise OllamaError(f"No backend loaded {', '.join(cold)}")
+
+    async def start(self):
+        """Preload the models in the background so startup is not held up by model loading."""
+        if self.warmup and self._task is None:
+            self._task = asyncio.create_task(self._warm_up())
+
+    def warm_up_task(self) -> Optional[asyncio.Task]:
+        """The background preload started by start(), or None if warm-up is disabled."""
+        return self._task
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except (asyncio.CancelledError, OllamaError):
+            pass
+        self._task = None
+
+    def get_stats(self) -> dict:
+        return {
+            "default_model": self.default_model,
+            "small_model": self.small_model,
+            "thresholds": self.thresholds,
+            "keep_alive": KEEP_ALIVE,
+            "routes": dict(self.stats),
+            "warmups": self.warmups,
+        }
+
+
+model_router = ModelRouter()
@@ -0,0 +1,151 @@
+"""
+Multi-target fan-out: one text into many languages.
+
+Targets with a near-duplicate in the translation memory are answered from it. The rest are
+translated concurrently, with at most MULTI_CONCURRENCY generations per request. When the text
+is short enough, up to MULTI_TARGETS_PER_PROMPT targets that share a model are combined into one
+JSON-structured prompt keyed by language name. Targets missing from its output are retried on
+their own. Results are yielded as each generation finishes, not in request order.
+"""
+
+import asyncio
+import logging
+from collections import defaultdict
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from config import BATCH_TOKEN_BUDGET, MULTI_TARGETS_PER_PROMPT, MULTI_CONCURRENCY
+from admission import admission_controller, AdmissionRejected
+from backend_pool import get_pool
+from request_lifecycle import DeadlineExceeded
+from batch_translator import parse_batch_response
+from generation_planner import generation_planner
+from metrics import stage_timer, record_multi_generation, record_generation_error
+from model_router import KEEP_ALIVE
+from ollama_health import health_monitor
+from prompt_templates import prompt_template
+from span_protection import is_translatable, span_protector
+from translation_memory import translation_memory
+from translator import estimate_tokens, translate_text
+
+logger = logging.getLogger(__name__)
+
+
+def group_targets(
+    text: str,
+    targets: List[Tuple[str, str]],
+    per_prompt: int = MULTI_TARGETS_PER_PROMPT,
+    token_budget: int = BATCH_TOKEN_BUDGET,
+) -> List[List[Tuple[str, str]]]:
+    """Split (target_language, model) pairs into groups that share one prompt; long texts get one target each."""
+    size = max(1, min(per_prompt, token_budget // estimate_tokens(text)))
+    by_model = defaultdict(list)
+    for target, model in targets:
+        by_model[model].append((target, model))
+    return [group[i:i + size] for group in by_model.values() for i in range(0, len(group), size)]
+
+
+async def _translate_group(
+    text: str,
+    source_lang: str,
+    group: List[Tuple[str, str]],
+    semaphore: asyncio.Semaphore,
+) -> Dict[str, Optional[str]]:
+    """Translate text into every target of the group, retrying targets the combined output missed or garbled."""
+    if len(group) == 1:
+        target, model = group[0]
+        async with semaphore:
+            return {target: await translate_text(text, source_lang, target, model=model)}
+
+    targets = [target for target, _ in group]
+    model = group[0][1]
+    masked = span_protector.mask(text)
+    input_tokens = estimate_tokens(masked.text)
+    prompt = prompt_template.multi(masked.text, source_lang, targets)
+    # Size the output for the target whose translations tend to run longest
+    longest = max(targets, key=lambda target: generation_planner.ratio(source_lang, target))
+    payload = {
+        "model": model,
+        **prompt.fields,
+        "stream": False,
+        "format": "json",
+        "keep_alive": KEEP_ALIVE,
+        "options": generation_planner.plan(input_tokens * len(targets), estimate_tokens(prompt.text), source_lang, longest, items=len(targets)),
+    }
+
+    aligned = {}
+    async with semaphore:
+        try:
+            async with admission_controller.slot():
+                with stage_timer("generate"):
+                    result = await get_pool().generate(payload)
+            with stage_timer("cleanup"):
+                parsed = parse_batch_response(result.get("response", ""), targets)
+                aligned = {}
+                for target, translated_text in parsed.items():
+                    restored = span_protector.restore(masked, translated_text)
+                    if restored is not None:
+                        aligned[target] = restored
+            # Each target is charged for its own part of the output; an unreadable output is split evenly
+            shares = {target: len(translated_text) for target, translated_text in parsed.items()}
+            record_multi_generation(result, source_lang, shares if any(shares.values()) else dict.fromkeys(targets, 1))
+            await translation_memory.add_many([
+                (text, translated_text, source_lang, target, model) for target, translated_text in aligned.items()
+            ])
+        except (AdmissionRejected, DeadlineExceeded):
+            raise
+        except Exception as e:
+            logger.error(f"Multi-target translation error: {str(e)}")
+            record_generation_error("multi", e)
+            health_monitor.mark_stale(str(e))
+
+    results: Dict[str, Optional[str]] = {target: aligned.get(target) for target in targets}
+    missing = [target for target in targets if results[target] is None]
+    if missing:
+        logger.info(f"Retrying {len(missing)}/{len(targets)} targets missing from the combined output individually")
+
+        async def retry(target: str):
+            async with semaphore:
+                results[target] = await translate_text(text, source_lang, target, model=model)
+
+        await asyncio.gather(*(retry(target) for target in missing))
+    return results
+
+
+async def translate_targets(
+    text: str,
+    source_lang: str,
+    targets: List[Tuple[str, str]],
+    concurrency: int = MULTI_CONCURRENCY,
+) -> AsyncIterator[Tuple[str, Optional[str]]]:
+    """
+    Translate text into each (target_language, model) and yield (target_language, translation) as they finish.
+
+    Text with nothing to translate is yielded as it is for every target. None marks a target
+    that could not be translated. Generations still running are cancelled if
+    the caller stops iterating.
+    """
+    if not is_translatable(text):
+        for target, _ in targets:
+            yield target, text
+        return
+    matches = await translation_memory.lookup_many([(text, source_lang, target, model) for target, model in targets])
+    pending = []
+    for (target, model), match in zip(targets, matches):
+        if match is not None:
+            yield target, match.translated_text
+        else:
+            pending.append((target, model))
+    if not pending:
+        return
+
+    semaphore = asyncio.Semaphore(concurrency)
+    groups = group_targets(text, pending)
+    logger.info(f"Translating into {len(targets)} languages ({len(targets) - len(pending)} from translation memory) with {len(groups)} prompts")
+    tasks = [asyncio.ensure_future(_translate_group(text, source_lang, group, semaphore)) for group in groups]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            for target, translated_text in (await finished).items():
+                yield target, translated_text
+    finally:
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,150 @@
+"""
+Async Ollama client.
+
+Each Ollama backend is reached through one shared httpx.AsyncClient so the event loop is
+never blocked and connections are pooled and kept alive between translations.
+
+A generation payload with `messages` is sent to /api/chat and one with `prompt` to
+/api/generate; chat responses are given a `response` field holding the message content, so
+callers read both the same way.
+
+httpx takes about a quarter of a second to import, so it is imported when the first client is
+created rather than with the app; startup creates the clients in the background (see
+backend_pool.open_pool()).
+"""
+
+import asyncio
+import json
+import logging
+import time
+from typing import AsyncIterator, Optional
+
+from config import (
+    OLLAMA_BASE_URL,
+    OLLAMA_CONNECT_TIMEOUT,
+    OLLAMA_READ_TIMEOUT,
+    OLLAMA_TOTAL_TIMEOUT,
+    OLLAMA_STATUS_TIMEOUT,
+    OLLAMA_MAX_CONNECTIONS,
+    OLLAMA_MAX_KEEPALIVE,
+    OLLAMA_KEEPALIVE_EXPIRY,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class OllamaError(Exception):
+    """Raised when Ollama cannot be reached or returns an error."""
+
+
+class OllamaConnectError(OllamaError):
+    """Raised when no connection to Ollama could be made, so nothing was generated."""
+
+
+def _endpoint(payload: dict) -> str:
+    return "/api/chat" if "messages" in payload else "/api/generate"
+
+
+def _normalize(chunk: dict) -> dict:
+    """Expose a chat message's content as `response`, like /api/generate."""
+    if "message" in chunk and "response" not in chunk:
+        chunk["response"] = chunk["message"].get("content", "")
+    return chunk
+
+
+class OllamaClient:
+    """Thin async wrapper around the Ollama HTTP API with a pooled connection."""
+
+    def __init__(
+        self,
+        base_url: str = OLLAMA_BASE_URL,
+        connect_timeout: float = OLLAMA_CONNECT_TIMEOUT,
+        read_timeout: float = OLLAMA_READ_TIMEOUT,
+        total_timeout: float = OLLAMA_TOTAL_TIMEOUT,
+        max_connections: int = OLLAMA_MAX_CONNECTIONS,
+        max_keepalive: int = OLLAMA_MAX_KEEPALIVE,
+        keepalive_expiry: float = OLLAMA_KEEPALIVE_EXPIRY,
+    ):
+        import httpx
+        self.base_url = base_url.rstrip("/")
+        self.total_timeout = total_timeout
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive,
+                keepalive_expiry=keepalive_expiry,
+            ),
+        )
+
+    async def _request(self, method: str, path: str, timeout: Optional[float] = None, **kwargs) -> dict:
+        """Send a request and return the decoded JSON body, bounded by a total timeout."""
+        import httpx
+        total = timeout if timeout is not None else self.total_timeout
+        try:
+            response = await asyncio.wait_for(self._client.request(method, path, **kwargs), timeout=total)
+        except asyncio.TimeoutError:
+            raise OllamaError(f"Ollama request {path} exceeded {total}s")
+        except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+            raise OllamaConnectError(f"Ollama request {path} failed: {e}") from e
+        except httpx.HTTPError as e:
+            raise OllamaError(f"Ollama request {path} failed: {e}") from e
+
+        if response.status_code != 200:
+            raise OllamaError(f"Ollama API error: {response.status_code} - {response.text}")
+        try:
+            return response.json()
+        except ValueError as e:
+            raise OllamaError(f"Ollama request {path} returned invalid JSON: {e}") from e
+
+    async def tags(self, timeout: float = OLLAMA_STATUS_TIMEOUT) -> dict:
+        """Return the list of locally available models (GET /api/tags)."""
+        return await self._request("GET", "/api/tags", timeout=timeout)
+
+    async def generate(self, payload: dict, timeout: Optional[float] = None) -> dict:
+        """Run a non-streaming generation (POST /api/generate, or /api/chat for a messages payload)."""
+        return _normalize(await self._request("POST", _endpoint(payload), timeout=timeout, json=payload))
+
+    async def generate_stream(self, payload: dict, timeout: Optional[float] = None) -> AsyncIterator[dict]:
+        """
+        Run a streaming generation (POST /api/generate or /api/chat with stream=true), yielding each chunk.
+        
+        The read timeout bounds the gap between chunks; timeout, if given, bounds the whole stream.
+        Closing the iterator early closes the connection, which makes Ollama stop generating.
+        """
+        import httpx
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        try:
+            async with self._client.stream("POST", _endpoint(payload), json=dict(payload, stream=True)) as response:
+                if response.status_code != 200:
+                    body = await response.aread()
+                    raise OllamaError(f"Ollama API error: {response.status_code} - {body.decode(errors='replace')}")
+                async for line in response.aiter_lines():
+                    if deadline is not None and time.monotonic() > deadline:
+                        raise OllamaError(f"Ollama stream exceeded {timeout}s")
+                    if not line.strip():
+                        continue
+                    try:
+                        chunk = json.loads(line)
+                    except ValueError as e:
+                        raise OllamaError(f"Ollama stream returned invalid JSON: {e}") from e
+                    if "error" in chunk:
+                        raise OllamaError(f"Ollama API error: {chunk['error']}")
+                    yield _normalize(chunk)
+                    if chunk.get("done"):
+                        return
+        except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+            raise OllamaConnectError(f"Ollama stream failed: {e}") from e
+        except httpx.HTTPError as e:
+            raise OllamaError(f"Ollama stream failed: {e}") from e
+
+    async def aclose(self):
+        """Close the underlying connection pool."""
+        await self._client.aclose()
+
+
+def model_available(tags: dict, model: str) -> bool:
+    """Check an /api/tags payload for the model (e.g. "mistral" matches "mistral:latest")."""
+    model_names = [m.get("name", "") for m in tags.get("models", [])]
+    return any(model in name or name.startswith(model.split(':')[0]) for name in model_names)
@@ -0,0 +1,186 @@
+"""
+Cached Ollama health state.
+
+A background task probes /api/tags on every backend on an interval and keeps the last result in
+memory, so request handlers can check availability without a network round trip. A
+failed translation marks the state stale, which wakes the prober early.
+
+With several worker processes the probe result is shared: a worker whose refresh is due adopts a
+result another worker published within the interval, and otherwise takes a lease and probes, so
+the server probes Ollama about once per interval however many workers it runs.
+"""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, asdict
+from typing import Optional
+
+from config import OLLAMA_MODEL, OLLAMA_HEALTH_INTERVAL, OLLAMA_HEALTH_RETRY_INTERVAL, OLLAMA_STATUS_TIMEOUT
+from backend_pool import open_pool
+from shared_state import shared_state
+
+_SHARED_KEY = "ollama_health"
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class OllamaHealthState:
+    """Result of the most recent Ollama probe."""
+    available: bool = False
+    reachable: bool = False
+    checked_at: Optional[float] = None
+    latency: Optional[float] = None
+    stale: bool = True
+    error: Optional[str] = None
+    backends_available: int = 0
+    backends_total: int = 0
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+class HealthMonitor:
+    """Probe Ollama periodically and keep the last result in memory."""
+
+    def __init__(
+        self,
+        model: str = OLLAMA_MODEL,
+        interval: float = OLLAMA_HEALTH_INTERVAL,
+        retry_interval: float = OLLAMA_HEALTH_RETRY_INTERVAL,
+    ):
+        self.model = model
+        self.interval = interval
+        self.retry_interval = retry_interval
+        self.state = OllamaHealthState()
+        self._stale_since = 0.0
+        self._wake: Optional[asyncio.Event] = None
+        self._probed: Optional[asyncio.Event] = None  # Set once the first refresh is done
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {
+            "probes": 0,   # probes this worker sent to Ollama
+            "adopted": 0,  # refreshes answered with another worker's probe
+        }
+
+    def is_available(self) -> bool:
+        """Return the cached availability; never touches the network."""
+        return self.state.available
+
+    async def probe(self) -> OllamaHealthState:
+        """Query Ollama once and replace the cached state."""
+        started = time.monotonic()
+        try:
+            results = await (await open_pool()).probe(self.model)
+            available = [r for r in results if r["available"]]
+            errors = [f"{r['url']}: {r['error']}" for r in results if r["error"]]
+            state = OllamaHealthState(
+                available=bool(available),
+                reachable=any(r["state"] != "open" for r in results),
+                error="; ".join(errors) or None,
+                backends_available=len(available),
+                backends_total=len(results),
+            )
+            for error in errors:
+                logger.error(f"Ollama status check failed: {error}")
+        except Exception as e:
+            logger.error(f"Ollama status check failed: {str(e)}")
+            state = OllamaHealthState(error=str(e))
+
+        state.checked_at = time.time()
+        state.latency = time.monotonic() - started
+        state.stale = False
+        self.stats["probes"] += 1
+        self._replace(state)
+        return state
+
+    def _replace(self, state: OllamaHealthState):
+        if state.available != self.state.available:
+            logger.info(f"Ollama availability changed: {self.state.available} -> {state.available}")
+        self.state = state
+
+    async def refresh(self) -> OllamaHealthState:
+        """
+        Bring the cached state up to date: probe Ollama, or with several workers adopt a result
+        another worker published recently enough (and after this worker last saw a failure).
+        """
+        if not shared_state.enabled:
+            return await self.probe()
+        if await self._adopt():
+            return self.state
+        if not await shared_state.try_lease(_SHARED_KEY, OLLAMA_STATUS_TIMEOUT * 2):
+            # Another worker is probing right now; its result is picked up on the next refresh
+            if self.state.checked_at is not None or await self._adopt(max_age=float("inf")):
+                return self.state
+        try:
+            state = await self.probe()
+            await shared_state.put(_SHARED_KEY, state.to_dict())
+        finally:
+            await shared_state.release(_SHARED_KEY)
+        return state
+
+    async def _adopt(self, max_age: Optional[float] = None) -> bool:
+        shared = await shared_state.get(_SHARED_KEY)
+        if shared is None:
+            return False
+        state = OllamaHealthState(**shared[0])
+        if max_age is None:
+            max_age = self.interval if state.available else self.retry_interval
+        if state.checked_at < time.time() - max_age or (self.state.stale and state.checked_at <= self._stale_since):
+            return False
+        self.stats["adopted"] += 1
+        self._replace(state)
+        return True
+
+    def mark_stale(self, error: Optional[str] = None):
+        """Flag the cached state as suspect so the next probe runs right away."""
+        self.state.stale = True
+        self._stale_since = time.time()
+        if error:
+            self.state.error = error
+        if self._wake is not None:
+            self._wake.set()
+
+    async def _run(self):
+        while True:
+            self._wake.clear()
+            started = time.monotonic()
+            try:
+                await self.refresh()
+            finally:
+                self._probed.set()
+            # Re-check sooner while Ollama is down (or while another worker's probe is awaited).
+            delay = self.interval if self.state.available and not self.state.stale else self.retry_interval
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                continue
+            # Woken early by mark_stale(); keep at least retry_interval between probes
+            # so a burst of failing translations cannot turn into a probe storm.
+            await asyncio.sleep(max(0.0, self.retry_interval - (time.monotonic() - started)))
+
+    async def start(self):
+        """Start refreshing in the background; the first probe runs right away without being awaited."""
+        if self._task is not None:
+            return
+        self._wake = asyncio.Event()
+        self._probed = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def wait_probed(self):
+        """Wait until the first probe after start() is done, whatever its result."""
+        await self._probed.wait()
+
+    async def stop(self):
+        """Cancel the background refresher."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+
+health_monitor = HealthMonitor()
@@ -0,0 +1,300 @@
+"""
+Phrase-table fallback translator.
+
+Phrase pairs are loaded from a TSV file (a header row of language names, then one phrase per
+row) into an Aho-Corasick automaton over normalized text, so every phrase occurring in the input
+is found in a single pass. The file is watched and reloaded in the background; a reload builds a
+new index off the event loop and swaps it in, so requests in flight keep using the old one.
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import time
+import unicodedata
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+from config import PHRASE_TABLE_PATH, PHRASE_TABLE_RELOAD_INTERVAL, PHRASE_MAX_CHARS
+
+logger = logging.getLogger(__name__)
+
+
+def _is_word_char(char: str) -> bool:
+    return char in "'-" or unicodedata.category(char)[0] in "LMN"
+
+
+def _no_spaces(char: str) -> bool:
+    """Scripts written without spaces between words (Thai, Lao, Tibetan, CJK, Hangul particles)."""
+    code = ord(char)
+    return code >= 0x2E80 or 0x0E00 <= code <= 0x0FFF
+
+
+def normalize_phrase(text: str) -> str:
+    """Case-fold, turn punctuation into spaces and collapse whitespace."""
+    text = unicodedata.normalize("NFKC", text).casefold().replace("’", "'")
+    return " ".join("".join(c if _is_word_char(c) else " " for c in text).split())
+
+
+class PhraseIndex:
+    """Immutable Aho-Corasick automaton over the phrases of every language in a table."""
+
+    def __init__(self, languages: List[str], rows: List[Tuple[str, ...]], max_chars: int = PHRASE_MAX_CHARS):
+        self.languages = languages
+        self.columns = {language: i for i, language in enumerate(languages)}
+        self.rows = rows
+        self.patterns: List[str] = []
+        self.pattern_rows: List[List[int]] = []  # Rows whose cells normalize to the pattern
+        self.skipped = 0
+
+        # Goto function, failure links, terminal pattern and nearest terminal suffix per node
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[int] = [-1]
+        self._dict_link: List[int] = [-1]
+
+        pattern_ids: Dict[str, int] = {}
+        for row_index, row in enumerate(rows):
+            for cell in row:
+                pattern = normalize_phrase(cell)
+                if not pattern:
+                    continue
+                if len(pattern) > max_chars:
+                    self.skipped += 1
+                    continue
+                if pattern in pattern_ids:
+                    rows_for_pattern = self.pattern_rows[pattern_ids[pattern]]
+                    if rows_for_pattern[-1] != row_index:
+                        rows_for_pattern.append(row_index)
+                    continue
+                pattern_ids[pattern] = len(self.patterns)
+                self.patterns.append(pattern)
+                self.pattern_rows.append([row_index])
+                self._insert(pattern, pattern_ids[pattern])
+        self._build_links()
+
+    def _insert(self, pattern: str, pattern_id: int):
+        node = 0
+        for char in pattern:
+            child = self._goto[node].get(char)
+            if child is None:
+                child = len(self._goto)
+                self._goto[node][char] = child
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(-1)
+                self._dict_link.append(-1)
+            node = child
+        self._out[node] = pattern_id
+
+    def _build_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fail = self._goto[fail].get(char, 0)
+                self._fail[child] = fail
+                self._dict_link[child] = fail if self._out[fail] >= 0 else self._dict_link[fail]
+                queue.append(child)
+
+    @property
+    def nodes(self) -> int:
+        return len(self._goto)
+
+    def find(self, text: str) -> List[Tuple[int, int, int]]:
+        """Return (start, end, pattern id) for every phrase in normalized text that sits on word boundaries."""
+        matches = []
+        goto, fail, out, dict_link = self._goto, self._fail, self._out, self._dict_link
+        node = 0
+        for end, char in enumerate(text, 1):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            match = node if out[node] >= 0 else dict_link[node]
+            while match >= 0:
+                pattern_id = out[match]
+                start = end - len(self.patterns[pattern_id])
+                if self._on_boundary(text, start) and self._on_boundary(text, end):
+                    matches.append((start, end, pattern_id))
+                match = dict_link[match]
+        return matches
+
+    @staticmethod
+    def _on_boundary(text: str, position: int) -> bool:
+        if position == 0 or position == len(text):
+            return True
+        before, after = text[position - 1], text[position]
+        return before == " " or after == " " or _no_spaces(before) or _no_spaces(after)
+
+    def _translation(self, pattern_id: int, target_column: int) -> Optional[str]:
+        for row_index in self.pattern_rows[pattern_id]:
+            translation = self.rows[row_index][target_column]
+            if translation:
+                return translation
+        return None
+
+    def translate(self, text: str, target_language: str) -> Optional[dict]:
+        """
+        Translate text from the table.
+
+        Returns None when the target language is not in the table or no phrase matches. When the
+        phrases cover the whole text the joined translation is returned with covered=True;
+        otherwise the translation of the longest phrase found.
+        """
+        target_column = self.columns.get(target_language)
+        if target_column is None:
+            return None
+        normalized = normalize_phrase(text)
+        matches = [m for m in self.find(normalized) if self._translation(m[2], target_column)]
+        if not matches:
+            return None
+
+        # Leftmost-longest, non-overlapping cover
+        matches.sort(key=lambda m: (m[0], m[0] - m[1]))
+        cover, position, uncovered = [], 0, ""
+        for start, end, pattern_id in matches:
+            if start >= position:
+                uncovered += normalized[position:start]
+                cover.append(pattern_id)
+                position = end
+        uncovered += normalized[position:]
+        if not uncovered.strip():
+            translations = [self._translation(p, target_column) for p in cover]
+            separator = "" if all(_no_spaces(t[0]) for t in translations) else " "
+            return {
+                "translated_text": separator.join(translations),
+                "phrases": [self.patterns[p] for p in cover],
+                "covered": True,
+            }
+
+        start, end, pattern_id = max(matches, key=lambda m: m[1] - m[0])
+        return {
+            "translated_text": self._translation(pattern_id, target_column),
+            "phrases": [self.patterns[pattern_id]],
+            "covered": False,
+        }
+
+
+def load_phrase_file(path: str) -> Tuple[List[str], List[Tuple[str, ...]]]:
+    """Read a phrase TSV into (languages, rows); blank lines and lines starting with # are skipped."""
+    languages: List[str] = []
+    rows: List[Tuple[str, ...]] = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.rstrip("\n")
+            if not line.strip() or line.startswith("#"):
+                continue
+            cells = [cell.strip() for cell in line.split("\t")]
+            if not languages:
+                languages = cells
+                continue
+            cells = (cells + [""] * len(languages))[:len(languages)]
+            rows.append(tuple(sys.intern(cell) for cell in cells))
+    return languages, rows
+
+
+class PhraseTable:
+    """Holds the current PhraseIndex and reloads it when the file changes."""
+
+    def __init__(self, path: str = PHRASE_TABLE_PATH, reload_interval: float = PHRASE_TABLE_RELOAD_INTERVAL):
+        self.path = path
+        self.reload_interval = reload_interval
+        self.index = PhraseIndex([], [])
+        self.mtime: Optional[float] = None
+        self.loaded_at: Optional[float] = None
+        self.load_seconds: Optional[float] = None
+        self.stats = {"lookups": 0, "covered": 0, "partial": 0, "misses": 0, "reloads": 0, "reload_errors": 0}
+        self._task: Optional[asyncio.Task] = None
+
+    def _build(self) -> Tuple[PhraseIndex, float]:
+        mtime = os.path.getmtime(self.path)
+        languages, rows = load_phrase_file(self.path)
+        return PhraseIndex(languages, rows), mtime
+
+    def _swap(self, index: PhraseIndex, mtime: float, started: float):
+        self.index = index
+        self.mtime = mtime
+        self.loaded_at = time.time()
+        self.load_seconds = time.monotonic() - started
+        self.stats["reloads"] += 1
+        logger.info(
+            f"Loaded phrase table {self.path}: {len(index.rows)} rows, {len(index.patterns)} phrases, "
+            f"{len(index.languages)} languages in {self.load_seconds:.3f}s"
+        )
+
+    async def reload(self, force: bool = False) -> bool:
+        """
+        Rebuild the index in a worker thread if the file changed (or force), then swap it in. A
+        missing or broken file leaves the current index in place.
+        """
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError as e:
+            logger.warning(f"Phrase table {self.path} unavailable: {str(e)}")
+            return False
+        if not force and mtime == self.mtime:
+            return False
+        started = time.monotonic()
+        try:
+            index, mtime = await asyncio.get_running_loop().run_in_executor(None, self._build)
+        except Exception as e:
+            self.stats["reload_errors"] += 1
+            logger.error(f"Failed to reload phrase table {self.path}: {str(e)}")
+            return False
+        self._swap(index, mtime, started)
+        return True
+
+    def translate(self, text: str, target_language: str) -> Optional[dict]:
+        """Look text up in the current index; see PhraseIndex.translate."""
+        self.stats["lookups"] += 1
+        result = self.index.translate(text, target_language)
+        if result is None:
+            self.stats["misses"] += 1
+        else:
+            self.stats["covered" if result["covered"] else "partial"] += 1
+        return result
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            await self.reload()
+
+    async def start(self):
+        """Load the table and watch the file for changes."""
+        if self._task is not None:
+            return
+        await self.reload(force=True)
+        if self.reload_interval > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Cancel the file watcher."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def get_stats(self) -> dict:
+        index = self.index
+        return dict(
+            self.stats,
+            path=self.path,
+            languages=index.languages,
+            rows=len(index.rows),
+            phrases=len(index.patterns),
+            skipped_phrases=index.skipped,
+            trie_nodes=index.nodes,
+            loaded_at=self.loaded_at,
+            load_seconds=self.load_seconds,
+        )
+
+
+phrase_table = PhraseTable()
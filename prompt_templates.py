@@ -0,0 +1,155 @@
+"""
+Versioned prompt templates.
+
+Ollama keeps the KV cache of the previous prompt in each slot and only re-evaluates what comes
+after the longest shared prefix. The original (v1) prompts put the language names, the text and
+then more instructions in one string, so little could be shared between requests. The chat
+templates (v2) send a fixed system message per language pair first and the text last, through
+/api/chat, so every request for a pair starts with the same tokens and only the text itself is
+evaluated. The language names come at the end of the system message, so even different pairs
+share the instructions before them. System messages are rendered once per pair and reused, so
+the prefix is byte-for-byte identical across requests.
+
+The active version is PROMPT_TEMPLATE_VERSION. It is part of the translation cache key and of
+the prompt-eval metrics, so versions can be compared side by side.
+"""
+
+import json
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+from config import PROMPT_TEMPLATE_VERSION
+
+
+@dataclass
+class RenderedPrompt:
+    """Payload fields for one generation, plus the full prompt text for size estimates."""
+    fields: dict  # {"prompt": ...} for /api/generate or {"messages": [...]} for /api/chat
+    text: str
+
+
+class PromptTemplate:
+    """Base class: a named template version that renders single-text and batch prompts."""
+
+    version = ""
+
+    def single(self, text: str, source_lang: str, target_lang: str, context: Optional[str] = None) -> RenderedPrompt:
+        raise NotImplementedError
+
+    def batch(self, texts: Dict[str, str], source_lang: str, target_lang: str) -> RenderedPrompt:
+        raise NotImplementedError
+
+    def multi(self, text: str, source_lang: str, target_langs: List[str]) -> RenderedPrompt:
+        """One text into several languages; the model answers with a JSON object keyed by language name."""
+        raise NotImplementedError
+
+
+class GeneratePromptTemplate(PromptTemplate):
+    """v1: one free-form /api/generate prompt per request."""
+
+    version = "v1"
+
+    def single(self, text: str, source_lang: str, target_lang: str, context: Optional[str] = None) -> RenderedPrompt:
+        context_block = ""
+        if context:
+            context_block = f"""
+        Preceding text, for context only (do not translate it): "{context}"
+        """
+        prompt = f"""
+        You are a professional translator. Translate the following text from {source_lang} to {target_lang}.
+        {context_block}
+        Text to translate: "{text}"
+        
+        Please provide only the translated text without any additional explanations, quotes, or formatting. Keep tokens such as {{0}} or {{1}} exactly as they are.
+        """
+        return RenderedPrompt({"prompt": prompt}, prompt)
+
+    def batch(self, texts: Dict[str, str], source_lang: str, target_lang: str) -> RenderedPrompt:
+        prompt = f"""
+        You are a professional translator. Translate every value in the following JSON object from {source_lang} to {target_lang}.
+        
+        Return only a JSON object with exactly the same keys, where each value is the translation of the original value. Do not add, merge or drop keys, and do not add explanations. Keep tokens such as {{0}} or {{1}} exactly as they are.
+        
+        {json.dumps(texts, ensure_ascii=False)}
+        """
+        return RenderedPrompt({"prompt": prompt}, prompt)
+
+    def multi(self, text: str, source_lang: str, target_langs: List[str]) -> RenderedPrompt:
+        prompt = f"""
+        You are a professional translator. Translate the following text from {source_lang} into each of these languages: {", ".join(target_langs)}.
+        
+        Return only a JSON object whose keys are exactly these language names and whose values are the translations. Do not add explanations. Keep tokens such as {{0}} or {{1}} exactly as they are.
+        
+        Text to translate: "{text}"
+        """
+        return RenderedPrompt({"prompt": prompt}, prompt)
+
+
+# Protected spans (placeholders, markup, URLs) are sent as numbered sentinels; see span_protection
+_KEEP_SENTINELS = "Keep tokens such as {0} or {1} exactly as they are."
+
+
+@lru_cache(maxsize=4096)
+def _system_message(source_lang: str, target_lang: str, batch: bool) -> dict:
+    # Pair-independent instructions come first so prompts for different pairs still share a prefix
+    if batch:
+        content = (
+            "You are a professional translator. The user sends a JSON object. Return only a JSON object with exactly "
+            "the same keys, where each value is the translation of the original value. Do not add, merge or drop keys, "
+            f"and do not add explanations. {_KEEP_SENTINELS} Translate every value from {source_lang} to {target_lang}."
+        )
+    else:
+        content = (
+            "You are a professional translator. Reply with only the translated text, without explanations, quotes or "
+            'formatting. If the message has a "Context:" section, use it only to understand the text after "Text:" and '
+            f"do not translate it. {_KEEP_SENTINELS} Translate the user's message from {source_lang} to {target_lang}."
+        )
+    return {"role": "system", "content": content}
+
+
+@lru_cache(maxsize=1024)
+def _multi_system_message(source_lang: str, target_langs: tuple) -> dict:
+    content = (
+        "You are a professional translator. Return only a JSON object whose keys are exactly the language names "
+        "listed below and whose values are translations of the user's message into those languages. Do not add "
+        f"explanations. {_KEEP_SENTINELS} Translate from {source_lang} into each of these languages: {', '.join(target_langs)}."
+    )
+    return {"role": "system", "content": content}
+
+
+class ChatPromptTemplate(PromptTemplate):
+    """v2: /api/chat with a fixed system message per language pair first and the text last."""
+
+    version = "v2"
+
+    def single(self, text: str, source_lang: str, target_lang: str, context: Optional[str] = None) -> RenderedPrompt:
+        system = _system_message(source_lang, target_lang, False)
+        content = f"Context: {context}\n\nText: {text}" if context else text
+        return RenderedPrompt(
+            {"messages": [system, {"role": "user", "content": content}]},
+            system["content"] + "\n" + content,
+        )
+
+    def batch(self, texts: Dict[str, str], source_lang: str, target_lang: str) -> RenderedPrompt:
+        system = _system_message(source_lang, target_lang, True)
+        content = json.dumps(texts, ensure_ascii=False)
+        return RenderedPrompt(
+            {"messages": [system, {"role": "user", "content": content}]},
+            system["content"] + "\n" + content,
+        )
+
+    def multi(self, text: str, source_lang: str, target_langs: List[str]) -> RenderedPrompt:
+        system = _multi_system_message(source_lang, tuple(target_langs))
+        return RenderedPrompt(
+            {"messages": [system, {"role": "user", "content": text}]},
+            system["content"] + "\n" + text,
+        )
+
+
+TEMPLATES: Dict[str, PromptTemplate] = {t.version: t for t in (GeneratePromptTemplate(), ChatPromptTemplate())}
+
+if PROMPT_TEMPLATE_VERSION not in TEMPLATES:
+    raise ValueError(f"Unknown PROMPT_TEMPLATE_VERSION {PROMPT_TEMPLATE_VERSION!r}; choose from {', '.join(TEMPLATES)}")
+
+prompt_template = TEMPLATES[PROMPT_TEMPLATE_VERSION]
@@ -0,0 +1,115 @@
+"""
+Startup warm-up and readiness.
+
+The app starts serving as soon as it has been imported and its startup handler has run; the
+slow parts of getting warm run in the background instead: loading the language detector's
+profiles, building the phrase table, the first Ollama probe, preloading the models and sweeping
+expired cache entries. Each is tracked as a subsystem (pending, warming, ready, failed or
+disabled, with its warm-up time), and GET /health/ready answers 200 only once every subsystem
+in READINESS_REQUIRED is ready, so an orchestrator routes traffic only to warm replicas.
+GET /health/live only says the process is serving.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Awaitable, Dict, Optional
+
+from config import READINESS_REQUIRED
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+WARMING = "warming"
+READY = "ready"
+FAILED = "failed"
+DISABLED = "disabled"
+
+
+class Subsystem:
+    """Warm-up state of one subsystem."""
+
+    def __init__(self, name: str, required: bool):
+        self.name = name
+        self.required = required
+        self.state = PENDING
+        self.seconds: Optional[float] = None
+        self.error: Optional[str] = None
+
+    def to_dict(self) -> dict:
+        return {"state": self.state, "required": self.required, "seconds": self.seconds, "error": self.error}
+
+
+class Readiness:
+    """Runs warm-ups in the background and reports whether the required ones are done."""
+
+    def __init__(self, required: str = READINESS_REQUIRED):
+        self.required = {name.strip() for name in required.split(",") if name.strip()}
+        self.subsystems: Dict[str, Subsystem] = {}
+        self.started_at = time.monotonic()
+        self.ready_after: Optional[float] = None  # Seconds from startup until ready
+        self._tasks = []
+
+    def warm(self, name: str, warm_up: Optional[Awaitable]):
+        """Track warm_up (an awaitable, or None if the subsystem is disabled) as subsystem name."""
+        subsystem = self.subsystems[name] = Subsystem(name, name in self.required)
+        if warm_up is None:
+            subsystem.state = DISABLED
+            self._check_ready()
+            return
+        subsystem.state = WARMING
+        self._tasks.append(asyncio.ensure_future(self._run(subsystem, warm_up)))
+
+    async def _run(self, subsystem: Subsystem, warm_up: Awaitable):
+        started = time.monotonic()
+        try:
+            await warm_up
+            subsystem.state = READY
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            subsystem.state = FAILED
+            subsystem.error = str(e)
+            logger.error(f"Warm-up of {subsystem.name} failed: {str(e)}")
+        subsystem.seconds = round(time.monotonic() - started, 3)
+        logger.info(f"Warm-up of {subsystem.name}: {subsystem.state} in {subsystem.seconds}s")
+        self._check_ready()
+
+    def _check_ready(self):
+        if self.ready_after is None and self.is_ready():
+            self.ready_after = round(time.monotonic() - self.started_at, 3)
+            logger.info(f"Ready {self.ready_after}s after startup")
+
+    def is_ready(self) -> bool:
+        """True once every required subsystem is ready (or disabled)."""
+        return all(
+            name in self.subsystems and self.subsystems[name].state in (READY, DISABLED)
+            for name in self.required
+        )
+
+    async def wait(self):
+        """Wait until every warm-up started so far has finished, whatever its outcome."""
+        if self._tasks:
+            await asyncio.wait(self._tasks)
+
+    async def stop(self):
+        """Cancel warm-ups still running."""
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+
+    def get_stats(self) -> dict:
+        return {
+            "ready": self.is_ready(),
+            "uptime": round(time.monotonic() - self.started_at, 3),
+            "ready_after": self.ready_after,
+            "subsystems": {name: subsystem.to_dict() for name, subsystem in self.subsystems.items()},
+        }
+
+
+readiness = Readiness()
@@ -0,0 +1,73 @@
+"""
+Single-flight coalescing of identical in-flight work.
+
+The first caller for a key starts the work; concurrent callers with the same key await the
+same task instead of starting their own. Errors propagate to every waiter. A waiter being
+cancelled (e.g. its client went away) does not affect the others; the shared work is only
+cancelled once nobody is waiting for it any more.
+"""
+
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class _Flight:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Future):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Deduplicate concurrent calls that share a key."""
+
+    def __init__(self):
+        self._flights: Dict[str, _Flight] = {}
+        self.stats = {
+            "leaders": 0,     # calls that started work
+            "coalesced": 0,   # calls that joined work already in flight
+            "abandoned": 0,   # shared work cancelled because every waiter went away
+        }
+
+    def in_flight(self) -> int:
+        """Number of distinct keys currently being worked on."""
+        return len(self._flights)
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """Run fn() once per key at a time and share its outcome with concurrent callers."""
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(fn()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _, key=key, flight=flight: self._forget(key, flight))
+            self.stats["leaders"] += 1
+        else:
+            self.stats["coalesced"] += 1
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # Every caller was cancelled; stop the shared work too
+                flight.task.cancel()
+                self.stats["abandoned"] += 1
+
+    def get_stats(self) -> dict:
+        stats = dict(self.stats)
+        stats["in_flight"] = self.in_flight()
+        return stats
+
+    def _forget(self, key: str, flight: _Flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        # Mark a failure as retrieved if every waiter had already gone away
+        if not flight.task.cancelled() and flight.task.exception() is not None and flight.waiters == 0:
+            logger.debug(f"Coalesced work for {key} failed with no waiters: {flight.task.exception()}")
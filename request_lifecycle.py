@@ -0,0 +1,250 @@
+"""
+Client disconnects and request deadlines.
+
+Ollama keeps generating until its HTTP request is closed, so work for a client that has gone
+away has to be cancelled rather than left to finish. RequestLifecycleMiddleware runs each
+request in its own task and cancels it as soon as the client disconnects; the cancellation
+unwinds through the admission queue, request coalescing and the backend pool and closes the
+Ollama connection, which makes Ollama stop generating.
+
+Clients may bound a request with an X-Request-Timeout header (seconds). The deadline is kept in
+a context variable: admission control does not queue work that cannot start in time, upstream
+timeouts are capped to the time left, and a request still running when it passes is cancelled
+and answered with 504. A response already under way is ended instead: a stream gets a final
+`error` event, any other body is closed where it stopped.
+"""
+
+import asyncio
+import json
+import logging
+import time
+from contextvars import ContextVar
+from typing import Awaitable, Optional, TypeVar
+
+from fastapi import HTTPException
+
+from config import REQUEST_DEFAULT_TIMEOUT, REQUEST_MAX_TIMEOUT
+from generation_planner import generation_planner
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+TIMEOUT_HEADER = b"x-request-timeout"
+
+# Status recorded in metrics for requests whose client went away (nginx's convention); never sent
+CLIENT_CLOSED_REQUEST = 499
+
+# Monotonic time by which the current request must be answered, None without a deadline
+current_deadline: ContextVar[Optional[float]] = ContextVar("current_deadline", default=None)
+
+
+class DeadlineExceeded(HTTPException):
+    """Raised when the client's deadline has passed or cannot be met; rendered by FastAPI as 504."""
+
+    def __init__(self, detail: str = "Request deadline exceeded."):
+        super().__init__(status_code=504, detail=detail)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left until the current request's deadline, or None without one."""
+    deadline = current_deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def expired() -> bool:
+    left = remaining()
+    return left is not None and left <= 0
+
+
+def cap_timeout(timeout: Optional[float], default: float) -> Optional[float]:
+    """Bound an upstream timeout (default when None) by the time left; unchanged without a deadline."""
+    left = remaining()
+    if left is None:
+        return timeout
+    if left <= 0:
+        raise DeadlineExceeded()
+    return min(timeout if timeout is not None else default, left)
+
+
+async def without_deadline(awaitable: Awaitable[T]) -> T:
+    """
+    Await work shared by several requests outside any one request's deadline.
+
+    Meant to run as its own task (e.g. a coalesced generation); each waiter is still bounded by
+    its own deadline, and the work is cancelled once every waiter has gone.
+    """
+    current_deadline.set(None)
+    return await awaitable
+
+
+class CancellationTracker:
+    """Counts cancelled requests and estimates the Ollama work their cancellation saved."""
+
+    def __init__(self):
+        self.stats = {
+            "client_disconnects": 0,     # requests cancelled because the client went away
+            "deadlines_exceeded": 0,     # requests cancelled when their deadline passed
+            "generations_cancelled": 0,  # Ollama generations aborted part-way
+            "tokens_saved": 0.0,         # estimated output tokens not generated
+            "seconds_saved": 0.0,        # estimated generation time not spent
+        }
+
+    def generation_cancelled(self, payload: dict, elapsed: float, generated: Optional[int] = None):
+        """
+        Record an aborted generation.
+
+        The tokens it would still have produced are the output the planner expected minus what was
+        generated: counted chunks for a stream, otherwise elapsed time at the model's observed
+        speed, which also counts prompt evaluation and so errs towards saving less.
+        """
+        num_predict = (payload.get("options") or {}).get("num_predict")
+        rate = generation_planner.tokens_per_second(payload.get("model", ""))
+        if generated is None:
+            generated = elapsed * rate
+        saved = max(0.0, generation_planner.expected_output(num_predict) - generated) if num_predict else 0.0
+        self.stats["generations_cancelled"] += 1
+        self.stats["tokens_saved"] += saved
+        self.stats["seconds_saved"] += saved / rate
+
+    def get_stats(self) -> dict:
+        stats = dict(self.stats)
+        stats["tokens_saved"] = round(stats["tokens_saved"])
+        stats["seconds_saved"] = round(stats["seconds_saved"], 3)
+        stats["default_timeout"] = REQUEST_DEFAULT_TIMEOUT or None
+        stats["max_timeout"] = REQUEST_MAX_TIMEOUT
+        return stats
+
+
+cancellations = CancellationTracker()
+
+
+def _parse_timeout(scope) -> Optional[float]:
+    """Return the request's timeout in seconds; raises ValueError for a malformed header."""
+    for name, value in scope.get("headers", []):
+        if name == TIMEOUT_HEADER:
+            timeout = float(value.decode("latin-1"))
+            if not timeout > 0:
+                raise ValueError(timeout)
+            return min(timeout, REQUEST_MAX_TIMEOUT)
+    return REQUEST_DEFAULT_TIMEOUT or None
+
+
+def format_stream_event(event: str, data: dict, ndjson: bool = False) -> str:
+    """Encode one streaming event as Server-Sent Events (default) or NDJSON."""
+    if ndjson:
+        return json.dumps({"event": event, **data}, ensure_ascii=False) + "\n"
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def _end_response(send, content_type: str, detail: str):
+    """Close a response cut short after it started, with an error event if it is a stream."""
+    body = b""
+    if content_type.startswith("text/event-stream"):
+        body = format_stream_event("error", {"detail": detail}).encode()
+    elif content_type.startswith("application/x-ndjson"):
+        body = format_stream_event("error", {"detail": detail}, ndjson=True).encode()
+    try:
+        await send({"type": "http.response.body", "body": body, "more_body": False})
+    except Exception as e:
+        logger.debug(f"Could not end the response: {e}")
+
+
+async def _send_json(send, status: int, detail: str):
+    body = json.dumps({"detail": detail}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class RequestLifecycleMiddleware:
+    """ASGI middleware that cancels a request when its client disconnects or its deadline passes."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            timeout = _parse_timeout(scope)
+        except ValueError:
+            await _send_json(send, 400, "X-Request-Timeout must be a positive number of seconds.")
+            return
+
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        token = current_deadline.set(deadline)
+        messages: asyncio.Queue = asyncio.Queue()
+        response = {"started": False, "complete": False, "content_type": ""}
+
+        async def pump():
+            # Read ahead of the app so a disconnect is noticed while it is still working
+            while True:
+                message = await receive()
+                messages.put_nowait(message)
+                if message["type"] == "http.disconnect":
+                    return
+
+        async def tracked_send(message):
+            if message["type"] == "http.response.start":
+                response["started"] = True
+                headers = dict(message.get("headers", []))
+                response["content_type"] = headers.get(b"content-type", b"").decode("latin-1").lower()
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                response["complete"] = True
+            await send(message)
+
+        app_task = asyncio.ensure_future(self.app(scope, messages.get, tracked_send))
+        pump_task = asyncio.ensure_future(pump())
+        try:
+            wait = None if deadline is None else max(0.0, deadline - time.monotonic())
+            done, _ = await asyncio.wait({app_task, pump_task}, timeout=wait, return_when=asyncio.FIRST_COMPLETED)
+            if app_task not in done and pump_task in done and pump_task.exception() is not None:
+                # Reading the request failed; that is not a disconnect, so let the app finish
+                logger.warning(f"Reading {scope['method']} {scope['path']} failed: {pump_task.exception()}")
+                wait = None if deadline is None else max(0.0, deadline - time.monotonic())
+                done, _ = await asyncio.wait({app_task}, timeout=wait)
+            # pump() only returns normally on http.disconnect
+            disconnected = pump_task.done() and not pump_task.cancelled() and pump_task.exception() is None
+            if app_task not in done and disconnected and not response["complete"]:
+                await self._cancel(app_task)
+                cancellations.stats["client_disconnects"] += 1
+                logger.info(f"Client disconnected, cancelled {scope['method']} {scope['path']}")
+                if not response["started"]:
+                    try:
+                        # The server drops it, but it marks the request as abandoned in the metrics
+                        await send({"type": "http.response.start", "status": CLIENT_CLOSED_REQUEST, "headers": []})
+                    except Exception:
+                        pass
+                return
+            if not done:
+                await self._cancel(app_task)
+                cancellations.stats["deadlines_exceeded"] += 1
+                logger.info(f"Deadline of {timeout}s exceeded, cancelled {scope['method']} {scope['path']}")
+                if not response["started"]:
+                    await _send_json(send, 504, "Request deadline exceeded.")
+                elif not response["complete"]:
+                    await _end_response(send, response["content_type"], "Request deadline exceeded.")
+                return
+            # Finished, or the client left after the whole response was sent (background tasks may still run)
+            await app_task
+        finally:
+            pump_task.cancel()
+            if not app_task.done():
+                await self._cancel(app_task)
+            current_deadline.reset(token)
+
+    @staticmethod
+    async def _cancel(task: asyncio.Task):
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.debug(f"Cancelled request failed while unwinding: {e}")
@@ -0,0 +1,448 @@
+"""
+Localization resource translation: JSON bundles, gettext PO files and HTML fragments.
+
+Each format is parsed into literal text that is copied through unchanged (keys, comments,
+markup, formatting) and translatable strings. Identical strings are translated once per
+document, through the cache and the batched generation pipeline, and the resource is rebuilt
+around the translations. A string that cannot be translated keeps its source text, in its
+original encoding, so the output is always a valid resource of the same format. Strings with
+nothing to translate (numbers, URLs, lone placeholders or identifiers) are copied through too.
+
+- json: string values anywhere in the document; keys, numbers and layout are kept as written.
+- po: msgid / msgid_plural of entries with no translation yet; translated entries and the
+  header are left alone.
+- html: text, plus the alt, title, placeholder and aria-label attributes. Text and inline
+  elements (b, a, em, span, br, ...) between two block boundaries form one string, with the
+  inline tags masked as {n} sentinels, so a sentence split by markup is translated whole. Text
+  inside script, style, code and pre, and inside elements marked translate="no" or
+  class="notranslate", is left alone; inline ones are masked whole.
+"""
+
+import html
+import json
+import logging
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+from config import BATCH_CONCURRENCY
+from batch_translator import translate_batch
+from model_router import model_router
+from span_protection import is_translatable
+from translation_cache import translation_cache, make_key
+from translator import CACHE_KEY_OPTIONS
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ("json", "po", "html")
+
+
+@dataclass
+class Slot:
+    """
+    A translatable string: its text, how it was written, and how to write a translation.
+    encode returns None for a translation that cannot be used, which keeps the raw form.
+    """
+    text: str
+    raw: str
+    encode: Callable[[str], Optional[str]]
+
+
+@dataclass
+class Resource:
+    """A parsed resource: literal text and Slots which, joined in order, reproduce the input."""
+    parts: List[Union[str, Slot]] = field(default_factory=list)
+
+    def literal(self, text: str):
+        if text:
+            self.parts.append(text)
+
+    def slot(self, text: str, raw: str, encode: Callable[[str], Optional[str]]):
+        self.parts.append(Slot(text, raw, encode))
+
+    @property
+    def strings(self) -> List[str]:
+        return [part.text for part in self.parts if isinstance(part, Slot)]
+
+    def render(self, translations: Dict[str, Optional[str]]) -> str:
+        """Rebuild the resource; strings without a translation keep their original form."""
+        out = []
+        for part in self.parts:
+            if isinstance(part, str):
+                out.append(part)
+            else:
+                translated = translations.get(part.text)
+                encoded = part.encode(translated) if translated is not None else None
+                out.append(encoded if encoded is not None else part.raw)
+        return "".join(out)
+
+
+# JSON
+
+_JSON_STRING = re.compile(r'"(?:[^"\\]|\\.)*"', re.S)
+_JSON_KEY_FOLLOWS = re.compile(r"\s*:")
+
+
+def parse_json(content: str) -> Resource:
+    """Find the string values of a JSON document; raises ValueError if it is not valid JSON."""
+    json.loads(content)
+    resource = Resource()
+    position = 0
+    # In valid JSON every quote outside a string opens one, so a left-to-right scan sees only
+    # string tokens; a string followed by a colon is an object key
+    for match in _JSON_STRING.finditer(content):
+        resource.literal(content[position:match.start()])
+        raw = match.group(0)
+        text = json.loads(raw)
+        if _JSON_KEY_FOLLOWS.match(content, match.end()) or not is_translatable(text):
+            resource.literal(raw)
+        else:
+            resource.slot(text, raw, lambda t: json.dumps(t, ensure_ascii=False))
+        position = match.end()
+    resource.literal(content[position:])
+    return resource
+
+
+# gettext PO
+
+_PO_FIELD = re.compile(r'^(msgctxt|msgid|msgid_plural|msgstr(?:\[(\d+)\])?)\s+(".*")\s*$')
+_PO_CONTINUATION = re.compile(r'^\s*(".*")\s*$')
+_PO_ESCAPES = {"n": "\n", "t": "\t", "r": "\r", '"': '"', "\\": "\\"}
+_PO_ESCAPE = re.compile(r"\\(.)")
+
+
+def _po_unquote(quoted: List[str]) -> str:
+    return "".join(_PO_ESCAPE.sub(lambda m: _PO_ESCAPES.get(m.group(1), m.group(1)), q[1:-1]) for q in quoted)
+
+
+def _po_quote(text: str) -> str:
+    escaped = text.replace("\\", "\\\\").replace('"', '\\"').replace("\t", "\\t").replace("\r", "\\r")
+    lines = escaped.split("\n")
+    pieces = [line + "\\n" for line in lines[:-1]] + ([lines[-1]] if lines[-1] else [])
+    if len(pieces) <= 1:
+        return f'"{pieces[0] if pieces else ""}"'
+    # Multi-line strings start with an empty string, as msgmerge writes them
+    return '""\n' + "\n".join(f'"{piece}"' for piece in pieces)
+
+
+@dataclass
+class _PoField:
+    name: str
+    index: Optional[int]
+    quoted: List[str]
+    start: int  # first line
+    end: int  # line after the last continuation
+
+    @property
+    def value(self) -> str:
+        return _po_unquote(self.quoted)
+
+
+def _po_entries(lines: List[str]):
+    """Yield the fields of each entry (a run of non-blank lines) of a PO file."""
+    fields: List[_PoField] = []
+    for number, line in enumerate(lines):
+        stripped = line.strip()
+        match = _PO_FIELD.match(stripped)
+        if match:
+            index = int(match.group(2)) if match.group(2) is not None else None
+            fields.append(_PoField(match.group(1).split("[")[0], index, [match.group(3)], number, number + 1))
+            continue
+        continuation = _PO_CONTINUATION.match(line)
+        if continuation and fields and fields[-1].end == number:
+            fields[-1].quoted.append(continuation.group(1))
+            fields[-1].end = number + 1
+            continue
+        if not stripped and fields:
+            yield fields
+            fields = []
+        elif stripped and not stripped.startswith("#"):
+            raise ValueError(f"Invalid PO line {number + 1}: {line[:80]!r}")
+    if fields:
+        yield fields
+
+
+def parse_po(content: str) -> Resource:
+    """Find the untranslated entries of a gettext PO file; raises ValueError on a malformed line."""
+    lines = content.splitlines(keepends=True)
+    resource = Resource()
+    position = 0
+    for fields in _po_entries(lines):
+        by_name = {f.name: f for f in fields if f.name != "msgstr"}
+        targets = [f for f in fields if f.name == "msgstr"]
+        msgid = by_name.get("msgid")
+        if msgid is None or not msgid.value or not targets or any(f.value for f in targets):
+            continue
+        plural = by_name.get("msgid_plural")
+        for target in targets:
+            source = plural if plural is not None and target.index else msgid
+            if not is_translatable(source.value):
+                continue
+            resource.literal("".join(lines[position:target.start]))
+            raw = "".join(lines[target.start:target.end])
+            keyword = "msgstr" if target.index is None else f"msgstr[{target.index}]"
+            newline = "\n" if raw.endswith("\n") else ""
+            resource.slot(source.value, raw, lambda t, keyword=keyword, newline=newline: f"{keyword} {_po_quote(t)}{newline}")
+            position = target.end
+    resource.literal("".join(lines[position:]))
+    return resource
+
+
+# HTML
+
+_HTML_TOKEN = re.compile(
+    r"<!--.*?-->|<!\[CDATA\[.*?\]\]>|<![^>]*>|<\?.*?>"
+    r"|<(script|style)\b[^>]*>.*?</\1\s*>"
+    r"|</?[A-Za-z][^>]*>",
+    re.S | re.I,
+)
+_HTML_TAG_NAME = re.compile(r"</?\s*([A-Za-z][\w:-]*)")
+_HTML_ATTRIBUTE = re.compile(
+    r"""(\s(?:alt|title|placeholder|aria-label)\s*=\s*)(?:"([^"]*)"|'([^']*)')""",
+    re.I,
+)
+_HTML_NO_TRANSLATE = re.compile(r"""\stranslate\s*=\s*["']?no\b|\sclass\s*=\s*["'][^"']*\bnotranslate\b""", re.I)
+_HTML_VOID = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "param", "source", "track", "wbr"}
+_HTML_SKIP = {"code", "pre", "kbd", "samp", "var", "textarea"}
+# Elements that sit inside a sentence; they are masked instead of splitting the text around them
+_HTML_INLINE = {
+    "a", "abbr", "b", "bdi", "bdo", "br", "cite", "code", "data", "del", "dfn", "em", "i", "img", "ins",
+    "kbd", "mark", "q", "s", "samp", "small", "span", "strong", "sub", "sup", "time", "u", "var", "wbr",
+}
+_HTML_SENTINEL = re.compile(r"\{(\d+)\}")
+
+
+def _html_text(resource: Resource, raw: str, quote: bool = False):
+    """Add a text node or attribute value, translating its content and keeping surrounding whitespace."""
+    text = html.unescape(raw)
+    core = text.strip()
+    if not is_translatable(core):
+        resource.literal(raw)
+        return
+    leading = raw[:len(raw) - len(raw.lstrip())]
+    trailing = raw[len(raw.rstrip()):]
+    resource.literal(leading)
+    resource.slot(core, raw.strip(), lambda t: html.escape(t, quote=quote))
+    resource.literal(trailing)
+
+
+def _html_has_text_attribute(tag: str) -> bool:
+    return any(
+        is_translatable(html.unescape(m.group(2) if m.group(2) is not None else m.group(3)))
+        for m in _HTML_ATTRIBUTE.finditer(tag)
+    )
+
+
+def _html_unmask(text: str, base: int, tags: List[str]) -> Optional[str]:
+    """Put the inline tags back for their sentinels; None if one went missing."""
+    seen = set()
+
+    def replace(match):
+        index = int(match.group(1)) - base
+        if not 0 <= index < len(tags):
+            return match.group(0)
+        seen.add(index)
+        return tags[index]
+
+    restored = _HTML_SENTINEL.sub(replace, text)
+    return restored if len(seen) == len(tags) else None
+
+
+class _HtmlRun:
+    """Text and inline markup between two block boundaries, translated as one string."""
+
+    def __init__(self):
+        self.pieces: List[Tuple[bool, str]] = []  # (is_markup, raw)
+
+    def text(self, raw: str):
+        self.pieces.append((False, raw))
+
+    def markup(self, raw: str):
+        if self.pieces and self.pieces[-1][0]:
+            self.pieces[-1] = (True, self.pieces[-1][1] + raw)  # Adjacent tags share one sentinel
+        else:
+            self.pieces.append((True, raw))
+
+    def flush(self, resource: Resource):
+        pieces, self.pieces = self.pieces, []
+        raw = "".join(piece for _, piece in pieces)
+        if not any(is_markup for is_markup, _ in pieces):
+            if raw:
+                _html_text(resource, raw)
+            return
+        # Number the sentinels after any {n} placeholder already in the text
+        texts = [html.unescape(piece) for is_markup, piece in pieces if not is_markup]
+        base = 1 + max((int(n) for text in texts for n in _HTML_SENTINEL.findall(text)), default=-1)
+        tags: List[str] = []
+        masked = []
+        for is_markup, piece in pieces:
+            if is_markup:
+                masked.append("{%d}" % (base + len(tags)))
+                tags.append(piece)
+            else:
+                masked.append(html.unescape(piece))
+        text = "".join(masked).strip()
+        if not is_translatable(text):
+            resource.literal(raw)
+            return
+        resource.literal(raw[:len(raw) - len(raw.lstrip())])
+        resource.slot(text, raw.strip(), lambda t: _html_unmask(html.escape(t, quote=False), base, tags))
+        resource.literal(raw[len(raw.rstrip()):])
+
+
+def _html_tag(resource: Resource, tag: str, translate: bool):
+    if not translate:
+        resource.literal(tag)
+        return
+    position = 0
+    for match in _HTML_ATTRIBUTE.finditer(tag):
+        value = match.group(2) if match.group(2) is not None else match.group(3)
+        quote_char = '"' if match.group(2) is not None else "'"
+        resource.literal(tag[position:match.end(1)] + quote_char)
+        _html_text(resource, value, quote=True)
+        resource.literal(quote_char)
+        position = match.end()
+    resource.literal(tag[position:])
+
+
+def parse_html(content: str) -> Resource:
+    """Find the text runs and translatable attributes of an HTML document or fragment."""
+    resource = Resource()
+    run = _HtmlRun()
+    stack: List[str] = []  # open elements
+    skip_depth: Optional[int] = None  # stack depth at which an untranslated subtree started
+    inline_skip = False  # the untranslated subtree is inline and masked whole inside the run
+    position = 0
+    for match in _HTML_TOKEN.finditer(content):
+        text = content[position:match.start()]
+        if text:
+            if skip_depth is None:
+                run.text(text)
+            elif inline_skip:
+                run.markup(text)
+            else:
+                resource.literal(text)
+        position = match.end()
+        tag = match.group(0)
+        name = _HTML_TAG_NAME.match(tag)
+        if name is None or match.group(1):
+            # Comment, doctype, processing instruction, script or style
+            if inline_skip:
+                run.markup(tag)
+            else:
+                run.flush(resource)
+                resource.literal(tag)
+            continue
+        name = name.group(1).lower()
+        if tag.startswith("</"):
+            if inline_skip or (skip_depth is None and name in _HTML_INLINE):
+                run.markup(tag)
+            else:
+                run.flush(resource)
+                resource.literal(tag)
+            if name in stack:
+                # Close the element and anything left open inside it
+                depth = len(stack) - 1 - stack[::-1].index(name)
+                del stack[depth:]
+                if skip_depth is not None and depth <= skip_depth:
+                    skip_depth = None
+                    inline_skip = False
+            continue
+        no_translate = bool(_HTML_NO_TRANSLATE.search(tag))
+        translate = skip_depth is None and not no_translate
+        # An inline tag whose attributes need translating ends the run, so they get slots of their own
+        inline = name in _HTML_INLINE and not (translate and _html_has_text_attribute(tag))
+        if inline_skip or (skip_depth is None and inline):
+            run.markup(tag)
+        else:
+            run.flush(resource)
+            _html_tag(resource, tag, translate)
+        if name in _HTML_VOID or tag.rstrip(">").rstrip().endswith("/"):
+            continue
+        if skip_depth is None and (no_translate or name in _HTML_SKIP):
+            skip_depth = len(stack)
+            inline_skip = inline
+        stack.append(name)
+    text = content[position:]
+    if text:
+        if skip_depth is None:
+            run.text(text)
+        elif inline_skip:
+            run.markup(text)
+        else:
+            resource.literal(text)
+    run.flush(resource)
+    return resource
+
+
+_PARSERS = {"json": parse_json, "po": parse_po, "html": parse_html}
+
+
+def parse_resource(content: str, resource_format: str) -> Resource:
+    """Parse a resource of one of FORMATS; raises ValueError if the content is malformed."""
+    return _PARSERS[resource_format](content)
+
+
+@dataclass
+class ResourceResult:
+    content: str
+    strings: int  # translatable strings in the resource
+    unique_strings: int  # distinct strings, each translated once
+    cached: int
+    translated: int
+    failed: int  # distinct strings left in the source language
+    seconds: float
+
+
+async def translate_resource(
+    resource: Resource,
+    source_lang: str,
+    target_lang: str,
+    concurrency: int = BATCH_CONCURRENCY,
+) -> ResourceResult:
+    """
+    Translate a parsed resource and rebuild it.
+
+    Distinct strings are looked up in the cache, and the rest go through micro-batching in one
+    call, so short strings share prompts. Strings that could not be translated are reported in
+    `failed` and kept in the source language.
+    """
+    started = time.monotonic()
+    strings = resource.strings
+    unique = list(dict.fromkeys(strings))
+    translations: Dict[str, Optional[str]] = {}
+    models = [model_router.select(text, source_lang, target_lang) for text in unique]
+    cache_keys = [make_key(text, source_lang, target_lang, model, CACHE_KEY_OPTIONS) for text, model in zip(unique, models)]
+    pending = []  # (text, model, cache_key)
+    for text, model, cache_key, cached_text in zip(unique, models, cache_keys, await translation_cache.get_many(cache_keys)):
+        if cached_text is not None:
+            translations[text] = cached_text
+        else:
+            pending.append((text, model, cache_key))
+
+    cached = len(translations)
+    if pending:
+        results = await translate_batch([(text, source_lang, target_lang, model) for text, model, _ in pending], concurrency=concurrency)
+        stored = []
+        for (text, model, cache_key), translated_text in zip(pending, results):
+            if translated_text is not None:
+                translations[text] = translated_text
+                stored.append((cache_key, translated_text, source_lang, target_lang, model))
+        await translation_cache.set_many(stored)
+    translated = len(translations) - cached
+
+    result = ResourceResult(
+        content=resource.render(translations),
+        strings=len(strings),
+        unique_strings=len(unique),
+        cached=cached,
+        translated=translated,
+        failed=len(unique) - cached - translated,
+        seconds=round(time.monotonic() - started, 3),
+    )
+    logger.info(
+        f"Translated resource with {result.strings} strings ({result.unique_strings} distinct, {result.cached} cached, "
+        f"{result.failed} failed) in {result.seconds}s"
+    )
+    return result
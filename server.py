@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Production entry point for the Translation API.
+
+Serves main:app with uvicorn in API_WORKERS worker processes, so that language detection, JSON
+and HTTP work are spread over several cores instead of one event loop. Workers run on uvloop and
+httptools when they are installed (both come with uvicorn[standard]). On SIGTERM or SIGINT each
+worker stops accepting connections and gives in-flight requests up to
+API_GRACEFUL_SHUTDOWN_TIMEOUT seconds to finish, then runs the app's shutdown handlers: running
+jobs are left to be requeued on the next start and the SQLite tiers are closed.
+
+With more than one worker the Ollama health probe, metrics and cache purges are shared through
+SHARED_STATE_DB (see shared_state.py), and admission limits are split between the workers.
+
+Usage:
+    python server.py
+    python server.py --workers 4 --port 8080
+"""
+
+import argparse
+import importlib.util
+import logging
+import os
+import uuid
+
+from config import (
+    API_HOST,
+    API_PORT,
+    API_WORKERS,
+    API_LOOP,
+    API_HTTP,
+    API_GRACEFUL_SHUTDOWN_TIMEOUT,
+    ADMISSION_MAX_CONCURRENCY,
+    OLLAMA_BASE_URL,
+    OLLAMA_MODEL,
+    SHARED_STATE_DB,
+    TRANSLATION_CACHE_DB,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _installed(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+
+def resolve_loop(loop: str) -> str:
+    if loop == "auto":
+        return "uvloop" if _installed("uvloop") else "asyncio"
+    return loop
+
+
+def resolve_http(http: str) -> str:
+    if http == "auto":
+        return "httptools" if _installed("httptools") else "h11"
+    return http
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Serve the Translation API")
+    parser.add_argument("--host", default=API_HOST)
+    parser.add_argument("--port", type=int, default=API_PORT)
+    parser.add_argument("--workers", type=int, default=API_WORKERS, help="Worker processes")
+    parser.add_argument("--loop", default=API_LOOP, choices=("auto", "asyncio", "uvloop"))
+    parser.add_argument("--http", default=API_HTTP, choices=("auto", "h11", "httptools"))
+    parser.add_argument("--graceful-timeout", type=float, default=API_GRACEFUL_SHUTDOWN_TIMEOUT,
+                        help="Seconds in-flight requests get to finish on shutdown")
+    parser.add_argument("--log-level", default="info")
+    return parser.parse_args(argv)
+
+
+def serve(argv=None):
+    """Run the API until it receives SIGTERM or SIGINT."""
+    import uvicorn
+
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    workers = max(1, args.workers)
+    loop, http = resolve_loop(args.loop), resolve_http(args.http)
+
+    # Read by the workers when they import config and shared_state
+    os.environ["API_WORKERS"] = str(workers)
+    os.environ["SERVER_RUN_ID"] = uuid.uuid4().hex
+
+    if workers > 1:
+        if not SHARED_STATE_DB:
+            logger.warning("SHARED_STATE_DB is empty: every worker probes Ollama and reports its own metrics")
+        if not TRANSLATION_CACHE_DB:
+            logger.warning("TRANSLATION_CACHE_DB is empty: each worker caches translations on its own")
+        if ADMISSION_MAX_CONCURRENCY % workers:
+            logger.warning(f"ADMISSION_MAX_CONCURRENCY={ADMISSION_MAX_CONCURRENCY} is not a multiple of {workers} workers; each admits its share rounded up")
+
+    logger.info(f"Starting Translation API on http://{args.host}:{args.port} with {workers} worker(s), loop={loop}, http={http}")
+    logger.info(f"Ollama URL: {OLLAMA_BASE_URL}, model: {OLLAMA_MODEL}; API docs at /docs")
+    uvicorn.run(
+        "main:app",
+        host=args.host,
+        port=args.port,
+        workers=workers,
+        loop=loop,
+        http=http,
+        timeout_graceful_shutdown=args.graceful_timeout,
+        log_level=args.log_level,
+    )
+
+
+if __name__ == "__main__":
+    serve()
@@ -0,0 +1,289 @@
+"""
+State shared by the worker processes of one server.
+
+With API_WORKERS > 1 every worker is a separate process with its own memory. Left alone, each
+worker would probe Ollama on its own, /metrics would answer with the counters of whichever
+worker took the scrape, and a cache purge would only clear one worker's memory tier. The little
+that has to be shared is kept in a local SQLite database (WAL mode, so readers never block
+writers):
+
+- values with a timestamp, and short leases so that one worker does a job (such as the Ollama
+  probe) while the others reuse its result;
+- a row per worker with a heartbeat and its latest metrics samples, which /metrics adds up;
+- change counters that workers poll on their heartbeat, so that a cache purge in one worker
+  reaches the memory tier of the others.
+
+The persistent tiers (translation cache, translation memory, jobs) are SQLite files already and
+are shared as they are. With a single worker, or without SHARED_STATE_DB, all of this is off.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Callable, Dict, List, Optional, Tuple
+
+from config import API_WORKERS, SHARED_STATE_DB, SHARED_STATE_HEARTBEAT
+
+logger = logging.getLogger(__name__)
+
+# Set by server.py for each launch; rows left by an earlier launch are discarded even if recent
+RUN_ID = os.getenv("SERVER_RUN_ID", "")
+
+# A worker is presumed gone after missing this many heartbeats
+_MISSED_HEARTBEATS = 3
+
+
+class SharedState:
+    """Cross-process values, leases, worker heartbeats and change notifications in SQLite."""
+
+    def __init__(self, db_path: str = SHARED_STATE_DB, workers: int = API_WORKERS, heartbeat: float = SHARED_STATE_HEARTBEAT):
+        self.db_path = db_path
+        self.enabled = bool(db_path) and workers > 1
+        self.heartbeat = heartbeat
+        self.worker_id = ""
+        self.first_worker = True  # Whether this worker started the server run (it does one-off recovery)
+        self._db: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._snapshot: Optional[Callable[[], dict]] = None
+        self._watches: Dict[str, Tuple[Callable[[], None], int]] = {}  # name -> (callback, last generation seen)
+        self.stats = {
+            "heartbeats": 0,
+            "leases_won": 0,     # leases this worker took (it did the shared job)
+            "leases_lost": 0,    # leases held by another worker at the time
+            "notifications": 0,  # changes from other workers applied here
+        }
+
+    def _open_db(self):
+        self._db = sqlite3.connect(self.db_path, check_same_thread=False, timeout=10)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT NOT NULL, updated_at REAL NOT NULL)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS leases (name TEXT PRIMARY KEY, holder TEXT NOT NULL, expires_at REAL NOT NULL)")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS workers (
+                id TEXT PRIMARY KEY,
+                run_id TEXT NOT NULL,
+                pid INTEGER NOT NULL,
+                started_at REAL NOT NULL,
+                heartbeat_at REAL NOT NULL,
+                stopped INTEGER NOT NULL DEFAULT 0,
+                metrics TEXT
+            )
+            """
+        )
+        self._db.commit()
+
+    async def _call(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, fn, *args)
+
+    async def start(self, snapshot: Optional[Callable[[], dict]] = None):
+        """Join the server run and start heartbeats; snapshot() supplies this worker's metrics samples."""
+        if not self.enabled or self._task is not None:
+            return
+        self.worker_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"  # pids are reused across restarts
+        self._snapshot = snapshot
+        if self._db is None:
+            self._open_db()
+        self.first_worker = self._db_join()
+        for name, (callback, _) in list(self._watches.items()):
+            self._watches[name] = (callback, self._db_generation(name))
+        logger.info(f"Worker {self.worker_id} joined shared state {self.db_path}" + (" (first of this run)" if self.first_worker else ""))
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop heartbeats, publishing a last metrics snapshot so this worker's counters are kept."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        await self._call(self._db_heartbeat, self._metrics(), True)
+        with self._lock:
+            self._db.execute("DELETE FROM leases WHERE holder = ?", (self.worker_id,))
+            self._db.commit()
+            self._db.close()
+        self._db = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.heartbeat)
+            try:
+                await self.publish()
+                for name, generation in await self._call(self._db_generations, list(self._watches)):
+                    callback, seen = self._watches[name]
+                    if generation != seen:
+                        self._watches[name] = (callback, generation)
+                        self.stats["notifications"] += 1
+                        callback()
+            except Exception as e:
+                logger.error(f"Shared state heartbeat failed: {str(e)}")
+
+    def _metrics(self) -> Optional[str]:
+        return json.dumps(self._snapshot()) if self._snapshot is not None else None
+
+    async def publish(self):
+        """Write this worker's heartbeat and current metrics samples now."""
+        await self._call(self._db_heartbeat, self._metrics(), False)
+        self.stats["heartbeats"] += 1
+
+    async def get(self, key: str) -> Optional[Tuple[object, float]]:
+        """Return (value, updated_at) for key, or None if it was never set."""
+        return await self._call(self._db_get, key)
+
+    async def put(self, key: str, value: object):
+        await self._call(self._db_put, key, value)
+
+    async def try_lease(self, name: str, ttl: float) -> bool:
+        """Take (or renew) the named lease for ttl seconds unless another live worker holds it."""
+        won = await self._call(self._db_try_lease, name, ttl)
+        self.stats["leases_won" if won else "leases_lost"] += 1
+        return won
+
+    async def release(self, name: str):
+        await self._call(self._db_release, name)
+
+    def watch(self, name: str, callback: Callable[[], None]):
+        """Call callback() in this worker when another worker calls notify(name)."""
+        self._watches[name] = (callback, 0)
+
+    def notify(self, name: str):
+        """Tell the other workers that name changed; they see it on their next heartbeat."""
+        if not self.enabled or self._db is None:
+            return
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO kv (key, value, updated_at) VALUES (?, '1', ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1, updated_at = excluded.updated_at",
+                ("generation:" + name, time.time()),
+            )
+            generation = int(self._db.execute("SELECT value FROM kv WHERE key = ?", ("generation:" + name,)).fetchone()[0])
+            self._db.commit()
+        if name in self._watches:
+            self._watches[name] = (self._watches[name][0], generation)
+
+    async def workers(self) -> List[dict]:
+        """Workers of this server run, with whether each still sends heartbeats."""
+        return await self._call(self._db_workers)
+
+    async def worker_metrics(self) -> Tuple[List[dict], List[dict]]:
+        """Latest metrics snapshots of this run's live and retired workers; this one's is published first."""
+        await self.publish()
+        return await self._call(self._db_worker_metrics)
+
+    def get_stats(self) -> dict:
+        stats = dict(self.stats)
+        stats.update({"enabled": self.enabled, "worker_id": self.worker_id or None, "first_worker": self.first_worker})
+        return stats
+
+    def _db_join(self) -> bool:
+        now = time.time()
+        stale_before = now - self.heartbeat * _MISSED_HEARTBEATS
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                # Forget workers of earlier runs, and of this run if it was started without a run id and they went quiet
+                self._db.execute(
+                    "DELETE FROM workers WHERE run_id != ? OR (run_id = '' AND (stopped = 1 OR heartbeat_at < ?))",
+                    (RUN_ID, stale_before),
+                )
+                first = self._db.execute("SELECT COUNT(*) FROM workers").fetchone()[0] == 0
+                if first:
+                    self._db.execute("DELETE FROM leases")
+                self._db.execute(
+                    "INSERT INTO workers (id, run_id, pid, started_at, heartbeat_at) VALUES (?, ?, ?, ?, ?)",
+                    (self.worker_id, RUN_ID, os.getpid(), now, now),
+                )
+                self._db.commit()
+            except Exception:
+                self._db.rollback()
+                raise
+        return first
+
+    def _db_heartbeat(self, metrics: Optional[str], stopped: bool):
+        with self._lock:
+            self._db.execute(
+                "UPDATE workers SET heartbeat_at = ?, stopped = ?, metrics = COALESCE(?, metrics) WHERE id = ?",
+                (time.time(), int(stopped), metrics, self.worker_id),
+            )
+            self._db.commit()
+
+    def _db_get(self, key: str) -> Optional[Tuple[object, float]]:
+        with self._lock:
+            row = self._db.execute("SELECT value, updated_at FROM kv WHERE key = ?", (key,)).fetchone()
+        return (json.loads(row[0]), row[1]) if row else None
+
+    def _db_put(self, key: str, value: object):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO kv (key, value, updated_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), time.time()),
+            )
+            self._db.commit()
+
+    def _db_try_lease(self, name: str, ttl: float) -> bool:
+        now = time.time()
+        with self._lock:
+            cursor = self._db.execute(
+                "INSERT INTO leases (name, holder, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET holder = excluded.holder, expires_at = excluded.expires_at "
+                "WHERE leases.expires_at < ? OR leases.holder = excluded.holder",
+                (name, self.worker_id, now + ttl, now),
+            )
+            self._db.commit()
+        return cursor.rowcount == 1
+
+    def _db_release(self, name: str):
+        with self._lock:
+            self._db.execute("DELETE FROM leases WHERE name = ? AND holder = ?", (name, self.worker_id))
+            self._db.commit()
+
+    def _db_generation(self, name: str) -> int:
+        with self._lock:
+            row = self._db.execute("SELECT value FROM kv WHERE key = ?", ("generation:" + name,)).fetchone()
+        return int(row[0]) if row else 0
+
+    def _db_generations(self, names: List[str]) -> List[Tuple[str, int]]:
+        return [(name, self._db_generation(name)) for name in names]
+
+    def _db_workers(self) -> List[dict]:
+        alive_after = time.time() - self.heartbeat * _MISSED_HEARTBEATS
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, pid, started_at, heartbeat_at, stopped FROM workers WHERE run_id = ? ORDER BY started_at", (RUN_ID,)
+            ).fetchall()
+        return [
+            {
+                "id": worker_id,
+                "pid": pid,
+                "started_at": started_at,
+                "heartbeat_at": heartbeat_at,
+                "alive": not stopped and heartbeat_at >= alive_after,
+                "self": worker_id == self.worker_id,
+            }
+            for worker_id, pid, started_at, heartbeat_at, stopped in rows
+        ]
+
+    def _db_worker_metrics(self) -> Tuple[List[dict], List[dict]]:
+        alive_after = time.time() - self.heartbeat * _MISSED_HEARTBEATS
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT metrics, stopped, heartbeat_at FROM workers WHERE run_id = ? AND metrics IS NOT NULL", (RUN_ID,)
+            ).fetchall()
+        live, retired = [], []
+        for metrics, stopped, heartbeat_at in rows:
+            (retired if stopped or heartbeat_at < alive_after else live).append(json.loads(metrics))
+        return live, retired
+
+
+shared_state = SharedState()
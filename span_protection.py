@@ -0,0 +1,178 @@
+"""
+Protection of untranslatable spans, and bypass of texts with nothing to translate.
+
+Interpolation placeholders ({name}, {{name}}, ${name}, %s, %(name)s, %1$s), markup tags and
+entities, URLs, email addresses and `code` must come back from the model unchanged, yet they
+cost prompt tokens and models sometimes translate, respace or drop them. Before generation each
+such span is replaced by a short numbered sentinel ({0}, {1}, ...) that the prompt tells the
+model to keep, and the original spans are put back in the output. An output that lost one of
+its sentinels is rejected like any other failed generation, so a corrupted placeholder never
+reaches the client.
+
+A text with no letters outside protected spans (numbers, emoji, punctuation, URLs, only
+placeholders) or that is a single identifier-like token (snake_case, paths, file names, calls,
+longer words mixing letters and digits, camelCase with two humps) is returned as it is without a
+generation.
+"""
+
+import re
+from dataclasses import dataclass
+from typing import List, Optional
+
+from prompt_templates import prompt_template
+
+_PROTECTED = re.compile(
+    r"</[A-Za-z][\w:.-]*\s*>"  # markup tags: closing, and opening with name="value" attributes only
+    r"|<[A-Za-z][\w:.-]*(?:\s+[\w:.-]+\s*=\s*(?:\"[^\"]*\"|'[^']*'|[^\s\"'<>=`]+))*\s*/?>"
+    r"|&(?:[A-Za-z][A-Za-z0-9]*|#\d+|#x[0-9A-Fa-f]+);"  # entities
+    r"|`[^`\n]+`"  # inline code
+    r"|\b(?:https?|ftp)://[^\s<>\"']*[^\s<>\"'.,;:!?)\]]"  # URLs
+    r"|\bwww\.[^\s<>\"']*[^\s<>\"'.,;:!?)\]]"
+    r"|\b[\w.+-]+@[\w-]+(?:\.[\w-]+)+\b"  # email addresses
+    r"|\{\{[^{}]*\}\}|\$\{[^{}]*\}|\{[\w.$-]*\}"  # {{name}}, ${name}, {name}, {0}
+    r"|%(?:\(\w+\))?(?:\d+\$)?[-+#0]*\d*(?:\.\d+)?[sdifuxXeEgGcrb@](?!\w)"  # printf: %s, %(name)s, %1$s, %.2f
+)
+_SENTINEL = re.compile(r"\{(\d+)\}")
+# Marks a single token as code: snake_case, paths, namespaces, calls, letters mixed with digits in
+# tokens of six characters or more (so 4K, MP3 or 10am stay words), camelCase with at least two
+# humps (so brand names like iPhone or eBay stay words), file names
+_CODE_MARKERS = re.compile(r"_|^[.~]*/|\\|::|->|\(\)|^(?=.{6}).*(?:[A-Za-z]\d|\d[A-Za-z])|[a-z][A-Z][a-z]*[A-Z]|\w\.[A-Za-z0-9]{1,5}$")
+
+
+def _estimate_tokens(text: str) -> int:
+    from translator import estimate_tokens  # translator imports this module
+    return estimate_tokens(text)
+
+
+@dataclass
+class MaskedText:
+    """A text with its protected spans replaced by sentinels."""
+    text: str
+    spans: List[str]
+
+    def restore(self, output: str) -> Optional[str]:
+        """Put the protected spans back into a model output; None if a sentinel went missing."""
+        if not self.spans:
+            return output
+        seen = set()
+
+        def replace(match):
+            index = int(match.group(1))
+            if index >= len(self.spans):
+                return match.group(0)
+            seen.add(index)
+            return self.spans[index]
+
+        restored = _SENTINEL.sub(replace, output)
+        return restored if len(seen) == len(self.spans) else None
+
+
+def mask(text: str) -> MaskedText:
+    """Replace each protected span with {0}, {1}, ... in order of appearance."""
+    spans: List[str] = []
+
+    def replace(match):
+        spans.append(match.group(0))
+        return "{%d}" % (len(spans) - 1)
+
+    return MaskedText(_PROTECTED.sub(replace, text), spans)
+
+
+def is_translatable(text: str) -> bool:
+    """True if text has letters outside protected spans and is not a lone identifier-like token."""
+    rest = _PROTECTED.sub(" ", text).strip()
+    if not any(c.isalpha() for c in rest):
+        return False
+    return any(c.isspace() for c in rest) or not _CODE_MARKERS.search(rest)
+
+
+class StreamRestorer:
+    """
+    Incremental MaskedText.restore() for streamed output. A sentinel split across chunks is held
+    back until it is complete; text already sent cannot be rejected, so a missing sentinel is
+    only counted.
+    """
+
+    def __init__(self, masked: MaskedText, protector: "SpanProtector"):
+        self._masked = masked
+        self._protector = protector
+        self._held = ""
+        self._seen = set()
+
+    def feed(self, chunk: str) -> str:
+        text = self._held + chunk
+        cut = text.rfind("{")
+        if cut != -1 and "}" not in text[cut:] and len(text) - cut <= 8:
+            text, self._held = text[:cut], text[cut:]
+        else:
+            self._held = ""
+        return self._restore(text)
+
+    def finish(self) -> str:
+        tail, self._held = self._held, ""
+        tail = self._restore(tail)
+        if len(self._seen) < len(self._masked.spans):
+            self._protector.stats["restore_failures"] += 1
+        return tail
+
+    def _restore(self, text: str) -> str:
+        spans = self._masked.spans
+
+        def replace(match):
+            index = int(match.group(1))
+            if index >= len(spans):
+                return match.group(0)
+            self._seen.add(index)
+            return spans[index]
+
+        return _SENTINEL.sub(replace, text)
+
+
+class SpanProtector:
+    """Masks protected spans and bypasses untranslatable texts, counting what it saved."""
+
+    def __init__(self):
+        self.stats = {
+            "checked": 0,              # texts checked for translatable content
+            "bypassed": 0,             # texts returned as they are without a generation
+            "masked": 0,               # texts sent to the model with at least one protected span
+            "spans": 0,                # protected spans replaced by sentinels
+            "restore_failures": 0,     # outputs rejected because a sentinel went missing
+            "bypass_tokens_saved": 0,  # estimated prompt tokens of the generations bypassed
+            "mask_tokens_saved": 0,    # estimated prompt tokens saved by sentinels (can be negative)
+        }
+
+    def bypass(self, text: str, source_lang: str, target_lang: str) -> bool:
+        """Return True (and count it) if text should be returned as it is instead of translated."""
+        self.stats["checked"] += 1
+        if is_translatable(text):
+            return False
+        self.stats["bypassed"] += 1
+        self.stats["bypass_tokens_saved"] += _estimate_tokens(prompt_template.single(text, source_lang, target_lang).text)
+        return True
+
+    def mask(self, text: str) -> MaskedText:
+        masked = mask(text)
+        if masked.spans:
+            self.stats["masked"] += 1
+            self.stats["spans"] += len(masked.spans)
+            self.stats["mask_tokens_saved"] += _estimate_tokens(text) - _estimate_tokens(masked.text)
+        return masked
+
+    def restore(self, masked: MaskedText, output: str) -> Optional[str]:
+        restored = masked.restore(output)
+        if restored is None:
+            self.stats["restore_failures"] += 1
+        return restored
+
+    def stream_restorer(self, masked: MaskedText) -> StreamRestorer:
+        return StreamRestorer(masked, self)
+
+    def get_stats(self) -> dict:
+        stats = dict(self.stats)
+        stats["bypass_rate"] = round(stats["bypassed"] / stats["checked"], 4) if stats["checked"] else 0.0
+        stats["prompt_tokens_saved"] = stats["bypass_tokens_saved"] + stats["mask_tokens_saved"]
+        return stats
+
+
+span_protector = SpanProtector()
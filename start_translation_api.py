@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 """
-Simple script to start the Ollama Translation API
+Simple script to start the Ollama Translation API: installs missing packages, checks that
+Ollama has the configured model, then runs server.py (set API_WORKERS for several workers).
 """
 
 import subprocess
@@ -32,20 +33,21 @@ def install_requirements():
     return True
 
 def check_ollama():
-    """Check if Ollama is running and Mistral is available"""
+    """Check if Ollama is running and the configured model is available"""
     print("Checking Ollama setup...")
     
     try:
         import requests
-        response = requests.get("http://localhost:11434/api/tags", timeout=5)
+        from config import OLLAMA_BASE_URL, OLLAMA_MODEL
+        response = requests.get(f"{OLLAMA_BASE_URL}/api/tags", timeout=5)
         if response.status_code == 200:
             models = response.json().get("models", [])
             model_names = [model.get("name", "") for model in models]
-            if "mistral" in str(model_names).lower():
-                print("Ollama is running and Mistral model is available")
+            if OLLAMA_MODEL.split(":")[0].lower() in str(model_names).lower():
+                print(f"Ollama is running and {OLLAMA_MODEL} is available")
                 return True
             else:
-                print("Mistral model not found")
+                print(f"{OLLAMA_MODEL} model not found")
                 return False
         else:
             print("Ollama API not responding")
@@ -60,15 +62,14 @@ def start_api():
     
     try:
         # Import and run the API
-        from main_ollama import app
-        import uvicorn
+        from config import API_PORT
+        from server import serve
         
-        print("Translation API started successfully!")
-        print("API will be available at: http://localhost:8000")
-        print("API docs at: http://localhost:8000/docs")
+        print(f"API will be available at: http://localhost:{API_PORT}")
+        print(f"API docs at: http://localhost:{API_PORT}/docs")
         print("Press Ctrl+C to stop")
         
-        uvicorn.run(app, host="0.0.0.0", port=8000)
+        serve([])
         
     except ImportError as e:
         print(f"Import error: {e}")
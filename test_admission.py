@@ -0,0 +1,126 @@
+"""
+Tests for the admission controller's queue: priorities, shedding and slot handover.
+"""
+
+import asyncio
+
+import pytest
+
+from admission import AdmissionController, AdmissionRejected
+
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_waiters_are_served_by_priority():
+    async def run():
+        controller = AdmissionController(max_concurrency=1, max_queue=10, bulk_queue_share=1.0, max_wait=5)
+        holder = await controller.acquire("interactive")
+        served = []
+
+        async def wait(name):
+            ticket = await controller.acquire(name)
+            served.append(name)
+            await _settle()
+            ticket.release()
+
+        tasks = []
+        for name in ("background", "bulk", "interactive", "bulk"):
+            tasks.append(asyncio.ensure_future(wait(name)))
+            await _settle()
+        holder.release()
+        await asyncio.gather(*tasks)
+        return served, controller.get_stats()
+
+    served, stats = asyncio.run(run())
+    assert served == ["interactive", "bulk", "bulk", "background"]
+    assert stats["active"] == 0 and stats["queue_depth"] == 0
+
+
+def test_bulk_is_rejected_beyond_its_queue_share():
+    async def run():
+        controller = AdmissionController(max_concurrency=1, max_queue=4, bulk_queue_share=0.5, max_wait=5)
+        holder = await controller.acquire("interactive")
+        waiters = [asyncio.ensure_future(controller.acquire("interactive")) for _ in range(2)]
+        await _settle()
+        with pytest.raises(AdmissionRejected) as rejected:
+            await controller.acquire("bulk")
+        assert rejected.value.status_code == 429
+        # Interactive work may still use the rest of the queue
+        waiters.append(asyncio.ensure_future(controller.acquire("interactive")))
+        await _settle()
+        assert controller.queue_depth() == 3
+        holder.release()
+        for waiter in waiters:
+            (await waiter).release()
+        return controller.stats
+
+    stats = asyncio.run(run())
+    assert stats["rejected_queue_full"] == 1
+    assert stats["admitted"] == 4
+
+
+async def _wait_for(awaitable, timeout):
+    # asyncio.wait_for() as of Python 3.12: a cancellation wins even if the awaited future is done
+    async with asyncio.timeout(timeout):
+        return await awaitable
+
+
+def test_slot_handed_to_a_cancelled_waiter_is_passed_on(monkeypatch):
+    monkeypatch.setattr(asyncio, "wait_for", _wait_for)
+
+    async def run():
+        controller = AdmissionController(max_concurrency=1, max_queue=10, max_wait=5)
+        holder = await controller.acquire("interactive")
+        first = asyncio.ensure_future(controller.acquire("interactive"))
+        second = asyncio.ensure_future(controller.acquire("interactive"))
+        await _settle()
+        # The slot is handed to the first waiter, which is cancelled before it resumes
+        holder.release()
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        ticket = await asyncio.wait_for(second, timeout=1)
+        assert controller._active == 1
+        ticket.release()
+        return controller.get_stats()
+
+    stats = asyncio.run(run())
+    assert stats["active"] == 0 and stats["queue_depth"] == 0
+
+
+def test_retry_after_estimates_the_backlog_drain_time():
+    async def run():
+        controller = AdmissionController(max_concurrency=2, max_queue=3, max_wait=5)
+        controller._service_time = 4.0  # two slots at 4 s each: one generation every 2 s
+        holders = [await controller.acquire("interactive") for _ in range(2)]
+        waiters = [asyncio.ensure_future(controller.acquire("interactive")) for _ in range(3)]
+        await _settle()
+        with pytest.raises(AdmissionRejected) as rejected:
+            await controller.acquire("interactive")
+        for holder in holders:
+            holder.release()
+        for waiter in waiters:
+            (await waiter).release()
+        return rejected.value
+
+    rejected = asyncio.run(run())
+    # Three queued plus this one, at 0.5 generations per second
+    assert rejected.retry_after == 8
+    assert rejected.headers["Retry-After"] == "8"
+
+
+def test_wait_timeout_is_rejected_with_503():
+    async def run():
+        controller = AdmissionController(max_concurrency=1, max_queue=10, max_wait=0.05)
+        holder = await controller.acquire("interactive")
+        with pytest.raises(AdmissionRejected) as rejected:
+            await controller.acquire("bulk")
+        holder.release()
+        return rejected.value, controller.get_stats()
+
+    rejected, stats = asyncio.run(run())
+    assert rejected.status_code == 503
+    assert stats["queue_depth"] == 0 and stats["active"] == 0
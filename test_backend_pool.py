@@ -0,0 +1,85 @@
+"""
+Tests for the backend pool's circuit breakers, against two Ollama stub backends.
+"""
+
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from backend_pool import Backend, BackendPool, CLOSED, HALF_OPEN, OPEN
+from benchmark.ollama_stub import StubSettings, create_app
+from config import BACKEND_OPEN_SECONDS
+from ollama_client import OllamaError
+
+MODEL = "mistral:latest"
+
+
+def _stub_backend(url: str, error_rate: float) -> Backend:
+    """A backend whose requests are answered in-process by the Ollama stub."""
+    backend = Backend(url)
+    app = create_app(StubSettings(models=[MODEL], prompt_latency=0.0, tokens_per_second=0.0, error_rate=error_rate))
+    backend.client._client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url=url)
+    return backend
+
+
+def _eject(backend: Backend):
+    """Open the breaker with its cool-down already over, so the next check makes it half-open."""
+    backend.state = OPEN
+    backend.opened_at = time.monotonic() - BACKEND_OPEN_SECONDS - 1
+
+
+def _payload() -> dict:
+    return {"model": MODEL, "prompt": 'Text to translate: "hello"', "stream": False}
+
+
+async def _run(test):
+    broken = _stub_backend("http://broken", error_rate=1.0)  # /api/tags works, every generation fails
+    healthy = _stub_backend("http://healthy", error_rate=0.0)
+    pool = BackendPool([broken, healthy])
+    try:
+        await test(pool, broken, healthy)
+    finally:
+        await pool.aclose()
+
+
+def test_probe_does_not_close_a_half_open_breaker():
+    async def test(pool, broken, healthy):
+        _eject(broken)
+        for _ in range(3):
+            results = await pool.probe(MODEL)
+            assert broken.state == HALF_OPEN
+        assert all(r["available"] for r in results)
+        assert broken.available_models is not None
+
+    asyncio.run(_run(test))
+
+
+def test_failed_trial_request_reopens_the_breaker():
+    async def test(pool, broken, healthy):
+        _eject(broken)
+        await pool.probe(MODEL)
+        # The half-open backend takes the trial request (it sorts first), which fails
+        with pytest.raises(OllamaError):
+            await pool.generate(_payload())
+        assert broken.state == OPEN
+        assert not broken.trial_in_flight
+        # Traffic goes to the healthy backend until the cool-down is over again
+        result = await pool.generate(_payload())
+        assert result["response"]
+        assert healthy.state == CLOSED and healthy.requests == 1
+
+    asyncio.run(_run(test))
+
+
+def test_successful_trial_request_closes_the_breaker():
+    async def test(pool, broken, healthy):
+        broken.state, broken.opened_at = OPEN, time.monotonic()  # Still cooling down
+        _eject(healthy)
+        await pool.probe(MODEL)
+        assert healthy.state == HALF_OPEN
+        await pool.generate(_payload(), timeout=5)
+        assert healthy.state == CLOSED
+
+    asyncio.run(_run(test))
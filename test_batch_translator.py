@@ -0,0 +1,49 @@
+"""
+Tests for packing batch items into prompts and aligning the model's JSON output back to them.
+"""
+
+import pytest
+
+from batch_translator import pack_chunks, parse_batch_response
+
+TEN_TOKENS = "x" * 40  # estimate_tokens: 4 ASCII characters per token
+FIFTY_TOKENS = "x" * 200
+
+
+def _items(*texts):
+    return list(enumerate(texts))
+
+
+@pytest.mark.parametrize("texts, budget, max_items, expected", [
+    ((), 100, 10, []),
+    ((TEN_TOKENS,) * 3, 100, 10, [[0, 1, 2]]),
+    ((TEN_TOKENS,) * 3, 20, 10, [[0, 1], [2]]),
+    ((TEN_TOKENS,) * 5, 100, 2, [[0, 1], [2, 3], [4]]),
+    # An item over the budget still gets a chunk of its own
+    ((TEN_TOKENS, FIFTY_TOKENS, TEN_TOKENS), 30, 10, [[0], [1], [2]]),
+    ((FIFTY_TOKENS,), 30, 10, [[0]]),
+], ids=["empty", "fits", "budget", "max-items", "oversized-middle", "oversized-only"])
+def test_pack_chunks(texts, budget, max_items, expected):
+    chunks = pack_chunks(_items(*texts), token_budget=budget, max_items=max_items)
+    assert [[index for index, _ in chunk] for chunk in chunks] == expected
+    # Packing keeps every item, in order, with its text
+    assert [item for chunk in chunks for item in chunk] == _items(*texts)
+
+
+@pytest.mark.parametrize("response, keys, expected", [
+    ('{"0": "hola", "1": "adiós"}', ["0", "1"], {"0": "hola", "1": "adiós"}),
+    ('{"translations": {"0": "hola", "1": "adiós"}}', ["0", "1"], {"0": "hola", "1": "adiós"}),
+    ('{"0": "  \\"hola\\" "}', ["0"], {"0": "hola"}),
+    # Missing ids are left out, to be retried on their own
+    ('{"0": "hola"}', ["0", "1"], {"0": "hola"}),
+    # Extra items the model invented are ignored
+    ('{"0": "hola", "1": "adiós", "7": "extra", "note": "done"}', ["0", "1"], {"0": "hola", "1": "adiós"}),
+    # Empty and non-string values cannot be aligned
+    ('{"0": "", "1": ["adiós"], "2": 3}', ["0", "1", "2"], {}),
+    ("hola, adiós", ["0", "1"], {}),
+    ('{"0": "hola"', ["0"], {}),
+    ('["hola", "adiós"]', ["0", "1"], {}),
+    ("", ["0"], {}),
+], ids=["plain", "wrapped", "quoted", "missing-id", "extra-items", "bad-values", "not-json", "truncated", "list", "empty"])
+def test_parse_batch_response(response, keys, expected):
+    assert parse_batch_response(response, keys) == expected
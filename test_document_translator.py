@@ -0,0 +1,109 @@
+"""
+Tests for document chunking and the bounded, in-order document translation pipeline.
+"""
+
+import asyncio
+
+import pytest
+
+import document_translator
+from document_translator import iter_chunks, translate_document
+
+DOCUMENTS = [
+    "",
+    "   \n\n  ",
+    "One sentence.",
+    "  Leading and trailing whitespace.  \n",
+    "First sentence. Second one! Third?\n\nA new paragraph.\n \n\n\tIndented paragraph; with a clause.\n\n",
+    "Line one\nline two\r\nline three",
+    "これは文です。次の文です！最後？\n\n段落。",
+    "यह एक वाक्य है। दूसरा वाक्य॥ هل هذا سؤال؟ نعم۔",
+    "word " * 300 + "and an end.",
+    "x" * 500,
+]
+
+
+@pytest.mark.parametrize("budget", [1, 8, 64, 1200])
+@pytest.mark.parametrize("context_sentences", [0, 2])
+@pytest.mark.parametrize("text", DOCUMENTS)
+def test_joining_chunks_rebuilds_the_input(text, budget, context_sentences):
+    chunks = list(iter_chunks(text, token_budget=budget, context_sentences=context_sentences))
+    assert "".join(chunk.prefix + chunk.text + chunk.suffix for chunk in chunks) == text
+    assert [chunk.index for chunk in chunks] == list(range(len(chunks)))
+    for chunk in chunks:
+        assert chunk.text == chunk.text.strip()
+        assert "\n\n" not in chunk.text  # Chunks never span a paragraph break
+
+
+def _document(paragraphs: int) -> str:
+    return "\n\n".join(f"Paragraph {n} says hello." for n in range(paragraphs)) + "\n"
+
+
+def test_output_stays_in_order_under_the_window(monkeypatch):
+    text = _document(40)
+    concurrency = 4
+    running = 0
+    peak = 0
+
+    async def translate_text(chunk_text, source_lang, target_lang, context=None):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        # Later chunks in each window finish first, so results arrive out of order
+        number = int(chunk_text.split()[1])
+        await asyncio.sleep(0.001 * (concurrency - number % concurrency))
+        running -= 1
+        return chunk_text.upper()
+
+    monkeypatch.setattr(document_translator, "translate_text", translate_text)
+    result = asyncio.run(translate_document(text, "English", "Spanish", token_budget=8, concurrency=concurrency))
+    assert result.translated_text == text.upper()
+    assert [timing.index for timing in result.chunks] == list(range(40))
+    assert result.failed_chunks == 0
+    assert peak <= concurrency
+
+
+def test_window_counts_chunks_waiting_to_be_emitted(monkeypatch):
+    text = _document(12)
+    concurrency = 3
+    started = []
+    release_first = None
+
+    async def translate_text(chunk_text, source_lang, target_lang, context=None):
+        number = int(chunk_text.split()[1])
+        started.append(number)
+        if number == 0:
+            await release_first.wait()
+        return chunk_text
+
+    async def run():
+        nonlocal release_first
+        release_first = asyncio.Event()
+        task = asyncio.ensure_future(translate_document(text, "English", "Spanish", token_budget=8, concurrency=concurrency))
+        for _ in range(20):
+            await asyncio.sleep(0)
+        # Chunk 0 is stuck, so chunks 1 and 2 finish but cannot be emitted; nothing else may start
+        waiting = list(started)
+        release_first.set()
+        return waiting, await task
+
+    monkeypatch.setattr(document_translator, "translate_text", translate_text)
+    waiting, result = asyncio.run(run())
+    assert waiting == [0, 1, 2]
+    assert result.translated_text == text
+
+
+def test_failed_chunks_keep_the_source_text(monkeypatch):
+    text = _document(6)
+
+    async def translate_text(chunk_text, source_lang, target_lang, context=None):
+        return None if int(chunk_text.split()[1]) % 2 else chunk_text.upper()
+
+    monkeypatch.setattr(document_translator, "translate_text", translate_text)
+    result = asyncio.run(translate_document(text, "English", "Spanish", token_budget=8, concurrency=2))
+    expected = "\n\n".join(
+        (line if n % 2 else line.upper()) for n, line in enumerate(f"Paragraph {n} says hello." for n in range(6))
+    ) + "\n"
+    assert result.translated_text == expected
+    assert result.failed_chunks == 3
+    assert [timing.translated for timing in result.chunks] == [True, False] * 3
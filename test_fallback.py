@@ -0,0 +1,35 @@
+"""
+Tests for the phrase-table fallback served while Ollama is unavailable.
+"""
+
+import asyncio
+
+from fastapi.testclient import TestClient
+
+import main
+from phrase_table import phrase_table
+
+# Without startup the health monitor has not probed, so Ollama counts as unavailable
+client = TestClient(main.app)
+asyncio.run(phrase_table.reload(force=True))
+
+
+def _translate(text: str):
+    return client.post("/translate", json={"text": text, "source_language": "English", "target_language": "Spanish"})
+
+
+def test_fully_covered_text_is_served_from_the_table():
+    response = _translate("Hello!")
+    assert response.status_code == 200
+    assert response.json()["translated_text"] == "hola"
+    assert response.json()["fallback_used"]
+
+
+def test_partial_match_is_not_served_as_the_translation():
+    assert _translate("hello, where is my refund?").status_code == 503
+
+
+def test_partial_match_is_exposed_separately():
+    response = main.create_fallback_response("hello, where is my refund?", "English", "Spanish")
+    assert response["translated_text"] == "hello, where is my refund?"
+    assert response["partial_translation"] == "hola"
@@ -0,0 +1,45 @@
+"""
+Tests for the model warm-up as seen by the "models" readiness subsystem, against an Ollama stub.
+"""
+
+import asyncio
+
+import httpx
+
+import backend_pool
+from backend_pool import Backend, BackendPool
+from benchmark.ollama_stub import StubSettings, create_app
+from model_router import ModelRouter
+from readiness import FAILED, READY, Readiness
+
+MODEL = "mistral:latest"
+
+
+def _pool(error_rate: float) -> BackendPool:
+    backend = Backend("http://stub")
+    app = create_app(StubSettings(models=[MODEL], prompt_latency=0.0, tokens_per_second=0.0, error_rate=error_rate))
+    backend.client._client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url=backend.url)
+    return BackendPool([backend])
+
+
+async def _warm_up(monkeypatch, error_rate: float) -> str:
+    pool = _pool(error_rate)
+    monkeypatch.setattr(backend_pool, "_pool", pool)
+    router = ModelRouter(default_model=MODEL, small_model="", warmup=True)
+    readiness = Readiness(required="models")
+    try:
+        await router.start()
+        readiness.warm("models", router.warm_up_task())
+        await readiness.wait()
+        await router.stop()
+        return readiness.subsystems["models"].state
+    finally:
+        await pool.aclose()
+
+
+def test_models_ready_once_loaded(monkeypatch):
+    assert asyncio.run(_warm_up(monkeypatch, error_rate=0.0)) == READY
+
+
+def test_models_failed_when_no_backend_loaded_them(monkeypatch):
+    assert asyncio.run(_warm_up(monkeypatch, error_rate=1.0)) == FAILED
@@ -0,0 +1,32 @@
+"""
+Tests for multi-target translation: nothing-to-translate bypass and per-target generation metrics.
+"""
+
+from fastapi.testclient import TestClient
+
+import main
+from metrics import OLLAMA_EVAL_TOKENS, OLLAMA_TOKENS_PER_SECOND, record_multi_generation
+from prompt_templates import prompt_template
+from span_protection import _estimate_tokens, span_protector
+
+client = TestClient(main.app)
+
+
+def test_bypass_is_checked_for_each_real_target():
+    text = "https://example.com/a_b"
+    before = dict(span_protector.stats)
+    response = client.post("/translate/multi", json={"text": text, "source_language": "English", "target_languages": ["Spanish", "French"]})
+    assert response.status_code == 200
+    assert [t["translated_text"] for t in response.json()["translations"]] == [text, text]
+    assert span_protector.stats["bypassed"] - before["bypassed"] == 2
+    saved = sum(_estimate_tokens(prompt_template.single(text, "English", target).text) for target in ("Spanish", "French"))
+    assert span_protector.stats["bypass_tokens_saved"] - before["bypass_tokens_saved"] == saved
+
+
+def test_combined_generation_is_recorded_per_target():
+    result = {"model": "multi-test", "eval_count": 30, "eval_duration": 1_000_000_000, "prompt_eval_count": 12}
+    record_multi_generation(result, "English", {"Spanish": 20, "French": 10})
+    assert OLLAMA_EVAL_TOKENS.labels("multi-test", "English", "Spanish").value == 20
+    assert OLLAMA_EVAL_TOKENS.labels("multi-test", "English", "French").value == 10
+    assert OLLAMA_TOKENS_PER_SECOND.labels("multi-test", "English", "French").count == 1
+    assert ("multi-test", "English", "multiple") not in OLLAMA_EVAL_TOKENS._children
@@ -64,7 +64,7 @@ def test_translation():
             "stream": False,
             "options": {
                 "temperature": 0.1,
-                "max_tokens": 50
+                "num_predict": 50
             }
         }
         
@@ -0,0 +1,103 @@
+"""
+Tests for single-flight coalescing of identical in-flight work.
+"""
+
+import asyncio
+
+import pytest
+
+from request_coalescer import SingleFlight
+
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_concurrent_callers_share_one_generation():
+    async def run():
+        flights = SingleFlight()
+        started = []
+        release = asyncio.Event()
+
+        async def generate():
+            started.append(1)
+            await release.wait()
+            return "hola"
+
+        callers = [asyncio.ensure_future(flights.do("key", generate)) for _ in range(5)]
+        await _settle()
+        assert flights.in_flight() == 1
+        release.set()
+        return await asyncio.gather(*callers), started, flights.get_stats()
+
+    results, started, stats = asyncio.run(run())
+    assert results == ["hola"] * 5
+    assert len(started) == 1
+    assert stats == {"leaders": 1, "coalesced": 4, "abandoned": 0, "in_flight": 0}
+
+
+def test_errors_reach_every_waiter():
+    async def run():
+        flights = SingleFlight()
+        release = asyncio.Event()
+
+        async def generate():
+            await release.wait()
+            raise RuntimeError("backend down")
+
+        callers = [asyncio.ensure_future(flights.do("key", generate)) for _ in range(3)]
+        await _settle()
+        release.set()
+        return await asyncio.gather(*callers, return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+def test_cancelling_the_last_waiter_aborts_the_shared_task():
+    async def run():
+        flights = SingleFlight()
+        cancelled = asyncio.Event()
+
+        async def generate():
+            try:
+                await asyncio.sleep(60)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        callers = [asyncio.ensure_future(flights.do("key", generate)) for _ in range(3)]
+        await _settle()
+        for caller in callers[:2]:
+            caller.cancel()
+        await _settle()
+        # Someone is still waiting, so the generation keeps running
+        assert not cancelled.is_set()
+        callers[2].cancel()
+        await asyncio.wait_for(cancelled.wait(), timeout=1)
+        for caller in callers:
+            with pytest.raises(asyncio.CancelledError):
+                await caller
+        await _settle()
+        return flights.get_stats()
+
+    stats = asyncio.run(run())
+    assert stats["abandoned"] == 1
+    assert stats["in_flight"] == 0
+
+
+def test_a_new_call_after_completion_starts_fresh_work():
+    async def run():
+        flights = SingleFlight()
+        calls = []
+
+        async def generate():
+            calls.append(1)
+            return len(calls)
+
+        first = await flights.do("key", generate)
+        second = await flights.do("key", generate)
+        return first, second
+
+    assert asyncio.run(run()) == (1, 2)
@@ -0,0 +1,95 @@
+"""
+Tests for RequestLifecycleMiddleware, driven with raw ASGI messages.
+"""
+
+import asyncio
+
+from request_lifecycle import RequestLifecycleMiddleware, cancellations
+
+
+def _scope(timeout: str = None) -> dict:
+    headers = [(b"x-request-timeout", timeout.encode())] if timeout else []
+    return {"type": "http", "method": "POST", "path": "/translate/stream", "headers": headers}
+
+
+def _streaming_app(content_type: bytes):
+    """An app that sends the start of a response and then never finishes it."""
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", content_type)]})
+        await send({"type": "http.response.body", "body": b"event: token\ndata: {}\n\n", "more_body": True})
+        await asyncio.sleep(60)
+    return app
+
+
+async def _run(app, scope, receive):
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    await asyncio.wait_for(RequestLifecycleMiddleware(app)(scope, receive, send), timeout=5)
+    return sent
+
+
+async def _idle_receive():
+    await asyncio.sleep(60)
+
+
+def test_deadline_after_stream_started_sends_error_event_and_ends_body():
+    sent = asyncio.run(_run(_streaming_app(b"text/event-stream"), _scope("0.05"), _idle_receive))
+    last = sent[-1]
+    assert last["type"] == "http.response.body" and not last.get("more_body", False)
+    assert last["body"].startswith(b"event: error\n")
+
+
+def test_deadline_after_ndjson_stream_started_sends_error_line():
+    sent = asyncio.run(_run(_streaming_app(b"application/x-ndjson"), _scope("0.05"), _idle_receive))
+    assert sent[-1]["body"].startswith(b'{"event": "error"')
+    assert not sent[-1].get("more_body", False)
+
+
+def test_deadline_after_plain_response_started_closes_body():
+    sent = asyncio.run(_run(_streaming_app(b"application/json"), _scope("0.05"), _idle_receive))
+    assert sent[-1] == {"type": "http.response.body", "body": b"", "more_body": False}
+
+
+def test_deadline_before_response_answers_504():
+    async def app(scope, receive, send):
+        await asyncio.sleep(60)
+
+    sent = asyncio.run(_run(app, _scope("0.05"), _idle_receive))
+    assert sent[0]["status"] == 504
+
+
+def test_failing_receive_is_not_a_disconnect():
+    async def app(scope, receive, send):
+        await asyncio.sleep(0.05)
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    async def broken_receive():
+        raise RuntimeError("receive failed")
+
+    before = cancellations.stats["client_disconnects"]
+    sent = asyncio.run(_run(app, _scope(), broken_receive))
+    assert cancellations.stats["client_disconnects"] == before
+    assert sent[-1]["body"] == b"ok"
+
+
+def test_disconnect_cancels_the_request():
+    cancelled = []
+
+    async def app(scope, receive, send):
+        try:
+            await asyncio.sleep(60)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def disconnect():
+        await asyncio.sleep(0.05)
+        return {"type": "http.disconnect"}
+
+    before = cancellations.stats["client_disconnects"]
+    asyncio.run(_run(app, _scope(), disconnect))
+    assert cancelled and cancellations.stats["client_disconnects"] == before + 1
@@ -0,0 +1,111 @@
+"""
+Round-trip tests for resource parsing: rendering every string as its own translation must give
+back the input byte for byte, with only the translatable strings exposed.
+"""
+
+import pytest
+
+from resource_translator import parse_resource
+
+JSON_DOC = """{
+  "title": "Welcome back, {name}!",
+  "count": 3,
+  "enabled": true,
+  "menu": {"save": "Save changes", "quote": "Say \\"hi\\"\\n", "id": "user_id"},
+  "items": ["First item", "42", "https://example.com/help", "Ünïcode text"]
+}
+"""
+
+PO_DOC = '''# Translation template
+msgid ""
+msgstr ""
+"Content-Type: text/plain; charset=UTF-8\\n"
+
+#: app.py:10
+msgid "Hello, %(name)s!"
+msgstr ""
+
+msgctxt "button"
+msgid "Save"
+msgstr "Guardar"
+
+msgid "One file"
+msgid_plural "%d files"
+msgstr[0] ""
+msgstr[1] ""
+
+msgid ""
+"A long line that "
+"was wrapped"
+msgstr ""
+'''
+
+HTML_DOC = """<!DOCTYPE html>
+<html><head><title>Shop &amp; Save</title><style>p { color: red; }</style></head>
+<body>
+  <h1>Welcome back, {name}!</h1>
+  <p>Click <a href="/cart">here</a> to <b>save</b> your order.</p>
+  <img src="logo.png" alt="Company logo">
+  <p translate="no">Brand Name</p>
+  <p>Run <code>make install</code> first.</p>
+  <input placeholder='Search products'>
+  <!-- a comment -->
+</body></html>
+"""
+
+
+def _identity(resource):
+    return resource.render({text: text for text in resource.strings})
+
+
+@pytest.mark.parametrize("content, resource_format, strings", [
+    (JSON_DOC, "json", ["Welcome back, {name}!", "Save changes", 'Say "hi"\n', "First item", "Ünïcode text"]),
+    (HTML_DOC, "html", [
+        "Shop & Save",
+        "Welcome back, {name}!",
+        "Click {0}here{1} to {2}save{3} your order.",
+        "Company logo",
+        "Run {0} first.",
+        "Search products",
+    ]),
+])
+def test_identity_round_trip(content, resource_format, strings):
+    resource = parse_resource(content, resource_format)
+    assert resource.strings == strings
+    assert _identity(resource) == content
+    assert resource.render({}) == content
+
+
+def test_po_identity_round_trip():
+    resource = parse_resource(PO_DOC, "po")
+    # The header and entries that already have a translation are left alone
+    assert resource.strings == ["Hello, %(name)s!", "One file", "%d files", "A long line that was wrapped"]
+    assert resource.render({}) == PO_DOC
+    expected = (
+        PO_DOC
+        .replace('msgid "Hello, %(name)s!"\nmsgstr ""', 'msgid "Hello, %(name)s!"\nmsgstr "Hello, %(name)s!"')
+        .replace('msgstr[0] ""\nmsgstr[1] ""', 'msgstr[0] "One file"\nmsgstr[1] "%d files"')
+        .replace('"was wrapped"\nmsgstr ""', '"was wrapped"\nmsgstr "A long line that was wrapped"')
+    )
+    assert _identity(resource) == expected
+    # A filled-in file parses as fully translated
+    assert parse_resource(expected, "po").strings == []
+
+
+def test_html_inline_tags_follow_their_sentinels():
+    resource = parse_resource("<p>Click <a href=\"/cart\">here</a> to <b>save</b>.</p>", "html")
+    assert resource.strings == ["Click {0}here{1} to {2}save{3}."]
+    translated = resource.render({"Click {0}here{1} to {2}save{3}.": "{2}Guarde{3} {0}aquí{1} & salga."})
+    assert translated == '<p><b>Guarde</b> <a href="/cart">aquí</a> &amp; salga.</p>'
+
+
+def test_html_translation_that_lost_a_sentinel_keeps_the_source():
+    content = "<p>Click <a href=\"/cart\">here</a> now.</p>"
+    resource = parse_resource(content, "html")
+    assert resource.render({"Click {0}here{1} now.": "Haga clic {0}aquí ahora."}) == content
+
+
+def test_html_sentinels_are_numbered_after_existing_placeholders():
+    resource = parse_resource("<p>Hi {0}, see <b>this</b></p>", "html")
+    assert resource.strings == ["Hi {0}, see {1}this{2}"]
+    assert _identity(resource) == "<p>Hi {0}, see <b>this</b></p>"
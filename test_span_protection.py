@@ -0,0 +1,41 @@
+"""
+Tests for protected-span masking and the nothing-to-translate check.
+"""
+
+import pytest
+
+from span_protection import is_translatable, mask
+
+
+@pytest.mark.parametrize("text, spans", [
+    ("Click <b>here</b> now", ["<b>", "</b>"]),
+    ('See <a href="/help" target=_blank>help</a>', ['<a href="/help" target=_blank>', "</a>"]),
+    ("Line<br/>break", ["<br/>"]),
+    ("Hello %s, you have %d new messages", ["%s", "%d"]),
+    ("Paid %(amount).2f of %1$s", ["%(amount).2f", "%1$s"]),
+    ("Hello {name}, see https://example.com/a.", ["{name}", "https://example.com/a"]),
+])
+def test_masks_protected_spans(text, spans):
+    masked = mask(text)
+    assert masked.spans == spans
+    assert masked.restore(masked.text) == text
+
+
+@pytest.mark.parametrize("text", [
+    "x<y and z>w",
+    "if a<b then c>d",
+    "Get 100%discount today",
+    "50%sale on everything",
+])
+def test_leaves_lookalikes_unmasked(text):
+    assert mask(text).spans == []
+
+
+@pytest.mark.parametrize("text", ["4K", "MP3", "10am", "3D", "2FA", "x<y and z>w", "Hello", "Save 100%discount"])
+def test_translatable(text):
+    assert is_translatable(text)
+
+
+@pytest.mark.parametrize("text", ["user_id", "config.yaml", "/usr/bin", "fooBar()", "sha256sum", "42", "<b>{0}</b>", "%s"])
+def test_nothing_to_translate(text):
+    assert not is_translatable(text)
@@ -0,0 +1,30 @@
+"""
+Tests for the two-tier translation cache's purge and stats, against a temporary SQLite tier.
+"""
+
+import asyncio
+
+from translation_cache import TranslationCache
+
+
+def _cache(tmp_path) -> TranslationCache:
+    return TranslationCache(max_entries=100, ttl=3600, db_path=str(tmp_path / "cache.db"))
+
+
+def test_purge_by_language_pair_clears_both_tiers(tmp_path):
+    async def test():
+        cache = _cache(tmp_path)
+        await cache.set_many([
+            ("a", "hola", "English", "Spanish", "m"),
+            ("b", "bonjour", "English", "French", "m"),
+        ])
+        assert await cache.purge("english", "SPANISH") == 1
+        cache.clear_memory()
+        assert await cache.get_many(["a", "b"]) == [None, "bonjour"]
+        stats = await cache.get_stats()
+        assert stats["disk_entries"] == 1
+        assert await cache.purge() == 1
+        assert (await cache.get_stats())["disk_entries"] == 0
+        cache.close()
+
+    asyncio.run(test())
@@ -0,0 +1,54 @@
+"""
+Tests for how the translation memory adapts a stored translation to a near-duplicate segment.
+"""
+
+import os
+
+# Keep the module-level singletons off the SQLite files in the working directory
+os.environ.setdefault("TM_DB", "")
+os.environ.setdefault("TRANSLATION_CACHE_DB", "")
+
+from translation_memory import adapt, tokenize
+
+
+def _adapt(stored: str, query: str, translation: str):
+    return adapt(tokenize(stored), tokenize(query), translation)
+
+
+def test_placeholder_value_is_replaced():
+    assert _adapt("Order 42 has shipped.", "Order 57 has shipped.", "El pedido 42 ha sido enviado.") == "El pedido 57 ha sido enviado."
+
+
+def test_placeholder_count_mismatch_is_rejected():
+    # The stored segment has 42 once, the translation twice: which one to replace is unknown
+    assert _adapt("Order 42 has shipped.", "Order 57 has shipped.", "Pedido 42 enviado (42).") is None
+    assert _adapt("Order 42 has shipped.", "Order 57 has shipped.", "El pedido ha sido enviado.") is None
+
+
+def test_overlapping_replacements_are_rejected():
+    stored = "Ask Mary Ann and Ann Lee now."
+    query = "Ask Jo Bo and Kim Ra now."
+    assert [t for t in tokenize(stored) if t[0] == "name"] == [("name", "Mary Ann"), ("name", "Ann Lee")]
+    assert _adapt(stored, query, "Pregunta a Mary Ann Lee ahora.") is None
+
+
+def test_final_punctuation_is_swapped():
+    assert _adapt("The order has shipped.", "The order has shipped!", "El pedido ha sido enviado.") == "El pedido ha sido enviado!"
+    assert _adapt("The order has shipped!", "The order has shipped", "El pedido ha sido enviado! ") == "El pedido ha sido enviado"
+
+
+def test_soft_punctuation_difference_keeps_translation():
+    assert _adapt("Hello, my friend.", "Hello my friend.", "Hola, amigo mío.") == "Hola, amigo mío."
+
+
+def test_word_difference_falls_through():
+    assert _adapt("The order has shipped.", "The order has arrived.", "El pedido ha sido enviado.") is None
+
+
+def test_question_mark_is_not_swapped():
+    assert _adapt("The order has shipped.", "The order has shipped?", "El pedido ha sido enviado.") is None
+
+
+def test_case_only_difference_falls_through():
+    assert _adapt("Apple pie is good.", "apple pie is good.", "El pastel de manzana es bueno.") is None
+    assert _adapt("Turn it off.", "Turn it OFF.", "Apágalo.") is None
@@ -0,0 +1,252 @@
+"""
+Two-tier translation result cache.
+
+A bounded in-memory LRU with TTL sits in front of an on-disk SQLite table that survives
+restarts. Entries are keyed on the normalized text, language pair, model name and
+generation options. Worker processes share the SQLite tier; a purge in one of them also clears
+the memory tier of the others (on their next shared-state heartbeat). Expired rows are skipped
+on lookup and swept in the background after startup.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from config import TRANSLATION_CACHE_SIZE, TRANSLATION_CACHE_TTL, TRANSLATION_CACHE_DB
+from shared_state import shared_state
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Normalize text for cache lookups (Unicode NFC, trimmed, collapsed whitespace)."""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+def make_key(text: str, source_lang: str, target_lang: str, model: str, options: Optional[dict] = None) -> str:
+    """Build the cache key for a translation."""
+    raw = json.dumps(
+        [normalize_text(text), source_lang.lower(), target_lang.lower(), model, options or {}],
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class TranslationCache:
+    """In-memory LRU (with TTL) backed by a persistent SQLite tier."""
+
+    def __init__(self, max_entries: int = TRANSLATION_CACHE_SIZE, ttl: float = TRANSLATION_CACHE_TTL, db_path: str = TRANSLATION_CACHE_DB):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # key -> (translated_text, expires_at, source_language, target_language, model)
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self.stats = {
+            "hits": 0,
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "writes": 0,
+        }
+        if db_path:
+            self._open_db(db_path)
+        shared_state.watch("translation_cache_purge", self.clear_memory)
+
+    def _open_db(self, db_path: str):
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS translations (
+                key TEXT PRIMARY KEY,
+                translated_text TEXT NOT NULL,
+                source_language TEXT NOT NULL,
+                target_language TEXT NOT NULL,
+                model TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            )
+            """
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_translations_pair ON translations (source_language, target_language)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_translations_model ON translations (model)")
+        self._db.commit()
+
+    async def sweep_expired(self) -> int:
+        """Delete expired rows from the SQLite tier off the event loop. Returns the count removed."""
+        if self._db is None:
+            return 0
+        loop = asyncio.get_running_loop()
+        removed = await loop.run_in_executor(None, self._db_sweep_expired)
+        self.stats["expirations"] += removed
+        if removed:
+            logger.info(f"Swept {removed} expired translation cache entries")
+        return removed
+
+    async def get(self, key: str) -> Optional[str]:
+        """Return the cached translation for key, or None on a miss."""
+        return (await self.get_many([key]))[0]
+
+    async def get_many(self, keys: List[str]) -> List[Optional[str]]:
+        """Return the cached translation for each key (None on a miss), reading the SQLite tier in one call."""
+        now = time.time()
+        results: List[Optional[str]] = [None] * len(keys)
+        missing = []
+        for index, key in enumerate(keys):
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[1] > now:
+                    self._memory.move_to_end(key)
+                    self.stats["hits"] += 1
+                    self.stats["memory_hits"] += 1
+                    results[index] = entry[0]
+                    continue
+                self._memory.pop(key, None)
+                self.stats["expirations"] += 1
+            missing.append(index)
+
+        if missing and self._db is not None:
+            loop = asyncio.get_running_loop()
+            rows = await loop.run_in_executor(None, self._db_get_many, [keys[index] for index in missing], now)
+            still_missing = []
+            for index, row in zip(missing, rows):
+                if row is None:
+                    still_missing.append(index)
+                    continue
+                self._remember(keys[index], row)
+                self.stats["hits"] += 1
+                self.stats["disk_hits"] += 1
+                results[index] = row[0]
+            missing = still_missing
+
+        self.stats["misses"] += len(missing)
+        return results
+
+    async def set(self, key: str, translated_text: str, source_lang: str, target_lang: str, model: str):
+        """Store a translation in both tiers."""
+        await self.set_many([(key, translated_text, source_lang, target_lang, model)])
+
+    async def set_many(self, items: List[Tuple[str, str, str, str, str]]):
+        """Store (key, translated_text, source_language, target_language, model) items in both tiers, in one transaction."""
+        expires_at = time.time() + self.ttl
+        rows = []
+        for key, translated_text, source_lang, target_lang, model in items:
+            entry = (translated_text, expires_at, source_lang.lower(), target_lang.lower(), model)
+            self._remember(key, entry)
+            rows.append((key,) + entry)
+        self.stats["writes"] += len(rows)
+        if rows and self._db is not None:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self._db_set_many, rows)
+
+    async def purge(self, source_lang: Optional[str] = None, target_lang: Optional[str] = None, model: Optional[str] = None) -> int:
+        """
+        Remove entries matching every given filter (all entries if none given), deleting from the
+        SQLite tier off the event loop. Returns the count removed.
+        """
+        filters = {2: source_lang, 3: target_lang, 4: model}
+        filters = {i: (v.lower() if i != 4 else v) for i, v in filters.items() if v}
+
+        matching = [k for k, entry in self._memory.items() if all(entry[i] == v for i, v in filters.items())]
+        for key in matching:
+            del self._memory[key]
+        removed = len(matching)
+
+        if self._db is not None:
+            columns = {2: "source_language", 3: "target_language", 4: "model"}
+            loop = asyncio.get_running_loop()
+            deleted = await loop.run_in_executor(None, self._db_purge, {columns[i]: v for i, v in filters.items()})
+            removed = max(removed, deleted)
+        shared_state.notify("translation_cache_purge")
+        return removed
+
+    def clear_memory(self):
+        """Drop the in-memory tier, e.g. after another worker purged entries it may still hold."""
+        self._memory.clear()
+
+    async def get_stats(self) -> dict:
+        """Return hit/miss/eviction counters and current sizes, counting the SQLite tier off the event loop."""
+        lookups = self.stats["hits"] + self.stats["misses"]
+        stats = dict(self.stats)
+        stats["hit_rate"] = round(self.stats["hits"] / lookups, 4) if lookups else 0.0
+        stats["memory_entries"] = len(self._memory)
+        stats["max_entries"] = self.max_entries
+        if self._db is not None:
+            loop = asyncio.get_running_loop()
+            stats["disk_entries"] = await loop.run_in_executor(None, self._db_count)
+        return stats
+
+    def close(self):
+        """Close the SQLite tier."""
+        if self._db is not None:
+            with self._lock:
+                self._db.close()
+            self._db = None
+
+    def _remember(self, key: str, entry: tuple):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def _db_get_many(self, keys: List[str], now: float) -> List[Optional[tuple]]:
+        rows = []
+        expired = []
+        with self._lock:
+            for key in keys:
+                row = self._db.execute(
+                    "SELECT translated_text, expires_at, source_language, target_language, model FROM translations WHERE key = ?",
+                    (key,),
+                ).fetchone()
+                if row is not None and row[1] <= now:
+                    expired.append((key,))
+                    row = None
+                rows.append(row)
+            if expired:
+                self._db.executemany("DELETE FROM translations WHERE key = ?", expired)
+                self._db.commit()
+                self.stats["expirations"] += len(expired)
+        return rows
+
+    def _db_sweep_expired(self) -> int:
+        with self._lock:
+            cursor = self._db.execute("DELETE FROM translations WHERE expires_at < ?", (time.time(),))
+            self._db.commit()
+        return cursor.rowcount
+
+    def _db_purge(self, filters: dict) -> int:
+        where = " AND ".join(f"{column} = ?" for column in filters) or "1 = 1"
+        with self._lock:
+            cursor = self._db.execute(f"DELETE FROM translations WHERE {where}", tuple(filters.values()))
+            self._db.commit()
+        return cursor.rowcount
+
+    def _db_count(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+
+    def _db_set_many(self, rows: List[tuple]):
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO translations (key, translated_text, expires_at, source_language, target_language, model) VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._db.commit()
+
+
+translation_cache = TranslationCache()
@@ -0,0 +1,410 @@
+"""
+Fuzzy translation memory.
+
+The translation cache only answers exact repeats, but much of the traffic is the same sentence
+with a different number, name or punctuation. The translation memory reuses the stored
+translation of such a near-duplicate instead of generating it again.
+
+Each segment is reduced to a skeleton: numbers, URLs, e-mail addresses, codes and capitalised
+names become typed placeholders and words are lowercased. Skeletons are indexed with MinHash
+signatures over character n-grams, split into LSH bands. The skeleton hash and every band are
+indexed integer columns in SQLite, so a lookup is a few index probes however large the memory
+grows (segments with an identical skeleton are probed first), and the resident footprint is
+SQLite's page cache. Candidates must reach TM_THRESHOLD exact n-gram similarity and are then
+aligned token by token. A match is reused only if every difference is a placeholder whose old
+value occurs verbatim in the stored translation (and is replaced there) or soft punctuation;
+anything else falls through to the model.
+"""
+
+import asyncio
+import hashlib
+import logging
+import re
+import sqlite3
+import struct
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from difflib import SequenceMatcher
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from config import TM_DB, TM_THRESHOLD, TM_MAX_ENTRIES, TM_MAX_CHARS
+from translation_cache import normalize_text
+
+logger = logging.getLogger(__name__)
+
+_NGRAM = 3
+_BANDS = 4
+_ROWS = 4  # MinHash values per band; 4 bands of 4 find ~95% of pairs at similarity 0.85
+_MAX_CANDIDATES = 16  # Rows read per probe
+_PRUNE_EVERY = 1000  # Writes between capacity checks
+
+_TOKEN = re.compile(
+    r"(?P<url>(?:https?://|www\.)\S*[^\s.,;:!?)\]'\"])"
+    r"|(?P<email>[\w.+-]+@[\w-]+(?:\.[\w-]+)+)"
+    r"|(?P<number>\d+(?:[.,:/-]\d+)*)"
+    r"|(?P<word>\w+(?:['’]\w+)*)"
+    r"|(?P<punct>[^\w\s])"
+)
+_PLACEHOLDERS = {"url": "\x00U", "email": "\x00E", "number": "\x00N", "code": "\x00C", "name": "\x00P"}
+_SENTENCE_END = set(".!?")
+_SOFT_PUNCT = set(",;:-–—\"'“”‘’«»()")  # May differ anywhere without changing the translation
+_FINAL_PUNCT = set(".!…")  # May differ at the end; swapped at the end of the translation
+
+# One 64-byte BLAKE2b digest per n-gram gives the 16 independent 32-bit hash values of the signature
+_LANES = struct.Struct(f"<{_BANDS * _ROWS}I")
+
+Token = Tuple[str, str]  # (kind, value)
+
+
+def tokenize(text: str) -> List[Token]:
+    """Split text into (kind, value) tokens. Placeholder kinds are url, email, number, code and name."""
+    tokens: List[Token] = []
+    sentence_start = True
+    last_end = 0
+    for match in _TOKEN.finditer(text):
+        kind, value = match.lastgroup, match.group()
+        if kind == "word":
+            if any(c.isdigit() for c in value):
+                kind = "code"
+            elif value[0].isupper() and not sentence_start:
+                kind = "name"
+                # "Mary Ann" is one name, so it can stand in for "John"
+                if tokens and tokens[-1][0] == "name" and text[last_end:match.start()] == " ":
+                    value = tokens.pop()[1] + " " + value
+        tokens.append((kind, value))
+        sentence_start = value in _SENTENCE_END if kind == "punct" else False
+        last_end = match.end()
+    return tokens
+
+
+def _symbol(token: Token) -> str:
+    kind, value = token
+    return _PLACEHOLDERS.get(kind) or value.lower()
+
+
+def skeleton(tokens: Sequence[Token]) -> str:
+    """The comparable form of a segment: placeholders for volatile values, lowercased words."""
+    return " ".join(_symbol(token) for token in tokens)
+
+
+def shingles(text: str) -> set:
+    """Character n-grams of a skeleton."""
+    if len(text) <= _NGRAM:
+        return {text}
+    return {text[i:i + _NGRAM] for i in range(len(text) - _NGRAM + 1)}
+
+
+def similarity(a: set, b: set) -> float:
+    """Jaccard similarity of two n-gram sets."""
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+def _int64(raw: str) -> int:
+    return int.from_bytes(hashlib.blake2b(raw.encode("utf-8"), digest_size=8).digest(), "big", signed=True)
+
+
+def band_keys(grams: set, scope: str) -> List[int]:
+    """MinHash the n-grams and hash each band of the signature, with the scope, to one integer."""
+    hashes = [_LANES.unpack(hashlib.blake2b(gram.encode("utf-8"), digest_size=_LANES.size).digest()) for gram in grams]
+    signature = [min(lane) for lane in zip(*hashes)]
+    return [
+        _int64(f"{scope}\x00{band}\x00{signature[band * _ROWS:(band + 1) * _ROWS]}")
+        for band in range(_BANDS)
+    ]
+
+
+def _occurrences(translation: str, value: str) -> List[Tuple[int, int]]:
+    """Spans of value in translation as a whole token (not part of a longer word or number)."""
+    pattern = r"(?<!\w)(?<!\d[.,:/-])" + re.escape(value) + r"(?!\w)(?![.,:/-]\d)"
+    return [m.span() for m in re.finditer(pattern, translation)]
+
+
+def adapt(stored: Sequence[Token], query: Sequence[Token], translation: str) -> Optional[str]:
+    """
+    Rewrite the translation of the stored segment into one for the query, or None if that is not safe.
+
+    Aligned placeholders with a new value are replaced in the translation, which must contain the
+    old value exactly as many times as the stored segment does. Words must match exactly, case
+    included. Other differences may only be soft punctuation, or sentence-final punctuation,
+    which is swapped at the end of the translation.
+    """
+    mapping: Dict[str, str] = {}
+    ending = None
+    matcher = SequenceMatcher(None, [_symbol(t) for t in stored], [_symbol(t) for t in query], autojunk=False)
+    for op, i1, i2, j1, j2 in matcher.get_opcodes():
+        if op == "equal":
+            for (kind, old), (_, new) in zip(stored[i1:i2], query[j1:j2]):
+                if kind in _PLACEHOLDERS:
+                    if mapping.setdefault(old, new) != new:
+                        return None
+                elif old != new:
+                    return None  # Words only match case-insensitively in the skeleton
+            continue
+        changed = list(stored[i1:i2]) + list(query[j1:j2])
+        if any(kind != "punct" for kind, _ in changed):
+            return None
+        if i2 == len(stored) and j2 == len(query) and all(value in _FINAL_PUNCT for _, value in changed):
+            ending = ("".join(v for _, v in stored[i1:i2]), "".join(v for _, v in query[j1:j2]))
+        elif any(value not in _SOFT_PUNCT for _, value in changed):
+            return None
+
+    changes = {old: new for old, new in mapping.items() if old != new}
+    if changes:
+        counts = Counter(value for kind, value in stored if kind in _PLACEHOLDERS)
+        spans = []
+        for old, new in changes.items():
+            found = _occurrences(translation, old)
+            if len(found) != counts[old]:
+                return None
+            spans.extend((start, end, new) for start, end in found)
+        spans.sort()
+        if any(spans[n][1] > spans[n + 1][0] for n in range(len(spans) - 1)):
+            return None
+        parts, position = [], 0
+        for start, end, new in spans:
+            parts += [translation[position:start], new]
+            position = end
+        translation = "".join(parts) + translation[position:]
+
+    if ending:
+        old_end, new_end = ending
+        stripped = translation.rstrip()
+        if old_end and stripped.endswith(old_end):
+            translation = stripped[:len(stripped) - len(old_end)] + new_end
+    return translation
+
+
+@dataclass
+class MemoryMatch:
+    """A translation adapted from a near-duplicate segment in the memory."""
+    translated_text: str
+    source_text: str  # The stored segment it was adapted from
+    similarity: float
+
+
+class TranslationMemory:
+    """SQLite-backed translation memory with a MinHash LSH index over segment skeletons."""
+
+    def __init__(
+        self,
+        db_path: str = TM_DB,
+        threshold: float = TM_THRESHOLD,
+        max_entries: int = TM_MAX_ENTRIES,
+        max_chars: int = TM_MAX_CHARS,
+    ):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.max_chars = max_chars
+        self._db: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._writes_since_prune = 0
+        self.stats = {
+            "lookups": 0,
+            "hits": 0,
+            "substituted": 0,  # Hits where placeholders were replaced
+            "unsafe": 0,  # Similar segments found, but none could be adapted safely
+            "misses": 0,
+            "writes": 0,
+            "pruned": 0,
+            "lookup_seconds": 0.0,
+        }
+        if db_path:
+            self._open_db(db_path)
+
+    @property
+    def enabled(self) -> bool:
+        return self._db is not None
+
+    def _open_db(self, db_path: str):
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        bands = ", ".join(f"band{n} INTEGER NOT NULL" for n in range(_BANDS))
+        self._db.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS segments (
+                id INTEGER PRIMARY KEY,
+                digest INTEGER NOT NULL UNIQUE,
+                shape INTEGER NOT NULL,
+                source_text TEXT NOT NULL,
+                translated_text TEXT NOT NULL,
+                source_language TEXT NOT NULL,
+                target_language TEXT NOT NULL,
+                model TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                {bands}
+            )
+            """
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_segments_shape ON segments (shape)")
+        for n in range(_BANDS):
+            self._db.execute(f"CREATE INDEX IF NOT EXISTS idx_segments_band{n} ON segments (band{n})")
+        self._db.commit()
+
+    @staticmethod
+    def _scope(source_lang: str, target_lang: str, model: str) -> str:
+        return f"{source_lang.lower()}\x00{target_lang.lower()}\x00{model}"
+
+    async def lookup(self, text: str, source_lang: str, target_lang: str, model: str) -> Optional[MemoryMatch]:
+        """Return a translation adapted from a near-duplicate segment, or None."""
+        return (await self.lookup_many([(text, source_lang, target_lang, model)]))[0]
+
+    async def lookup_many(self, items: Sequence[Tuple[str, str, str, str]]) -> List[Optional[MemoryMatch]]:
+        """Look up (text, source_language, target_language, model) items in one pass off the event loop."""
+        if self._db is None:
+            return [None] * len(items)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._lookup_many, list(items))
+
+    async def add(self, text: str, translated_text: str, source_lang: str, target_lang: str, model: str):
+        """Remember a generated translation."""
+        await self.add_many([(text, translated_text, source_lang, target_lang, model)])
+
+    async def add_many(self, entries: Sequence[Tuple[str, str, str, str, str]]):
+        """Remember (text, translated_text, source_language, target_language, model) entries."""
+        if self._db is None or not entries:
+            return
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._add_many, list(entries))
+
+    def _lookup_many(self, items: List[Tuple[str, str, str, str]]) -> List[Optional[MemoryMatch]]:
+        return [self._lookup(*item) for item in items]
+
+    def _lookup(self, text: str, source_lang: str, target_lang: str, model: str) -> Optional[MemoryMatch]:
+        started = time.perf_counter()
+        self.stats["lookups"] += 1
+        match, similar = None, False
+        text = normalize_text(text)
+        if text and len(text) <= self.max_chars:
+            query = tokenize(text)
+            form = skeleton(query)
+            grams = shingles(form)
+            scope = self._scope(source_lang, target_lang, model)
+            # Segments with the same skeleton first (only placeholder values differ), then similar ones from the LSH bands
+            match, similar = self._match(query, grams, self._candidates("shape = ?", [_int64(f"{scope}\x00{form}")]))
+            if match is None:
+                where = " OR ".join(f"band{n} = ?" for n in range(_BANDS))
+                match, more = self._match(query, grams, self._candidates(where, band_keys(grams, scope)))
+                similar = similar or more
+
+        if match is not None:
+            self.stats["hits"] += 1
+        else:
+            self.stats["unsafe" if similar else "misses"] += 1
+        self.stats["lookup_seconds"] += time.perf_counter() - started
+        return match
+
+    def _candidates(self, where: str, params: List[int]) -> List[Tuple[str, str]]:
+        try:
+            with self._lock:
+                return self._db.execute(
+                    f"SELECT source_text, translated_text FROM segments WHERE {where} LIMIT {_MAX_CANDIDATES}", params
+                ).fetchall()
+        except sqlite3.Error as e:
+            logger.warning(f"Translation memory lookup failed: {e}")
+            return []
+
+    def _match(self, query: List[Token], grams: set, rows: List[Tuple[str, str]]) -> Tuple[Optional[MemoryMatch], bool]:
+        """Adapt the most similar candidate that can be adapted safely. Also returns whether any reached the threshold."""
+        candidates = []
+        for source_text, translated_text in rows:
+            stored = tokenize(source_text)
+            score = similarity(grams, shingles(skeleton(stored)))
+            if score >= self.threshold:
+                candidates.append((score, source_text, stored, translated_text))
+        for score, source_text, stored, translated_text in sorted(candidates, key=lambda c: -c[0]):
+            adapted = adapt(stored, query, translated_text)
+            if adapted:
+                if adapted != translated_text:
+                    self.stats["substituted"] += 1
+                return MemoryMatch(adapted, source_text, round(score, 4)), True
+        return None, bool(candidates)
+
+    def _add_many(self, entries: List[Tuple[str, str, str, str, str]]):
+        rows = []
+        now = time.time()
+        for text, translated_text, source_lang, target_lang, model in entries:
+            text = normalize_text(text)
+            if not text or not translated_text or len(text) > self.max_chars:
+                continue
+            scope = self._scope(source_lang, target_lang, model)
+            form = skeleton(tokenize(text))
+            keys = band_keys(shingles(form), scope)
+            rows.append((
+                _int64(f"{scope}\x00{text}"), _int64(f"{scope}\x00{form}"), text, translated_text,
+                source_lang.lower(), target_lang.lower(), model, now, *keys,
+            ))
+        if not rows:
+            return
+        columns = ", ".join(f"band{n}" for n in range(_BANDS))
+        try:
+            with self._lock:
+                cursor = self._db.executemany(
+                    "INSERT OR IGNORE INTO segments (digest, shape, source_text, translated_text, source_language, target_language, model, created_at, "
+                    f"{columns}) VALUES (?, ?, ?, ?, ?, ?, ?, ?{', ?' * _BANDS})",
+                    rows,
+                )
+                self._db.commit()
+                self.stats["writes"] += max(0, cursor.rowcount)
+                self._writes_since_prune += len(rows)
+                if self._writes_since_prune >= _PRUNE_EVERY:
+                    self._writes_since_prune = 0
+                    self._prune()
+        except sqlite3.Error as e:
+            logger.warning(f"Translation memory write failed: {e}")
+
+    def _prune(self):
+        """Drop the oldest segments beyond max_entries. Called with the lock held."""
+        count = self._db.execute("SELECT COUNT(*) FROM segments").fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            self._db.execute("DELETE FROM segments WHERE id IN (SELECT id FROM segments ORDER BY id LIMIT ?)", (excess,))
+            self._db.commit()
+            self.stats["pruned"] += excess
+            logger.info(f"Pruned {excess} translation memory segments")
+
+    async def purge(self, source_lang: Optional[str] = None, target_lang: Optional[str] = None, model: Optional[str] = None) -> int:
+        """Remove segments matching every given filter (all segments if none given), off the event loop. Returns the count removed."""
+        if self._db is None:
+            return 0
+        filters = {"source_language": source_lang and source_lang.lower(), "target_language": target_lang and target_lang.lower(), "model": model}
+        filters = {column: value for column, value in filters.items() if value}
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._purge, filters)
+
+    def _purge(self, filters: dict) -> int:
+        where = " AND ".join(f"{column} = ?" for column in filters) or "1 = 1"
+        with self._lock:
+            cursor = self._db.execute(f"DELETE FROM segments WHERE {where}", tuple(filters.values()))
+            self._db.commit()
+        return cursor.rowcount
+
+    async def get_stats(self) -> dict:
+        """Return lookup outcome counters, mean lookup time and the number of stored segments (counted off the event loop)."""
+        stats = dict(self.stats)
+        lookups = stats.pop("lookup_seconds")
+        stats["enabled"] = self.enabled
+        stats["threshold"] = self.threshold
+        stats["hit_rate"] = round(self.stats["hits"] / self.stats["lookups"], 4) if self.stats["lookups"] else 0.0
+        stats["mean_lookup_ms"] = round(lookups / self.stats["lookups"] * 1000, 3) if self.stats["lookups"] else 0.0
+        stats["max_entries"] = self.max_entries
+        if self._db is not None:
+            loop = asyncio.get_running_loop()
+            stats["segments"] = await loop.run_in_executor(None, self._count)
+        return stats
+
+    def _count(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM segments").fetchone()[0]
+
+    def close(self):
+        """Close the SQLite database."""
+        if self._db is not None:
+            with self._lock:
+                self._db.close()
+            self._db = None
+
+
+translation_memory = TranslationMemory()
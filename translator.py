@@ -0,0 +1,206 @@
+"""
+Translation engine: prompt construction and generation through Ollama.
+"""
+
+import logging
+from typing import AsyncIterator, Optional
+
+from admission import admission_controller, AdmissionRejected
+from backend_pool import get_pool
+from ollama_client import OllamaError
+from ollama_health import health_monitor
+from generation_planner import GENERATION_OPTIONS, generation_planner
+from metrics import stage_timer, record_generation, record_generation_error
+from model_router import model_router, KEEP_ALIVE
+from prompt_templates import prompt_template
+from request_coalescer import SingleFlight
+from request_lifecycle import DeadlineExceeded, without_deadline
+from span_protection import is_translatable, span_protector
+from translation_cache import make_key
+from translation_memory import translation_memory
+
+logger = logging.getLogger(__name__)
+
+# Identical concurrent translations share one Ollama generation
+translation_flights = SingleFlight()
+
+# Sampling options and prompt template version; part of the translation cache key
+CACHE_KEY_OPTIONS = dict(GENERATION_OPTIONS, prompt_template=prompt_template.version)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate: ~4 characters per token for ASCII, ~1 per character otherwise."""
+    ascii_chars = sum(1 for c in text if c < "\x80")
+    return max(1, ascii_chars // 4 + (len(text) - ascii_chars))
+
+
+def clean_translation(translated_text: str) -> str:
+    """Clean up a model response - strip whitespace and surrounding quotes."""
+    translated_text = translated_text.strip()
+    if len(translated_text) >= 2 and translated_text.startswith('"') and translated_text.endswith('"'):
+        translated_text = translated_text[1:-1]
+    return translated_text
+
+
+class StreamCleaner:
+    """Incremental version of clean_translation() for streamed tokens."""
+
+    _TRAILING = ' \t\r\n"'
+
+    def __init__(self):
+        self._started = False
+        self._opening_quote = False
+        self._held = ""
+
+    def feed(self, chunk: str) -> str:
+        """Return the part of chunk that is safe to emit now."""
+        if not self._started:
+            chunk = chunk.lstrip()
+            if not chunk:
+                return ""
+            self._started = True
+            if chunk.startswith('"'):
+                self._opening_quote = True
+                chunk = chunk[1:]
+        # Hold back trailing whitespace/quotes until we know they are not the end of the text
+        text = self._held + chunk
+        emit = text.rstrip(self._TRAILING)
+        self._held = text[len(emit):]
+        return emit
+
+    def finish(self) -> str:
+        """Return whatever is still held back once the stream has ended."""
+        tail = self._held.rstrip()
+        if self._opening_quote and tail.endswith('"'):
+            tail = tail[:-1]
+        self._held = ""
+        return tail
+
+
+async def translate_text(
+    text: str,
+    source_lang: str,
+    target_lang: str = "English",
+    context: Optional[str] = None,
+    model: Optional[str] = None,
+) -> Optional[str]:
+    """
+    Translate text using Ollama.
+    
+    Text with nothing to translate (numbers, URLs, placeholders, identifiers) is returned as it
+    is. The model is chosen by the size router unless given. Without context, a near-duplicate in
+    the translation memory is reused instead of generating. Concurrent calls for the same text,
+    language pair, model and context are coalesced into a single generation, which runs outside
+    any one caller's deadline and stops once every caller has gone. Returns None if the
+    translation failed and a fallback should be used.
+    """
+    if not is_translatable(text):
+        return text
+    model = model or model_router.select(text, source_lang, target_lang)
+    if not context:
+        match = await translation_memory.lookup(text, source_lang, target_lang, model)
+        if match is not None:
+            return match.translated_text
+    key = make_key(text, source_lang, target_lang, model, CACHE_KEY_OPTIONS)
+    if context:
+        key += ":" + make_key(context, source_lang, target_lang, model)
+    admission_controller.check_deadline()
+    return await translation_flights.do(key, lambda: without_deadline(_generate_translation(text, source_lang, target_lang, context, model)))
+
+
+async def _generate_translation(text: str, source_lang: str, target_lang: str, context: Optional[str], model: str) -> Optional[str]:
+    """
+    Run one translation generation on Ollama, retrying once with a larger budget if it was cut off.
+
+    Placeholders and markup are sent as sentinels and put back afterwards; an output that lost one
+    is treated as a failed translation.
+    """
+    try:
+        masked = span_protector.mask(text)
+        prompt = prompt_template.single(masked.text, source_lang, target_lang, context)
+        input_tokens = estimate_tokens(masked.text)
+        prompt_tokens = estimate_tokens(prompt.text)
+        options = generation_planner.plan(input_tokens, prompt_tokens, source_lang, target_lang, single_line="\n" not in text.strip())
+        payload = {
+            "model": model,
+            **prompt.fields,
+            "stream": False,
+            "keep_alive": KEEP_ALIVE,
+            "options": options
+        }
+        
+        async with admission_controller.slot():
+            with stage_timer("generate"):
+                result = await get_pool().generate(payload)
+            record_generation(result, source_lang, target_lang)
+            retry = generation_planner.observe(input_tokens, result, source_lang, target_lang) and generation_planner.retry(options, prompt_tokens)
+            if retry:
+                logger.info(f"Translation hit num_predict={options['num_predict']}, retrying with {retry['num_predict']} (num_ctx={retry['num_ctx']})")
+                payload["options"] = retry
+                with stage_timer("generate"):
+                    result = await get_pool().generate(payload)
+                record_generation(result, source_lang, target_lang)
+        with stage_timer("cleanup"):
+            translated_text = clean_translation(result.get("response", ""))
+            if translated_text:
+                translated_text = span_protector.restore(masked, translated_text)
+                if translated_text is None:
+                    logger.warning(f"Translation dropped a placeholder of {text[:80]!r}, using fallback")
+                    return None
+        
+        if translated_text:
+            if not context:
+                await translation_memory.add(text, translated_text, source_lang, target_lang, model)
+            return translated_text
+        else:
+            raise OllamaError("Empty response from Ollama")
+            
+    except (AdmissionRejected, DeadlineExceeded):
+        raise
+    except Exception as e:
+        logger.error(f"Translation error: {str(e)}")
+        record_generation_error("translate", e)
+        health_monitor.mark_stale(str(e))
+        # Return None to indicate fallback should be used
+        return None
+
+
+async def stream_translation(text: str, source_lang: str, target_lang: str = "English", model: Optional[str] = None) -> AsyncIterator[str]:
+    """
+    Translate text with Ollama's stream mode, yielding cleaned text deltas as they arrive.
+    
+    The model is chosen by the size router unless given. Placeholders and markup are sent as
+    sentinels and put back as the deltas arrive.
+    
+    The caller must hold an admission slot for the lifetime of the stream, acquired before the
+    response starts so that shed requests can still be answered with 429/503.
+    Raises OllamaError if the generation fails.
+    """
+    masked = span_protector.mask(text)
+    prompt = prompt_template.single(masked.text, source_lang, target_lang)
+    input_tokens = estimate_tokens(masked.text)
+    payload = {
+        "model": model or model_router.select(text, source_lang, target_lang),
+        **prompt.fields,
+        "stream": True,
+        "keep_alive": KEEP_ALIVE,
+        "options": generation_planner.plan(input_tokens, estimate_tokens(prompt.text), source_lang, target_lang, single_line="\n" not in text.strip())
+    }
+    cleaner = StreamCleaner()
+    restorer = span_protector.stream_restorer(masked)
+    try:
+        async for chunk in get_pool().generate_stream(payload):
+            delta = restorer.feed(cleaner.feed(chunk.get("response", "")))
+            if delta:
+                yield delta
+            if chunk.get("done"):
+                record_generation(chunk, source_lang, target_lang)
+                generation_planner.observe(input_tokens, chunk, source_lang, target_lang)
+    except OllamaError as e:
+        logger.error(f"Streaming translation error: {str(e)}")
+        record_generation_error("stream", e)
+        health_monitor.mark_stale(str(e))
+        raise
+    tail = restorer.feed(cleaner.finish()) + restorer.finish()
+    if tail:
+        yield tail